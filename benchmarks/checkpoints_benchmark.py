@@ -0,0 +1,41 @@
+import pytest
+
+from multicontents.multi_versions_file_checkpoints import (
+    AsyncMultiVersionsFileCheckpoints,
+)
+
+VERSIONS = 1000
+
+
+@pytest.fixture(params=["copy", "content_addressed"])
+def checkpoints(request, tmp_path, run):
+    """checkpoints of a file saved VERSIONS times"""
+    checkpoints = AsyncMultiVersionsFileCheckpoints(
+        root_dir=str(tmp_path),
+        checkpoint_dir=".checkpoints",
+        storage_mode=request.param,
+    )
+
+    async def create():
+        for i in range(VERSIONS):
+            await checkpoints.create_file_checkpoint(f"v{i}", "text", "a.txt")
+
+    run(create())
+    return checkpoints
+
+
+@pytest.mark.benchmark(group="create a checkpoint among 1000")
+def test_create_checkpoint(benchmark, run, checkpoints):
+    versions = iter(range(VERSIONS, 100 * VERSIONS))
+    benchmark(
+        lambda: run(
+            checkpoints.create_file_checkpoint(f"v{next(versions)}", "text", "a.txt")
+        )
+    )
+
+
+@pytest.mark.parametrize("limit", [None, 20])
+@pytest.mark.benchmark(group="list 1000 checkpoints")
+def test_list_checkpoints(benchmark, run, checkpoints, limit):
+    listed = benchmark(lambda: run(checkpoints.list_checkpoints("a.txt", limit=limit)))
+    assert len(listed) == (limit or VERSIONS)
@@ -0,0 +1,58 @@
+import asyncio
+import socket
+
+import pytest
+
+
+@pytest.fixture
+def run():
+    """run a coroutine to completion, benchmarks themselves are synchronous"""
+    loop = asyncio.new_event_loop()
+    yield loop.run_until_complete
+    loop.close()
+
+
+def _free_port():
+    with socket.socket() as s:
+        s.bind(("", 0))
+        return s.getsockname()[1]
+
+
+@pytest.fixture(scope="session")
+def moto_s3():
+    """(endpoint, bucket) of a moto S3 server, skipped without moto"""
+    moto_server = pytest.importorskip("moto.server")
+    boto3 = pytest.importorskip("boto3")
+    pytest.importorskip("s3contents")
+    port = _free_port()
+    server = moto_server.ThreadedMotoServer(port=port)
+    server.start()
+    endpoint = f"http://127.0.0.1:{port}"
+    bucket = "multicontents-benchmark"
+    boto3.client(
+        "s3",
+        endpoint_url=endpoint,
+        aws_access_key_id="test",
+        aws_secret_access_key="test",
+        region_name="us-east-1",
+    ).create_bucket(Bucket=bucket)
+    try:
+        yield endpoint, bucket
+    finally:
+        server.stop()
+
+
+@pytest.fixture
+def s3_mount(moto_s3, request):
+    """manager settings of a mount on its own prefix of the moto bucket"""
+    endpoint, bucket = moto_s3
+    return {
+        "manager_class": "s3contents.S3ContentsManager",
+        "kwargs": {
+            "bucket": bucket,
+            "prefix": request.node.name.replace("[", "-").rstrip("]"),
+            "access_key_id": "test",
+            "secret_access_key": "test",
+            "endpoint_url": endpoint,
+        },
+    }
@@ -0,0 +1,74 @@
+import pytest
+from jupyter_server.services.contents.filemanager import FileContentsManager
+
+from multicontents.multicontents_manager import MultiContentsManager
+
+ENTRIES = 10000
+
+
+class ListingManager(object):
+    """an in memory backend listing ENTRIES files, to measure multicontents'
+    own overhead"""
+
+    def __init__(self):
+        self.listing = [
+            {
+                "name": f"notebook_{i}.ipynb",
+                "path": f"project/notebook_{i}.ipynb",
+                "type": "notebook",
+                "writable": True,
+                "created": None,
+                "last_modified": None,
+                "content": None,
+                "format": None,
+                "mimetype": None,
+                "size": 1024,
+            }
+            for i in range(ENTRIES)
+        ]
+
+    def get(self, path, content=True, type=None, format=None):
+        return {
+            "name": "project",
+            "path": path,
+            "type": "directory",
+            "format": "json",
+            "content": [dict(model) for model in self.listing] if content else None,
+        }
+
+
+@pytest.fixture(scope="module")
+def local_root(tmp_path_factory):
+    root = tmp_path_factory.mktemp("listing")
+    (root / "project").mkdir()
+    for i in range(ENTRIES):
+        (root / "project" / f"file_{i}.txt").write_text(str(i))
+    return root
+
+
+@pytest.mark.benchmark(group="list 10k entries")
+def test_list_in_memory(benchmark, run):
+    manager = MultiContentsManager(
+        managers={"mount": {"manager_class": ListingManager, "kwargs": {}}}
+    )
+    model = benchmark(lambda: run(manager.get("mount/project", content=True)))
+    assert len(model["content"]) == ENTRIES
+    assert model["content"][0]["path"] == "mount/project/notebook_0.ipynb"
+
+
+@pytest.mark.parametrize("executor_workers", [None, 4])
+@pytest.mark.benchmark(group="list 10k entries")
+def test_list_local(benchmark, run, local_root, executor_workers):
+    manager = MultiContentsManager(
+        managers={
+            "mount": {
+                "manager_class": FileContentsManager,
+                "kwargs": {"root_dir": str(local_root)},
+                "executor_workers": executor_workers,
+            }
+        }
+    )
+    model = benchmark.pedantic(
+        lambda: run(manager.get("mount/project", content=True)), rounds=5
+    )
+    assert len(model["content"]) == ENTRIES
@@ -0,0 +1,75 @@
+import os
+import re
+
+import pytest
+
+from multicontents.multicontents_manager import WrapperManager
+
+PROXY_PATH = "teams/data-science"
+ENTRIES = 10000
+
+
+class RegexTranslation(object):
+    """path translation as WrapperManager did it before precomputing prefixes,
+    kept as the baseline of these benchmarks"""
+
+    def __init__(self, proxy_path):
+        self.proxy_path = proxy_path
+
+    def to_actual_path(self, path):
+        path = path.strip("/")
+        if re.match(f"^{re.escape(self.proxy_path)}$", path):
+            return ""
+        return re.sub(f"^{re.escape(self.proxy_path)}/", r"/", path).strip("/")
+
+    def to_proxy_path(self, actual_path):
+        actual_path = actual_path.strip("/")
+        return os.path.join(self.proxy_path, actual_path).strip("/")
+
+    def to_proxy_models(self, models):
+        return [
+            dict(list(model.items()) + [("path", self.to_proxy_path(model["path"]))])
+            for model in models
+        ]
+
+
+def make_listing():
+    return [
+        {
+            "name": f"notebook_{i}.ipynb",
+            "path": f"project/notebook_{i}.ipynb",
+            "type": "notebook",
+            "writable": True,
+            "created": None,
+            "last_modified": None,
+            "content": None,
+            "format": None,
+            "mimetype": None,
+            "size": 1024,
+        }
+        for i in range(ENTRIES)
+    ]
+
+
+@pytest.fixture(params=["regex", "precomputed"])
+def translator(request):
+    if request.param == "regex":
+        return RegexTranslation(PROXY_PATH)
+    return WrapperManager(PROXY_PATH, dict, {})
+
+
+@pytest.mark.benchmark(group="translate 10k listing")
+def test_translate_listing(benchmark, translator):
+    result = benchmark.pedantic(
+        translator.to_proxy_models,
+        setup=lambda: ((make_listing(),), {}),
+        rounds=20,
+    )
+    assert result[0]["path"] == f"{PROXY_PATH}/project/notebook_0.ipynb"
+
+
+@pytest.mark.benchmark(group="translate 10k request paths")
+def test_translate_request_paths(benchmark, translator):
+    paths = [f"{PROXY_PATH}/project/notebook_{i}.ipynb" for i in range(ENTRIES)]
+    result = benchmark(lambda: [translator.to_actual_path(path) for path in paths])
+    assert result[0] == "project/notebook_0.ipynb"
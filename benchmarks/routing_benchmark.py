@@ -0,0 +1,38 @@
+import pytest
+
+from multicontents.multicontents_manager import MultiContentsManager
+
+LOOKUPS = 1000
+
+
+def make_manager(mounts):
+    """mounts spread over teams of 10 projects each, plus a root mount"""
+    managers = {"": {"manager_class": dict, "kwargs": {}}}
+    for i in range(mounts):
+        managers[f"team{i // 10}/project{i % 10}"] = {
+            "manager_class": dict,
+            "kwargs": {},
+        }
+    return MultiContentsManager(managers=managers)
+
+
+@pytest.mark.parametrize("mounts", [10, 100, 1000])
+@pytest.mark.benchmark(group="route 1000 paths")
+def test_get_manager(benchmark, mounts):
+    manager = make_manager(mounts)
+    teams = mounts // 10
+    paths = [
+        f"team{i % teams}/project{i % 10}/dir/notebook_{i}.ipynb"
+        for i in range(LOOKUPS)
+    ]
+    wrappers = benchmark(lambda: [manager.get_manager(path) for path in paths])
+    assert wrappers[-1].proxy_path == f"team{(LOOKUPS - 1) % teams}/project9"
+
+
+@pytest.mark.parametrize("mounts", [10, 100, 1000])
+@pytest.mark.benchmark(group="route 1000 paths to the root mount")
+def test_get_manager_fallback(benchmark, mounts):
+    manager = make_manager(mounts)
+    paths = [f"shared/dir/notebook_{i}.ipynb" for i in range(LOOKUPS)]
+    wrappers = benchmark(lambda: [manager.get_manager(path) for path in paths])
+    assert wrappers[0].proxy_path == ""
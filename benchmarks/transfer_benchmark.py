@@ -0,0 +1,86 @@
+import itertools
+import os
+
+import mock
+import pytest
+from jupyter_server.services.contents.largefilemanager import LargeFileManager
+
+from multicontents.multicontents_manager import MultiContentsManager
+
+LARGE_FILE_SIZE = 16 * 1024 * 1024
+TREE_DEPTH = 8
+FILES_PER_DIR = 4
+
+
+@pytest.fixture(params=["local", "local-streamed", "s3"])
+def manager(request, tmp_path):
+    """a MultiContentsManager moving from a local "src" mount to "dst"
+
+    local-streamed disables the transfer strategies, so files are streamed
+    in chunks instead of renamed.
+    """
+    src_root = tmp_path / "src"
+    src_root.mkdir()
+    if request.param == "s3":
+        dst = request.getfixturevalue("s3_mount")
+    else:
+        (tmp_path / "dst").mkdir()
+        dst = {
+            "manager_class": LargeFileManager,
+            "kwargs": {"root_dir": str(tmp_path / "dst")},
+        }
+    manager = MultiContentsManager(
+        managers={
+            "src": {
+                "manager_class": LargeFileManager,
+                "kwargs": {"root_dir": str(src_root)},
+            },
+            "dst": dst,
+        }
+    )
+    manager.src_root = src_root
+    if request.param == "local-streamed":
+        with mock.patch.dict("multicontents.transfer._transfer_strategies", clear=True):
+            yield manager
+    else:
+        yield manager
+
+
+def write_tree(root, depth):
+    for _ in range(depth):
+        for i in range(FILES_PER_DIR):
+            (root / f"file_{i}.txt").write_text("x" * 1024)
+        root = root / "sub"
+        root.mkdir()
+
+
+@pytest.mark.benchmark(group="move a 16MB file across mounts")
+def test_move_large_file(benchmark, run, manager):
+    names = (f"large_{i}.bin" for i in itertools.count())
+
+    def setup():
+        name = next(names)
+        with open(manager.src_root / name, "wb") as fp:
+            fp.write(os.urandom(LARGE_FILE_SIZE))
+        return (f"src/{name}", f"dst/{name}"), {}
+
+    benchmark.pedantic(
+        lambda old, new: run(manager.rename_file(old, new)), setup=setup, rounds=3
+    )
+    assert not list(manager.src_root.iterdir())
+
+
+@pytest.mark.benchmark(group="move a deep tree across mounts")
+def test_move_deep_tree(benchmark, run, manager):
+    names = (f"tree_{i}" for i in itertools.count())
+
+    def setup():
+        name = next(names)
+        (manager.src_root / name).mkdir()
+        write_tree(manager.src_root / name, TREE_DEPTH)
+        return (f"src/{name}", f"dst/{name}"), {}
+
+    benchmark.pedantic(
+        lambda old, new: run(manager.rename_file(old, new)), setup=setup, rounds=3
+    )
+    assert not list(manager.src_root.iterdir())
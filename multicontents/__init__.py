@@ -1,3 +1,9 @@
 # flake8: noqa
 import jupyter_server.transutils
 from multicontents.multicontents_manager import MultiContentsManager
+
+
+def _jupyter_server_extension_points():
+    from multicontents.app import MultiContentsApp
+
+    return [{"module": "multicontents.app", "app": MultiContentsApp}]
@@ -0,0 +1,42 @@
+import prometheus_client
+from jupyter_core.utils import ensure_async
+from jupyter_server.auth.decorator import allow_unauthenticated
+from jupyter_server.base.handlers import JupyterHandler
+from jupyter_server.extension.application import ExtensionApp
+from tornado import web
+
+from multicontents.metrics import prometheus_text
+
+
+class MountMetricsHandler(JupyterHandler):
+    """the mount metrics of a MultiContentsManager with collect_metrics, in
+    the prometheus text format, authenticated like the server's /metrics"""
+
+    @allow_unauthenticated
+    def get(self):
+        if self.settings["authenticate_prometheus"] and not self.logged_in:
+            raise web.HTTPError(403)
+        mount_metrics = getattr(self.contents_manager, "mount_metrics", None)
+        mounts = mount_metrics() if mount_metrics is not None else {}
+        self.set_header("Content-Type", prometheus_client.CONTENT_TYPE_LATEST)
+        self.write(prometheus_text(mounts))
+
+
+class MultiContentsApp(ExtensionApp):
+    """server extension hooking multicontents into the server's lifecycle
+
+    enable with `c.ServerApp.jpserver_extensions = {"multicontents": True}`.
+    """
+
+    name = "multicontents"
+
+    def initialize_handlers(self):
+        self.handlers.append((r"/multicontents/metrics", MountMetricsHandler))
+
+    async def stop_extension(self):
+        contents_manager = self.serverapp.contents_manager
+        shutdown = getattr(contents_manager, "shutdown", None)
+        if shutdown is None:
+            shutdown = getattr(contents_manager.checkpoints, "shutdown", None)
+        if shutdown is not None:
+            await ensure_async(shutdown())
@@ -0,0 +1,116 @@
+import asyncio
+import time
+from collections import OrderedDict
+
+MISSING = object()
+
+
+def parent_path(path):
+    path = path.strip("/")
+    return path.rsplit("/", 1)[0] if "/" in path else ""
+
+
+class TTLCache(object):
+    """LRU cache whose entries expire after ttl seconds
+
+    keys are tuples starting with the path they describe, so that writes can
+    invalidate a path, everything below it and its parent directory.
+    """
+
+    def __init__(self, max_size=1024, ttl=5.0, timer=time.monotonic):
+        self.max_size = max_size
+        self.ttl = ttl
+        self.timer = timer
+        self.hits = 0
+        self.misses = 0
+        self.generation = 0
+        self._data = OrderedDict()
+
+    def __len__(self):
+        return len(self._data)
+
+    def get(self, key):
+        entry = self._data.get(key)
+        if entry is None or entry[0] <= self.timer():
+            if entry is not None:
+                del self._data[key]
+            self.misses += 1
+            return MISSING
+        self._data.move_to_end(key)
+        self.hits += 1
+        return entry[1]
+
+    def set(self, key, value, generation=None):
+        """store value, unless the cache was invalidated since `generation`"""
+        if generation is not None and generation != self.generation:
+            return
+        self._data[key] = (self.timer() + self.ttl, value)
+        self._data.move_to_end(key)
+        while len(self._data) > self.max_size:
+            self._data.popitem(last=False)
+
+    def invalidate(self, path):
+        path = path.strip("/")
+        parent = parent_path(path)
+        prefix = path + "/" if path else ""
+        self.generation += 1
+        for key in list(self._data):
+            if key[0] == path or key[0] == parent or key[0].startswith(prefix):
+                del self._data[key]
+
+    def clear(self):
+        self.generation += 1
+        self._data.clear()
+
+    def stats(self):
+        return {"hits": self.hits, "misses": self.misses, "size": len(self._data)}
+
+
+class SingleFlight(object):
+    """merges concurrent calls with the same key into a single call
+
+    keys are tuples starting with the path they read, as in TTLCache. A write
+    forgets the calls in flight for a path, its parent and everything below it:
+    they still answer their callers, but later calls start a new one.
+    """
+
+    def __init__(self):
+        self.calls = 0
+        self.shared = 0
+        self._flights = {}
+
+    def __len__(self):
+        return len(self._flights)
+
+    def _done(self, key, flight):
+        if self._flights.get(key) is flight:
+            del self._flights[key]
+        # retrieved here in case every caller was cancelled
+        if not flight[0].cancelled():
+            flight[0].exception()
+
+    async def do(self, key, func):
+        """(result, shared) of func() or of the call in flight for key, shared
+        being whether more than one caller got this result"""
+        flight = self._flights.get(key)
+        if flight is None:
+            self.calls += 1
+            flight = self._flights[key] = [asyncio.ensure_future(func()), 1]
+            flight[0].add_done_callback(lambda _: self._done(key, flight))
+        else:
+            self.shared += 1
+            flight[1] += 1
+        # cancelling a caller doesn't cancel the call of the others
+        result = await asyncio.shield(flight[0])
+        return result, flight[1] > 1
+
+    def forget(self, path):
+        path = path.strip("/")
+        parent = parent_path(path)
+        prefix = path + "/" if path else ""
+        for key in list(self._flights):
+            if key[0] == path or key[0] == parent or key[0].startswith(prefix):
+                del self._flights[key]
+
+    def stats(self):
+        return {"calls": self.calls, "shared": self.shared, "in_flight": len(self)}
@@ -0,0 +1,156 @@
+import os
+import gzip
+import json
+import hashlib
+import tempfile
+
+try:
+    import zstandard
+except ImportError:  # pragma: no cover
+    zstandard = None
+
+COMPRESSIONS = {
+    None: "",
+    "gzip": ".gz",
+    "zstd": ".zst",
+}
+
+
+def compress(data, compression):
+    if compression == "gzip":
+        return gzip.compress(data, mtime=0)
+    if compression == "zstd":
+        return zstandard.ZstdCompressor().compress(data)
+    return data
+
+
+def decompress(data, compression):
+    if compression == "gzip":
+        return gzip.decompress(data)
+    if compression == "zstd":
+        return zstandard.ZstdDecompressor().decompress(data)
+    return data
+
+
+def write_atomic(os_path, data):
+    """write through a temporary file, so that readers never see partial data"""
+    fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(os_path), prefix=".tmp-")
+    try:
+        with os.fdopen(fd, "wb") as fp:
+            fp.write(data)
+        os.replace(tmp_path, os_path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.unlink(tmp_path)
+        raise
+
+
+class ObjectStore(object):
+    """blobs stored once by the sha256 of their uncompressed content, under
+    `<root>/<first two hex digits>/<hash>[.gz|.zst]`
+
+    objects written with another compression stay readable.
+    """
+
+    def __init__(self, root, compression=None):
+        if compression not in COMPRESSIONS:
+            raise ValueError(f"unknown compression {compression!r}")
+        if compression == "zstd" and zstandard is None:
+            raise ImportError("zstd compression requires the zstandard package")
+        self.root = root
+        self.compression = compression
+
+    @staticmethod
+    def hash(data):
+        return hashlib.sha256(data).hexdigest()
+
+    def object_path(self, digest, compression=None):
+        return os.path.join(self.root, digest[:2], digest + COMPRESSIONS[compression])
+
+    def find(self, digest):
+        """return (os_path, compression) of a stored object, or None"""
+        # try the configured compression first, it's the likeliest one
+        for compression in sorted(COMPRESSIONS, key=lambda c: c != self.compression):
+            os_path = self.object_path(digest, compression)
+            if os.path.isfile(os_path):
+                return os_path, compression
+        return None
+
+    def put(self, data):
+        """store data unless an identical object exists, return its hash"""
+        digest = self.hash(data)
+        if self.find(digest) is None:
+            os_path = self.object_path(digest, self.compression)
+            os.makedirs(os.path.dirname(os_path), exist_ok=True)
+            write_atomic(os_path, compress(data, self.compression))
+        return digest
+
+    def get(self, digest):
+        found = self.find(digest)
+        if found is None:
+            raise KeyError(digest)
+        os_path, compression = found
+        with open(os_path, "rb") as fp:
+            return decompress(fp.read(), compression)
+
+    def __contains__(self, digest):
+        return self.find(digest) is not None
+
+    def digests(self):
+        if not os.path.isdir(self.root):
+            return
+        for prefix in os.listdir(self.root):
+            prefix_dir = os.path.join(self.root, prefix)
+            if len(prefix) != 2 or not os.path.isdir(prefix_dir):
+                continue
+            for name in os.listdir(prefix_dir):
+                if not name.startswith(".tmp-"):
+                    yield name.split(".", 1)[0]
+
+    def delete(self, digest):
+        found = self.find(digest)
+        while found is not None:
+            os.unlink(found[0])
+            found = self.find(digest)
+
+
+def _dumps(value):
+    return json.dumps(value, sort_keys=True, separators=(",", ":")).encode("utf-8")
+
+
+def store_notebook(store, nb):
+    """store the cells and outputs of a notebook as separate objects, return
+    the manifest listing them
+
+    unchanged cells and outputs (typically large images) of successive
+    versions are stored only once.
+    """
+    cells = []
+    for cell in nb["cells"]:
+        cell = dict(cell)
+        if "outputs" in cell:
+            cell["outputs"] = [store.put(_dumps(output)) for output in cell["outputs"]]
+        cells.append(store.put(_dumps(cell)))
+    manifest = {key: value for key, value in nb.items() if key != "cells"}
+    manifest["cells"] = cells
+    return _dumps(manifest)
+
+
+def load_notebook(store, manifest):
+    """rebuild the notebook dict from a manifest returned by `store_notebook`"""
+    nb = json.loads(manifest)
+    cells = []
+    for digest in nb["cells"]:
+        cell = json.loads(store.get(digest))
+        if "outputs" in cell:
+            cell["outputs"] = [json.loads(store.get(d)) for d in cell["outputs"]]
+        cells.append(cell)
+    nb["cells"] = cells
+    return nb
+
+
+def notebook_objects(store, manifest):
+    """hashes of the cells and outputs a manifest references"""
+    for digest in json.loads(manifest)["cells"]:
+        yield digest
+        yield from json.loads(store.get(digest)).get("outputs", [])
@@ -0,0 +1,176 @@
+import datetime
+import hashlib
+import json
+import os
+import tempfile
+import threading
+from collections import OrderedDict
+
+import nbformat
+
+DEFAULT_MAX_SIZE = 1 << 30
+DATE_FIELDS = ("last_modified", "created")
+
+
+def content_validator(model):
+    """[last_modified, size] telling whether a file changed, None when the
+    backend doesn't report when it was modified"""
+    last_modified = model.get("last_modified")
+    if last_modified is None:
+        return None
+    if isinstance(last_modified, datetime.datetime):
+        last_modified = last_modified.isoformat()
+    return [str(last_modified), model.get("size")]
+
+
+def dump_model(model):
+    model = dict(model)
+    for field in DATE_FIELDS:
+        if isinstance(model.get(field), datetime.datetime):
+            model[field] = model[field].isoformat()
+    return json.dumps(model)
+
+
+def load_model(data):
+    model = json.loads(data)
+    for field in DATE_FIELDS:
+        if isinstance(model.get(field), str):
+            model[field] = datetime.datetime.fromisoformat(model[field])
+    if model.get("type") == "notebook" and model.get("content") is not None:
+        model["content"] = nbformat.from_dict(model["content"])
+    return model
+
+
+class DiskContentCache(object):
+    """contents of the files of a mount kept on local disk, least recently
+    used ones deleted past `max_size` bytes
+
+    an entry is a file whose first line holds the proxy path and validator
+    of the model on the second line, so that entries survive restarts and
+    stale ones can be skipped without parsing their content.
+    """
+
+    def __init__(self, proxy_path, directory, max_size=DEFAULT_MAX_SIZE):
+        self.directory = os.path.join(
+            directory, hashlib.sha256(proxy_path.encode()).hexdigest()[:16]
+        )
+        self.max_size = max_size
+        self.hits = 0
+        self.misses = 0
+        self.generation = 0
+        self.total_size = 0
+        # entry name -> (proxy path, bytes), least recently used first
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        os.makedirs(self.directory, exist_ok=True)
+        self._load_index()
+
+    def __len__(self):
+        return len(self._entries)
+
+    def _load_index(self):
+        found = []
+        for entry in os.scandir(self.directory):
+            if entry.name.endswith(".tmp"):
+                # left by a server that stopped while writing
+                self._unlink(entry.name)
+                continue
+            try:
+                with open(entry.path, "rb") as f:
+                    path = json.loads(f.readline())["path"]
+                stat = entry.stat()
+            except (OSError, ValueError, KeyError):
+                self._unlink(entry.name)
+                continue
+            found.append((stat.st_mtime, entry.name, path, stat.st_size))
+        for _, name, path, size in sorted(found):
+            self._entries[name] = (path, size)
+            self.total_size += size
+
+    def _entry_name(self, key):
+        return hashlib.sha256(json.dumps(key).encode()).hexdigest() + ".json"
+
+    def _unlink(self, name):
+        try:
+            os.unlink(os.path.join(self.directory, name))
+        except FileNotFoundError:
+            pass
+
+    def _remove(self, name):
+        path, size = self._entries.pop(name)
+        self.total_size -= size
+        self._unlink(name)
+
+    def get(self, key, validator):
+        """the model cached for key if it still matches validator, else None"""
+        name = self._entry_name(key)
+        filename = os.path.join(self.directory, name)
+        try:
+            with open(filename, "rb") as f:
+                header = json.loads(f.readline())
+                if header["validator"] != validator:
+                    model = None
+                else:
+                    model = load_model(f.read())
+        except (OSError, ValueError, KeyError):
+            model = None
+        with self._lock:
+            if model is None:
+                self.misses += 1
+                if name in self._entries:
+                    self._remove(name)
+                return None
+            self.hits += 1
+            if name in self._entries:
+                self._entries.move_to_end(name)
+        try:
+            # keeps the order of use across restarts
+            os.utime(filename)
+        except OSError:
+            pass
+        return model
+
+    def set(self, key, model, generation=None):
+        """store model under key, its first item being its proxy path, unless
+        the cache was invalidated since `generation`"""
+        validator = content_validator(model)
+        if validator is None:
+            return
+        data = (
+            json.dumps({"path": key[0], "validator": validator}) + "\n"
+        ).encode() + dump_model(model).encode()
+        if len(data) > self.max_size:
+            return
+        name = self._entry_name(key)
+        fd, tmp = tempfile.mkstemp(dir=self.directory, suffix=".tmp")
+        with os.fdopen(fd, "wb") as f:
+            f.write(data)
+        with self._lock:
+            if generation is not None and generation != self.generation:
+                os.unlink(tmp)
+                return
+            os.replace(tmp, os.path.join(self.directory, name))
+            if name in self._entries:
+                self.total_size -= self._entries.pop(name)[1]
+            self._entries[name] = (key[0], len(data))
+            self.total_size += len(data)
+            while self.total_size > self.max_size:
+                self._remove(next(iter(self._entries)))
+
+    def invalidate(self, path):
+        """drop the entries of a path and of everything below it"""
+        path = path.strip("/")
+        prefix = path + "/" if path else ""
+        with self._lock:
+            self.generation += 1
+            for name, (entry_path, _) in list(self._entries.items()):
+                if entry_path == path or entry_path.startswith(prefix):
+                    self._remove(name)
+
+    def stats(self):
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "entries": len(self._entries),
+            "bytes": self.total_size,
+        }
@@ -0,0 +1,99 @@
+import asyncio
+import time
+
+from tornado.web import HTTPError
+
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half_open"
+
+
+class CircuitBreaker(object):
+    """health of a mount's backend
+
+    after `failure_threshold` consecutive failures (errors other than 4xx
+    HTTPErrors, or calls slower than `timeout` seconds) the circuit opens and
+    calls fail right away with a 503. After `reset_timeout` seconds one call
+    is let through as a probe: the circuit closes if it succeeds, and opens
+    again otherwise.
+    """
+
+    def __init__(
+        self, proxy_path, timeout=None, failure_threshold=5, reset_timeout=30.0
+    ):
+        self.proxy_path = proxy_path
+        self.timeout = timeout
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.failures = 0
+        self.opened_at = None
+        self.last_error = None
+        self._probing = False
+
+    @property
+    def state(self):
+        if self.opened_at is None:
+            return CLOSED
+        if self._probing or time.monotonic() - self.opened_at >= self.reset_timeout:
+            return HALF_OPEN
+        return OPEN
+
+    def _before_call(self):
+        state = self.state
+        if state == CLOSED:
+            return False
+        if state == HALF_OPEN and not self._probing:
+            self._probing = True
+            return True
+        raise HTTPError(
+            503,
+            f"Mount '{self.proxy_path}' is unavailable after {self.failures}"
+            f" failures, last: {self.last_error}",
+        )
+
+    def _succeeded(self):
+        self.failures = 0
+        self.opened_at = None
+
+    def _failed(self, error):
+        self.failures += 1
+        self.last_error = error
+        if self.opened_at is not None or self.failures >= self.failure_threshold:
+            self.opened_at = time.monotonic()
+
+    async def call(self, func):
+        """await func() unless the circuit is open"""
+        probe = self._before_call()
+        try:
+            if self.timeout:
+                result = await asyncio.wait_for(func(), self.timeout)
+            else:
+                result = await func()
+        except asyncio.TimeoutError:
+            self._failed(f"timed out after {self.timeout}s")
+            raise HTTPError(
+                504, f"Mount '{self.proxy_path}' timed out after {self.timeout}s"
+            )
+        except HTTPError as e:
+            # the backend answered, e.g. a missing file
+            if e.status_code < 500:
+                self._succeeded()
+            else:
+                self._failed(repr(e))
+            raise
+        except Exception as e:
+            self._failed(repr(e))
+            raise
+        else:
+            self._succeeded()
+            return result
+        finally:
+            if probe:
+                self._probing = False
+
+    def stats(self):
+        return {
+            "state": self.state,
+            "failures": self.failures,
+            "last_error": self.last_error,
+        }
@@ -0,0 +1,157 @@
+import time
+import bisect
+
+from prometheus_client import CollectorRegistry
+from prometheus_client import generate_latest
+from prometheus_client.core import CounterMetricFamily
+from prometheus_client.core import HistogramMetricFamily
+
+LATENCY_BUCKETS = (0.001, 0.005, 0.01, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+def content_bytes(model):
+    """approximate size of the content of a model, 0 for listings"""
+    if not isinstance(model, dict):
+        return 0
+    content = model.get("content")
+    if isinstance(content, str):
+        if model.get("format") == "base64":
+            return len(content) * 3 // 4
+        return len(content)
+    if model.get("type") == "notebook" and content is not None:
+        return model.get("size") or 0
+    return 0
+
+
+class OperationMetrics(object):
+    __slots__ = ("calls", "errors", "seconds", "bytes", "buckets")
+
+    def __init__(self):
+        self.calls = 0
+        self.errors = 0
+        self.seconds = 0.0
+        self.bytes = 0
+        # the last one counts calls slower than every bucket
+        self.buckets = [0] * (len(LATENCY_BUCKETS) + 1)
+
+    def observe(self, seconds, error=False, nbytes=0):
+        self.calls += 1
+        self.errors += error
+        self.seconds += seconds
+        self.bytes += nbytes
+        self.buckets[bisect.bisect_left(LATENCY_BUCKETS, seconds)] += 1
+
+    def cumulative_buckets(self):
+        """[(upper bound, calls at most that slow)] as in prometheus"""
+        total = 0
+        cumulative = []
+        for bound, count in zip(LATENCY_BUCKETS + (float("inf"),), self.buckets):
+            total += count
+            cumulative.append((bound, total))
+        return cumulative
+
+    def to_dict(self):
+        return {
+            "calls": self.calls,
+            "errors": self.errors,
+            "seconds": self.seconds,
+            "bytes": self.bytes,
+            "buckets": self.cumulative_buckets(),
+        }
+
+
+class Measurement(object):
+    """times a block as one call of an operation, set `nbytes` within it to
+    record the bytes transferred"""
+
+    __slots__ = ("metrics", "operation", "nbytes", "start")
+
+    def __init__(self, metrics, operation):
+        self.metrics = metrics
+        self.operation = operation
+        self.nbytes = 0
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.metrics.observe(
+            self.operation,
+            time.perf_counter() - self.start,
+            error=exc_type is not None,
+            nbytes=self.nbytes,
+        )
+        return False
+
+
+class MountMetrics(object):
+    """call counts, errors, latencies and bytes of the operations of a mount"""
+
+    def __init__(self):
+        self.operations = {}
+
+    def observe(self, operation, seconds, error=False, nbytes=0):
+        metrics = self.operations.get(operation)
+        if metrics is None:
+            metrics = self.operations[operation] = OperationMetrics()
+        metrics.observe(seconds, error=error, nbytes=nbytes)
+
+    def measure(self, operation):
+        return Measurement(self, operation)
+
+    def stats(self):
+        return {
+            operation: metrics.to_dict()
+            for operation, metrics in sorted(self.operations.items())
+        }
+
+
+class MountMetricsCollector(object):
+    """prometheus collector of {mount: MountMetrics.stats()}"""
+
+    def __init__(self, mounts):
+        self.mounts = mounts
+
+    def collect(self):
+        labels = ["mount", "operation"]
+        calls = CounterMetricFamily(
+            "multicontents_operations", "Calls to the backend of a mount", labels=labels
+        )
+        errors = CounterMetricFamily(
+            "multicontents_operation_errors",
+            "Calls to the backend of a mount that raised",
+            labels=labels,
+        )
+        transferred = CounterMetricFamily(
+            "multicontents_operation_bytes",
+            "Content bytes read or written by calls to the backend of a mount",
+            labels=labels,
+        )
+        latency = HistogramMetricFamily(
+            "multicontents_operation_seconds",
+            "Latency of calls to the backend of a mount",
+            labels=labels,
+        )
+        for mount, operations in sorted(self.mounts.items()):
+            for operation, stats in sorted(operations.items()):
+                values = [mount, operation]
+                calls.add_metric(values, stats["calls"])
+                errors.add_metric(values, stats["errors"])
+                transferred.add_metric(values, stats["bytes"])
+                latency.add_metric(
+                    values,
+                    [
+                        (str(bound) if bound != float("inf") else "+Inf", count)
+                        for bound, count in stats["buckets"]
+                    ],
+                    stats["seconds"],
+                )
+        return [calls, errors, transferred, latency]
+
+
+def prometheus_text(mounts):
+    """{mount: MountMetrics.stats()} in the prometheus text format"""
+    registry = CollectorRegistry(auto_describe=False)
+    registry.register(MountMetricsCollector(mounts))
+    return generate_latest(registry)
@@ -0,0 +1,112 @@
+"""move a checkpoint tree from the flat to the sharded layout
+
+    python -m multicontents.migrate_checkpoints ROOT_DIR --contents-dir DIR
+
+flat directory names don't tell whether a `_` was a `/` or a `.`, so they are
+matched against the files under the contents directory (ROOT_DIR by default).
+Directories of files that no longer exist are decoded replacing `___` with `.`
+and `__` with `/`. Only run it while no server uses the tree.
+"""
+
+import os
+import sys
+import shutil
+import argparse
+
+from multicontents.multi_versions_file_checkpoints import MANIFEST_NAME
+from multicontents.multi_versions_file_checkpoints import flat_checkpoint_name
+from multicontents.multi_versions_file_checkpoints import (
+    AsyncMultiVersionsFileCheckpoints,
+)
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(
+        prog="python -m multicontents.migrate_checkpoints", description=__doc__
+    )
+    parser.add_argument("root_dir")
+    parser.add_argument("--checkpoint-dir", default=".ipynb_checkpoints")
+    parser.add_argument("--contents-dir", help="defaults to ROOT_DIR")
+    parser.add_argument("--dry-run", action="store_true")
+    return parser.parse_args(argv)
+
+
+def file_paths(contents_dir, skip_dir):
+    """{flat checkpoint directory name: path} of the files in contents_dir"""
+    paths = {}
+    for dirpath, dirnames, filenames in os.walk(contents_dir):
+        dirnames[:] = [
+            name for name in dirnames if os.path.join(dirpath, name) != skip_dir
+        ]
+        parent = os.path.relpath(dirpath, contents_dir).replace(os.sep, "/")
+        for file_name in filenames:
+            path = file_name if parent == "." else f"{parent}/{file_name}"
+            paths.setdefault(flat_checkpoint_name(path), path)
+    return paths
+
+
+def decode_flat_name(name):
+    return name.replace("___", ".").replace("__", "/")
+
+
+def migrate(root_dir, checkpoint_dir, contents_dir=None, dry_run=False):
+    """move every flat checkpoint directory to its sharded location, return
+    [(old directory, new directory)]"""
+    flat = AsyncMultiVersionsFileCheckpoints(
+        root_dir=root_dir, checkpoint_dir=checkpoint_dir, layout="flat"
+    )
+    sharded = AsyncMultiVersionsFileCheckpoints(
+        root_dir=root_dir, checkpoint_dir=checkpoint_dir, layout="sharded"
+    )
+    paths = file_paths(contents_dir or root_dir, os.path.join(root_dir, checkpoint_dir))
+    moved = []
+    for old_dir in flat.checkpoint_dirs():
+        # flat checkpoint directories only hold files, the first level of
+        # the sharded layout only directories
+        if any(entry.is_dir() for entry in os.scandir(old_dir)):
+            continue
+        name = os.path.basename(old_dir)
+        path = paths.get(name) or decode_flat_name(name)
+        new_dir = sharded.get_checkpoints_path_for_file(path)
+        moved.append((old_dir, new_dir))
+        if dry_run:
+            continue
+        if not os.path.isdir(new_dir):
+            os.makedirs(os.path.dirname(new_dir), exist_ok=True)
+            os.rename(old_dir, new_dir)
+        else:
+            # the manifest of new_dir is rebuilt on its next use
+            for file_name in os.listdir(old_dir):
+                if not file_name.startswith("."):
+                    shutil.move(
+                        os.path.join(old_dir, file_name),
+                        os.path.join(new_dir, file_name),
+                    )
+            shutil.rmtree(old_dir)
+            manifest = os.path.join(new_dir, MANIFEST_NAME)
+            if os.path.exists(manifest):
+                os.unlink(manifest)
+        sharded.get_checkpoints_path_for_file(path, create_missing=True)
+    return moved
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    root_dir = os.path.abspath(args.root_dir)
+    moved = migrate(
+        root_dir,
+        args.checkpoint_dir,
+        contents_dir=args.contents_dir and os.path.abspath(args.contents_dir),
+        dry_run=args.dry_run,
+    )
+    for old_dir, new_dir in moved:
+        print(f"{old_dir} -> {new_dir}")
+    print(
+        f"{'would move' if args.dry_run else 'moved'} {len(moved)} "
+        "checkpoint directories"
+    )
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
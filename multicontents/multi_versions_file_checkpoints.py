@@ -1,67 +1,709 @@
 import os
+import json
+import asyncio
+import time
+import base64
+import shutil
+import hashlib
 import datetime
+import functools
+import threading
 
+import nbformat
+from anyio.to_thread import run_sync
 from jupyter_core.utils import ensure_dir_exists
 from jupyter_server.services.contents.filecheckpoints import AsyncGenericFileCheckpoints
+from traitlets import Bool
+from traitlets import Enum
+from traitlets import Float
+from traitlets import Int
+from traitlets import List
+
+from multicontents.checkpoint_store import ObjectStore
+from multicontents.checkpoint_store import load_notebook
+from multicontents.checkpoint_store import notebook_objects
+from multicontents.checkpoint_store import store_notebook
+from multicontents.checkpoint_store import write_atomic
+
+OBJECTS_DIR = ".objects"
+REF_SUFFIX = ".ref"
+MANIFEST_NAME = ".manifest.json"
+PATH_NAME = ".path"
+CHECKPOINT_ID_WIDTH = 16
+
+
+def checkpoint_id_time(checkpoint_id):
+    """the creation time of a checkpoint from its id, None for other ids
+
+    ids are the microseconds since the epoch, 10 digits of seconds and 6 of
+    fraction. Older ids dropped the trailing zeros of the fraction, they are
+    parsed the same way.
+    """
+    if (
+        not checkpoint_id.isdigit()
+        or not 10 < len(checkpoint_id) <= CHECKPOINT_ID_WIDTH
+    ):
+        return None
+    fraction = checkpoint_id[10:]
+    return int(checkpoint_id[:10]) + int(fraction) / 10 ** len(fraction)
+
+
+def flat_checkpoint_name(path):
+    """the checkpoint directory name of a file in the flat layout"""
+    return path.strip("/").replace("/", "__").replace(".", "___")
+
+
+def sharded_checkpoint_name(path):
+    """the checkpoint directory of a file in the sharded layout, relative to
+    checkpoint_dir"""
+    digest = hashlib.sha256(path.strip("/").encode("utf-8")).hexdigest()
+    return os.path.join(digest[:2], digest[2:4], digest)
+
+
+def _index_order(entry):
+    timestamp = checkpoint_id_time(entry["id"])
+    if timestamp is None:
+        timestamp = entry["last_modified"]
+    return (-timestamp, entry["id"])
+
+
+def expired_checkpoints(checkpoints, now, max_count=0, max_age=0, tiers=()):
+    """return the ids to delete from `(id, timestamp)` pairs
+
+    `tiers` are `(interval, keep_for)` pairs in seconds: a checkpoint younger
+    than `keep_for` is kept if it is the newest one of its `interval` bucket,
+    using the tier with the smallest `keep_for` that still covers it. The
+    newest checkpoint is always kept.
+    """
+    tiers = sorted((tuple(tier) for tier in tiers), key=lambda tier: tier[1])
+    expired = []
+    kept = 0
+    buckets = set()
+    for index, (checkpoint_id, timestamp) in enumerate(
+        sorted(checkpoints, key=lambda c: -c[1])
+    ):
+        age = now - timestamp
+        tier = next((tier for tier in tiers if age <= tier[1]), None)
+        bucket = None
+        if tier is not None and tier[0]:
+            bucket = (tier, int(timestamp // tier[0]))
+        if index and (
+            (max_age and age > max_age)
+            or (tiers and tier is None)
+            or (bucket is not None and bucket in buckets)
+            or (max_count and kept >= max_count)
+        ):
+            expired.append(checkpoint_id)
+            continue
+        kept += 1
+        buckets.add(bucket)
+    return expired
 
 
 class AsyncMultiVersionsFileCheckpoints(AsyncGenericFileCheckpoints):
+    max_checkpoints = Int(
+        0,
+        config=True,
+        help="Maximum number of checkpoints kept per file, 0 for no limit.",
+    )
+    max_checkpoint_age = Float(
+        0,
+        config=True,
+        help="Delete checkpoints older than this many seconds, 0 for no limit.",
+    )
+    retention_tiers = List(
+        config=True,
+        help="""(interval, keep_for) pairs in seconds, e.g.
+        [(3600, 86400), (86400, 30 * 86400)] keeps one checkpoint per hour for
+        a day and one per day for a month. Empty keeps every checkpoint.""",
+    )
+
+    storage_mode = Enum(
+        ["copy", "content_addressed", "cells"],
+        "copy",
+        config=True,
+        help="""copy: every checkpoint is a full copy of the file.
+        content_addressed: checkpoints reference a blob stored once per
+        content hash, and saving unchanged content adds no new checkpoint.
+        cells: content_addressed, with the cells and outputs of notebooks
+        stored as separate blobs, so that versions share unchanged cells.""",
+    )
+    compression = Enum(
+        [None, "gzip", "zstd"],
+        None,
+        allow_none=True,
+        config=True,
+        help="Compression of content addressed blobs, zstd needs zstandard.",
+    )
+
+    layout = Enum(
+        ["flat", "sharded"],
+        "flat",
+        config=True,
+        help="""flat: one directory per file under checkpoint_dir, named after
+        its path. sharded: directories named by the sha256 of the path,
+        under two levels of 256 directories, with the path in a `.path`
+        file. Convert a flat tree with `python -m
+        multicontents.migrate_checkpoints`.""",
+    )
+
+    write_behind = Bool(
+        False,
+        config=True,
+        help="""Return from creating a checkpoint before it is written, and
+        write it from a background task. When a file is checkpointed again
+        before that, only the latest content is written, under the id that
+        was returned first. Enable the multicontents server extension to
+        write pending checkpoints when the server stops.""",
+    )
+    write_behind_queue_size = Int(
+        100,
+        config=True,
+        help="Files with a pending checkpoint before creating more waits.",
+    )
+    list_checkpoints_limit = Int(
+        0,
+        config=True,
+        help="Only list the most recent checkpoints of a file, 0 for no limit.",
+    )
+
+    def __init__(self, **kwargs):
+        super().__init__(**kwargs)
+        # checkpoint_dir -> (id, ref) of its newest content addressed checkpoint
+        self._latest_refs = {}
+        self._object_store = None
+        # checkpoint directories known to exist
+        self._checkpoint_dirs = set()
+        self._last_id = 0
+        self._id_lock = threading.Lock()
+        # write behind: path -> (checkpoint id, kind, args) waiting to be
+        # written in insertion order, and path -> future of the write in
+        # progress
+        self._pending = {}
+        self._writing = {}
+        self._dequeued = asyncio.Event()
+        self._worker = None
+
+    @property
+    def object_store(self):
+        if self._object_store is None:
+            self._object_store = ObjectStore(
+                os.path.join(self.root_dir, self.checkpoint_dir, OBJECTS_DIR),
+                self.compression,
+            )
+        return self._object_store
+
+    @property
+    def has_retention_policy(self):
+        return bool(
+            self.max_checkpoints or self.max_checkpoint_age or self.retention_tiers
+        )
+
     def checkpoint_path(self, checkpoint_id, path):
         """find the path to a checkpoint"""
         checkpoint_dir = self.get_checkpoints_path_for_file(path)
         with self.perm_to_403():
-            ensure_dir_exists(checkpoint_dir)
+            self._ensure_checkpoint_dir(checkpoint_dir, path)
         cp_path = os.path.join(checkpoint_dir, checkpoint_id)
         return cp_path
 
+    def _ensure_checkpoint_dir(self, checkpoint_dir, path):
+        if checkpoint_dir in self._checkpoint_dirs:
+            return
+        ensure_dir_exists(checkpoint_dir)
+        path_file = os.path.join(checkpoint_dir, PATH_NAME)
+        if self.layout == "sharded" and not os.path.isfile(path_file):
+            write_atomic(path_file, path.strip("/").encode("utf-8"))
+        self._checkpoint_dirs.add(checkpoint_dir)
+
     def get_checkpoints_path_for_file(self, path, create_missing=False):
-        path = path.strip("/")
-        checkpoint_dir = os.path.join(
-            self.root_dir,
-            self.checkpoint_dir,
-            path.replace("/", "__").replace(".", "___"),
-        )
-        if create_missing and not os.path.isdir(checkpoint_dir):
-            os.makedirs(checkpoint_dir, exist_ok=True)
+        if self.layout == "sharded":
+            name = sharded_checkpoint_name(path)
+        else:
+            name = flat_checkpoint_name(path)
+        checkpoint_dir = os.path.join(self.root_dir, self.checkpoint_dir, name)
+        if create_missing:
+            self._ensure_checkpoint_dir(checkpoint_dir, path)
         return checkpoint_dir
 
-    def get_checkpoint_dir_and_id(self, path, create_missing=False):
+    def checkpoint_dirs(self):
+        """the checkpoint directories of every file, sorted"""
+        dirs = [os.path.join(self.root_dir, self.checkpoint_dir)]
+        for _ in range(3 if self.layout == "sharded" else 1):
+            dirs = [
+                entry.path
+                for parent in dirs
+                if os.path.isdir(parent)
+                for entry in sorted(os.scandir(parent), key=lambda e: e.name)
+                if not entry.name.startswith(".") and entry.is_dir()
+            ]
+        return dirs
+
+    def new_checkpoint_id(self):
+        """a fixed width id, sorting after every id this instance returned"""
+        with self._id_lock:
+            self._last_id = max(time.time_ns() // 1000, self._last_id + 1)
+            return f"{self._last_id:0{CHECKPOINT_ID_WIDTH}d}"
+
+    def get_checkpoint_dir_and_id(self, path, create_missing=False, checkpoint_id=None):
         checkpoint_dir = self.get_checkpoints_path_for_file(
             path, create_missing=create_missing
         )
-        saved_time = datetime.datetime.now(datetime.timezone.utc)
-        checkpoint_id = str(saved_time.timestamp()).replace(".", "")
+        if checkpoint_id is None:
+            checkpoint_id = self.new_checkpoint_id()
         return checkpoint_dir, checkpoint_id
 
+    def prune_checkpoint_dir(self, checkpoint_dir, now=None, dry_run=False):
+        """apply the retention policy to one file's checkpoints, return the
+        deleted ids"""
+        if not self.has_retention_policy or not os.path.isdir(checkpoint_dir):
+            return []
+        index = self._load_index(checkpoint_dir)
+        expired = expired_checkpoints(
+            [(entry["entry"], entry["last_modified"]) for entry in index],
+            time.time() if now is None else now,
+            max_count=self.max_checkpoints,
+            max_age=self.max_checkpoint_age,
+            tiers=self.retention_tiers,
+        )
+        if not dry_run:
+            for checkpoint_id in expired:
+                self.log.debug(
+                    "pruning checkpoint %s/%s", checkpoint_dir, checkpoint_id
+                )
+                try:
+                    os.unlink(os.path.join(checkpoint_dir, checkpoint_id))
+                except FileNotFoundError:
+                    pass
+            if expired:
+                self._update_index(checkpoint_dir, removed=expired)
+        return expired
+
+    async def prune_checkpoints(self, path):
+        checkpoint_dir = self.get_checkpoints_path_for_file(path)
+        with self.perm_to_403():
+            return await run_sync(self.prune_checkpoint_dir, checkpoint_dir)
+
+    def _index_entry(self, checkpoint_dir, file_name):
+        stats = os.stat(os.path.join(checkpoint_dir, file_name))
+        return {
+            "id": file_name.removesuffix(REF_SUFFIX),
+            "entry": file_name,
+            "last_modified": stats.st_mtime,
+            "size": stats.st_size,
+        }
+
+    def _write_index(self, checkpoint_dir, index):
+        index.sort(key=_index_order)
+        write_atomic(
+            os.path.join(checkpoint_dir, MANIFEST_NAME),
+            json.dumps({"checkpoints": index}).encode("utf-8"),
+        )
+        return index
+
+    def _rebuild_index(self, checkpoint_dir):
+        self.log.debug("rebuilding the checkpoint manifest of %s", checkpoint_dir)
+        index = []
+        for file_name in os.listdir(checkpoint_dir):
+            if file_name.startswith("."):
+                continue
+            try:
+                index.append(self._index_entry(checkpoint_dir, file_name))
+            except FileNotFoundError:
+                pass
+        return self._write_index(checkpoint_dir, index)
+
+    def _load_index(self, checkpoint_dir):
+        """the checkpoints of one file, newest first, from its manifest
+
+        the manifest is rebuilt when missing or when its entries don't match
+        the directory, e.g. after a crash or a concurrent write.
+        """
+        try:
+            with open(os.path.join(checkpoint_dir, MANIFEST_NAME)) as fp:
+                index = json.load(fp)["checkpoints"]
+        except (OSError, ValueError, KeyError):
+            return self._rebuild_index(checkpoint_dir)
+        file_names = {
+            file_name
+            for file_name in os.listdir(checkpoint_dir)
+            if not file_name.startswith(".")
+        }
+        if {entry["entry"] for entry in index} != file_names:
+            return self._rebuild_index(checkpoint_dir)
+        return index
+
+    def _update_index(self, checkpoint_dir, added=(), removed=()):
+        try:
+            with open(os.path.join(checkpoint_dir, MANIFEST_NAME)) as fp:
+                index = json.load(fp)["checkpoints"]
+        except (OSError, ValueError, KeyError):
+            self._rebuild_index(checkpoint_dir)
+            return
+        removed = set(removed) | set(added)
+        index = [entry for entry in index if entry["entry"] not in removed]
+        for file_name in added:
+            try:
+                index.append(self._index_entry(checkpoint_dir, file_name))
+            except FileNotFoundError:
+                pass
+        self._write_index(checkpoint_dir, index)
+
+    async def _checkpoint_created(self, path, checkpoint_dir, file_name):
+        with self.perm_to_403():
+            await run_sync(
+                functools.partial(self._update_index, checkpoint_dir, added=[file_name])
+            )
+        await self.prune_checkpoints(path)
+
+    def _ref_path(self, checkpoint_id, path):
+        """path of a content addressed checkpoint, None for a full copy"""
+        ref_path = os.path.join(
+            self.get_checkpoints_path_for_file(path), checkpoint_id + REF_SUFFIX
+        )
+        return ref_path if os.path.isfile(ref_path) else None
+
+    def _read_ref(self, ref_path):
+        with open(ref_path) as fp:
+            return json.load(fp)
+
+    def _latest_ref(self, checkpoint_dir):
+        """(id, ref) of the newest checkpoint if it is content addressed"""
+        latest = self._latest_refs.get(checkpoint_dir)
+        if latest is not None and os.path.isfile(
+            os.path.join(checkpoint_dir, latest[0] + REF_SUFFIX)
+        ):
+            return latest
+        index = self._load_index(checkpoint_dir)
+        if not index or not index[0]["entry"].endswith(REF_SUFFIX):
+            return None
+        return (
+            index[0]["id"],
+            self._read_ref(os.path.join(checkpoint_dir, index[0]["entry"])),
+        )
+
+    def _store_ref(self, checkpoint_dir, checkpoint_id, data, ref, reuse=True):
+        """store data, return the id of the checkpoint referencing it
+
+        with `reuse`, unchanged content returns the newest checkpoint instead
+        of writing a new one.
+        """
+        ref["object"] = self.object_store.hash(data)
+        latest = self._latest_ref(checkpoint_dir) if reuse else None
+        if latest is not None and latest[1] == ref:
+            self.log.debug("content unchanged since checkpoint %s", latest[0])
+            return latest[0]
+        self.object_store.put(data)
+        with open(os.path.join(checkpoint_dir, checkpoint_id + REF_SUFFIX), "w") as fp:
+            json.dump(ref, fp)
+        self._latest_refs[checkpoint_dir] = (checkpoint_id, ref)
+        return checkpoint_id
+
+    async def _create_ref_checkpoint(self, path, data, ref, checkpoint_id=None):
+        # an id handed out by write behind must exist, even for unchanged content
+        reuse = checkpoint_id is None
+        checkpoint_dir, checkpoint_id = self.get_checkpoint_dir_and_id(
+            path, create_missing=True, checkpoint_id=checkpoint_id
+        )
+        with self.perm_to_403():
+            stored_id = await run_sync(
+                self._store_ref, checkpoint_dir, checkpoint_id, data, ref, reuse
+            )
+        model = await self.checkpoint_model(
+            stored_id, os.path.join(checkpoint_dir, stored_id + REF_SUFFIX)
+        )
+        if stored_id == checkpoint_id:
+            await self._checkpoint_created(
+                path, checkpoint_dir, checkpoint_id + REF_SUFFIX
+            )
+        return model
+
+    async def _read_ref_checkpoint(self, ref_path):
+        ref = await run_sync(self._read_ref, ref_path)
+        return ref, await run_sync(self.object_store.get, ref["object"])
+
     async def create_file_checkpoint(self, content, format, path):
+        if self.write_behind:
+            return await self._enqueue(path, "file", (content, format))
+        return await self._write_file_checkpoint(content, format, path)
+
+    async def create_notebook_checkpoint(self, nb, path):
+        if self.write_behind:
+            return await self._enqueue(path, "notebook", (nb,))
+        return await self._write_notebook_checkpoint(nb, path)
+
+    async def _write_file_checkpoint(self, content, format, path, checkpoint_id=None):
+        if self.storage_mode != "copy":
+            if format == "text":
+                data = content.encode("utf-8")
+            else:
+                data = base64.b64decode(content)
+            return await self._create_ref_checkpoint(
+                path, data, {"type": "file", "format": format}, checkpoint_id
+            )
         checkpoint_dir, checkpoint_id = self.get_checkpoint_dir_and_id(
-            path, create_missing=True
+            path, create_missing=True, checkpoint_id=checkpoint_id
         )
         checkpoint_file_path = os.path.join(checkpoint_dir, checkpoint_id)
         self.log.debug("creating checkpoint for %s", path)
         with self.perm_to_403():
             await self._save_file(checkpoint_file_path, content, format=format)
-        return await self.checkpoint_model(checkpoint_id, checkpoint_file_path)
+        model = await self.checkpoint_model(checkpoint_id, checkpoint_file_path)
+        await self._checkpoint_created(path, checkpoint_dir, checkpoint_id)
+        return model
 
-    async def create_notebook_checkpoint(self, nb, path):
+    async def _write_notebook_checkpoint(self, nb, path, checkpoint_id=None):
+        if self.storage_mode == "cells":
+            with self.perm_to_403():
+                data = await run_sync(store_notebook, self.object_store, nb)
+            return await self._create_ref_checkpoint(
+                path, data, {"type": "notebook", "format": "cells"}, checkpoint_id
+            )
+        if self.storage_mode == "content_addressed":
+            data = nbformat.writes(nb, version=nbformat.NO_CONVERT).encode("utf-8")
+            return await self._create_ref_checkpoint(
+                path, data, {"type": "notebook"}, checkpoint_id
+            )
         checkpoint_dir, checkpoint_id = self.get_checkpoint_dir_and_id(
-            path, create_missing=True
+            path, create_missing=True, checkpoint_id=checkpoint_id
         )
         checkpoint_file_path = os.path.join(checkpoint_dir, checkpoint_id)
         self.log.debug("creating checkpoint for %s", path)
         with self.perm_to_403():
             await self._save_notebook(checkpoint_file_path, nb)
-        return await self.checkpoint_model(checkpoint_id, checkpoint_file_path)
+        model = await self.checkpoint_model(checkpoint_id, checkpoint_file_path)
+        await self._checkpoint_created(path, checkpoint_dir, checkpoint_id)
+        return model
+
+    @property
+    def queue_depth(self):
+        """number of checkpoints waiting to be written"""
+        return len(self._pending) + len(self._writing)
+
+    async def _enqueue(self, path, kind, args):
+        path = path.strip("/")
+        if path in self._pending:
+            # keep the id that was already handed out, with the newest content
+            checkpoint_id = self._pending[path][0]
+        else:
+            while len(self._pending) >= self.write_behind_queue_size:
+                self._dequeued.clear()
+                await self._dequeued.wait()
+            _, checkpoint_id = self.get_checkpoint_dir_and_id(path)
+        self._pending[path] = (checkpoint_id, kind, args)
+        if self._worker is None or self._worker.done():
+            self._worker = asyncio.ensure_future(self._write_queued())
+        return {
+            "id": checkpoint_id,
+            "last_modified": datetime.datetime.now(datetime.timezone.utc),
+        }
+
+    async def _write_queued(self):
+        # oldest first, exits once nothing is pending
+        while self._pending:
+            await self._write_pending(next(iter(self._pending)))
+
+    async def _write_pending(self, path):
+        entry = self._pending.pop(path)
+        self._dequeued.set()
+        checkpoint_id, kind, args = entry
+        written = self._writing[path] = asyncio.get_running_loop().create_future()
+        try:
+            if kind == "notebook":
+                await self._write_notebook_checkpoint(*args, path, checkpoint_id)
+            else:
+                await self._write_file_checkpoint(*args, path, checkpoint_id)
+        except asyncio.CancelledError:
+            # keep it for the next flush unless newer content replaced it
+            self._pending.setdefault(path, entry)
+            raise
+        except Exception:
+            self.log.exception("failed to write checkpoint %s", path)
+        finally:
+            del self._writing[path]
+            written.set_result(None)
+
+    async def _settle(self, path):
+        """write the pending checkpoint of a file now"""
+        path = path.strip("/")
+        while path in self._writing or path in self._pending:
+            if path in self._writing:
+                await self._writing[path]
+            else:
+                await self._write_pending(path)
+
+    async def flush(self):
+        """write every pending checkpoint"""
+        while self._writing or self._pending:
+            await self._settle(next(iter(self._writing or self._pending)))
+
+    async def shutdown(self):
+        """write every pending checkpoint and stop the background writer
+
+        called by the multicontents server extension when the server stops.
+        """
+        await self.flush()
+        if self._worker is not None and not self._worker.done():
+            await self._worker
+        self._worker = None
+
+    async def get_file_checkpoint(self, checkpoint_id, path):
+        await self._settle(path)
+        ref_path = self._ref_path(checkpoint_id, path)
+        if ref_path is None:
+            return await super().get_file_checkpoint(checkpoint_id, path)
+        ref, data = await self._read_ref_checkpoint(ref_path)
+        if ref["format"] == "text":
+            content = data.decode("utf-8")
+        else:
+            content = base64.encodebytes(data).decode("ascii")
+        return {"type": "file", "content": content, "format": ref["format"]}
 
-    async def list_checkpoints(self, path):
+    async def get_notebook_checkpoint(self, checkpoint_id, path):
+        await self._settle(path)
+        ref_path = self._ref_path(checkpoint_id, path)
+        if ref_path is None:
+            return await super().get_notebook_checkpoint(checkpoint_id, path)
+        ref, data = await self._read_ref_checkpoint(ref_path)
+        if ref.get("format") == "cells":
+            nb = await run_sync(load_notebook, self.object_store, data)
+            data = json.dumps(nb).encode("utf-8")
+        return {
+            "type": "notebook",
+            "content": nbformat.reads(data.decode("utf-8"), as_version=4),
+        }
+
+    async def rename_checkpoint(self, checkpoint_id, old_path, new_path):
+        await self._settle(old_path)
+        ref_path = self._ref_path(checkpoint_id, old_path)
+        if ref_path is None:
+            await super().rename_checkpoint(checkpoint_id, old_path, new_path)
+            file_name = checkpoint_id
+        else:
+            new_ref_path = self.checkpoint_path(checkpoint_id + REF_SUFFIX, new_path)
+            with self.perm_to_403():
+                await run_sync(shutil.move, ref_path, new_ref_path)
+            file_name = checkpoint_id + REF_SUFFIX
+        old_dir = self.get_checkpoints_path_for_file(old_path)
+        new_dir = self.get_checkpoints_path_for_file(new_path)
+        self._latest_refs.pop(old_dir, None)
+        self._latest_refs.pop(new_dir, None)
+        with self.perm_to_403():
+            await run_sync(
+                functools.partial(self._update_index, old_dir, removed=[file_name])
+            )
+            await run_sync(
+                functools.partial(self._update_index, new_dir, added=[file_name])
+            )
+
+    async def delete_checkpoint(self, checkpoint_id, path):
+        await self._settle(path)
+        ref_path = self._ref_path(checkpoint_id, path)
+        if ref_path is None:
+            await super().delete_checkpoint(checkpoint_id, path)
+            file_name = checkpoint_id
+        else:
+            with self.perm_to_403():
+                await run_sync(os.unlink, ref_path)
+            file_name = checkpoint_id + REF_SUFFIX
+        checkpoint_dir = self.get_checkpoints_path_for_file(path)
+        self._latest_refs.pop(checkpoint_dir, None)
+        with self.perm_to_403():
+            await run_sync(
+                functools.partial(
+                    self._update_index, checkpoint_dir, removed=[file_name]
+                )
+            )
+
+    def _move_checkpoints(self, old_dir, new_dir, new_path):
+        file_names = [entry["entry"] for entry in self._load_index(old_dir)]
+        self._ensure_checkpoint_dir(new_dir, new_path)
+        for file_name in file_names:
+            shutil.move(
+                os.path.join(old_dir, file_name), os.path.join(new_dir, file_name)
+            )
+        self._update_index(old_dir, removed=file_names)
+        self._update_index(new_dir, added=file_names)
+
+    def _delete_checkpoints(self, checkpoint_dir):
+        file_names = [entry["entry"] for entry in self._load_index(checkpoint_dir)]
+        for file_name in file_names:
+            try:
+                os.unlink(os.path.join(checkpoint_dir, file_name))
+            except FileNotFoundError:
+                pass
+        self._update_index(checkpoint_dir, removed=file_names)
+
+    async def rename_all_checkpoints(self, old_path, new_path):
+        """move every checkpoint of a file, beyond list_checkpoints_limit,
+        rewriting each manifest once"""
+        await self._settle(old_path)
+        old_dir = self.get_checkpoints_path_for_file(old_path)
+        if not os.path.isdir(old_dir):
+            return
+        new_dir = self.get_checkpoints_path_for_file(new_path)
+        self._latest_refs.pop(old_dir, None)
+        self._latest_refs.pop(new_dir, None)
+        with self.perm_to_403():
+            await run_sync(self._move_checkpoints, old_dir, new_dir, new_path)
+
+    async def delete_all_checkpoints(self, path):
+        await self._settle(path)
         checkpoint_dir = self.get_checkpoints_path_for_file(path)
         if not os.path.isdir(checkpoint_dir):
+            return
+        self._latest_refs.pop(checkpoint_dir, None)
+        with self.perm_to_403():
+            await run_sync(self._delete_checkpoints, checkpoint_dir)
+
+    def collect_garbage(self, dry_run=False):
+        """delete the blobs no checkpoint references anymore, return their
+        hashes
+
+        meant to run offline, e.g. from prune_checkpoints: a blob stored by a
+        concurrent save is not referenced until its checkpoint is written.
+        """
+        store = self.object_store
+        if not os.path.isdir(store.root):
             return []
-        checkpoints = []
-        for file_name in os.listdir(checkpoint_dir):
-            checkpoint = await self.checkpoint_model(
-                file_name,
-                os.path.join(self.get_checkpoints_path_for_file(path), file_name),
-            )
-            checkpoints.append(checkpoint)
-        return sorted(checkpoints, key=lambda c: -c["last_modified"].timestamp())
+        referenced = set()
+        for checkpoint_dir in self.checkpoint_dirs():
+            for file_name in os.listdir(checkpoint_dir):
+                if file_name.endswith(REF_SUFFIX):
+                    ref = self._read_ref(os.path.join(checkpoint_dir, file_name))
+                    if ref["object"] in referenced:
+                        continue
+                    referenced.add(ref["object"])
+                    if ref.get("format") == "cells":
+                        referenced.update(
+                            notebook_objects(store, store.get(ref["object"]))
+                        )
+        unreferenced = sorted(set(store.digests()) - referenced)
+        if not dry_run:
+            for digest in unreferenced:
+                store.delete(digest)
+        return unreferenced
+
+    async def list_checkpoints(self, path, limit=None, offset=0):
+        """list the checkpoints of a file, newest first
+
+        `limit` defaults to `list_checkpoints_limit`.
+        """
+        await self._settle(path)
+        checkpoint_dir = self.get_checkpoints_path_for_file(path)
+        if not os.path.isdir(checkpoint_dir):
+            return []
+        with self.perm_to_403():
+            index = await run_sync(self._load_index, checkpoint_dir)
+        if limit is None:
+            limit = self.list_checkpoints_limit or len(index)
+        end = offset + limit
+        return [
+            {
+                "id": entry["id"],
+                "last_modified": datetime.datetime.fromtimestamp(
+                    entry["last_modified"], datetime.timezone.utc
+                ),
+            }
+            for entry in index[offset:end]
+        ]
@@ -1,16 +1,45 @@
-import os
-import re
+import asyncio
+import collections
+import contextlib
+import copy
 import datetime
+import functools
 import importlib
+import inspect
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
 
 from jupyter_core.utils import ensure_async
 from tornado.web import HTTPError
+from traitlets import Bool
+from traitlets import Callable
 from traitlets import Dict
+from traitlets import Enum
+from traitlets import Float
+from traitlets import Int
+from traitlets import observe
 
 from jupyter_server.services.contents.manager import AsyncContentsManager
+from jupyter_server.services.contents.manager import copy_pat
 from multicontents.multi_versions_file_checkpoints import (
     AsyncMultiVersionsFileCheckpoints,
 )
+from multicontents.cache import MISSING
+from multicontents.cache import SingleFlight
+from multicontents.cache import TTLCache
+from multicontents.content_cache import DiskContentCache
+from multicontents.content_cache import content_validator
+from multicontents.health import CircuitBreaker
+from multicontents.metrics import MountMetrics
+from multicontents.metrics import content_bytes
+from multicontents.router import MountRouter
+from multicontents.router import parameter_name
+from multicontents.router import split_path
+from multicontents.transfer import DEFAULT_CHUNK_SIZE
+from multicontents.transfer import TreeTransfer
+from multicontents.transfer import fast_transfer
+from multicontents.transfer import stream_file
 
 DUMMY_CREATED_DATE = datetime.datetime.fromtimestamp(86400)
 
@@ -38,88 +67,439 @@ def build_base_model(
     }
 
 
-class WrapperManager(object):
-    def __init__(self, proxy_path, manager_class, manager_kwargs):
-        self.proxy_path = proxy_path
-        if isinstance(manager_class, str):
-            module_name, cls_name = manager_class.rsplit(".", 1)
-            manager_class = getattr(importlib.import_module(module_name), cls_name)
-        self.manager = manager_class(**manager_kwargs)
+def copy_model(model):
+    return dict(model) if isinstance(model, dict) else model
 
-    def is_parent_directory_of(self, path):
-        path = path.strip("/")
-        proxy_folders = self.proxy_path.split("/") if self.proxy_path != "" else []
-        path_folders = path.lstrip("/").split("/")
-        return len(path_folders) >= len(proxy_folders) and "/".join(
-            proxy_folders
-        ) == "/".join(path_folders[: len(proxy_folders)])
 
-    def is_sub_directory_of(self, path):
-        path = path.strip("/")
-        proxy_parent = ("/" + self.proxy_path).rsplit("/", 1)[0]
-        return (
-            proxy_parent.lstrip("/") == path.lstrip("/")
-            and path.lstrip("/") != self.proxy_path
+def clone_model(model):
+    """copy of a model whose content, e.g. a listing, can be changed apart"""
+    model = copy_model(model)
+    if isinstance(model, dict) and isinstance(model.get("content"), (dict, list)):
+        model["content"] = copy.deepcopy(model["content"])
+    return model
+
+
+def import_class(cls):
+    """resolve "module.ClassName" strings, classes are returned as is"""
+    if isinstance(cls, str):
+        module_name, cls_name = cls.rsplit(".", 1)
+        return getattr(importlib.import_module(module_name), cls_name)
+    return cls
+
+
+class WrapperManager(object):
+    def __init__(
+        self,
+        proxy_path,
+        manager_class,
+        manager_kwargs,
+        cache=None,
+        executor_workers=None,
+        checkpoints=None,
+        metrics=False,
+        lazy=False,
+        health=None,
+        single_flight=False,
+        content_cache=None,
+    ):
+        self.proxy_path = proxy_path
+        self._proxy_prefix = f"{proxy_path}/" if proxy_path else ""
+        self._manager_class = manager_class
+        self._manager_kwargs = manager_kwargs
+        self._manager = None
+        self._init_lock = threading.Lock()
+        self.init_seconds = None
+        self.init_error = None
+        if not lazy:
+            self.init_manager()
+        self.checkpoints = (
+            import_class(checkpoints["class"])(**checkpoints.get("kwargs", {}))
+            if checkpoints is not None
+            else None
+        )
+        self.cache = TTLCache(**cache) if cache is not None else None
+        self.metrics = MountMetrics() if metrics else None
+        self.flights = SingleFlight() if single_flight else None
+        self.content_cache = (
+            DiskContentCache(proxy_path, **content_cache)
+            if content_cache is not None
+            else None
+        )
+        self.breaker = (
+            CircuitBreaker(proxy_path, **health) if health is not None else None
+        )
+        self.executor = (
+            ThreadPoolExecutor(
+                max_workers=executor_workers,
+                thread_name_prefix=f"multicontents-{proxy_path or 'root'}",
+            )
+            if executor_workers
+            else None
         )
 
+    def close(self):
+        if self.executor is not None:
+            self.executor.shutdown(wait=False)
+
+    def init_manager(self):
+        """create the backend unless it exists, recording how long it took
+        or why it failed, which is raised again on later calls"""
+        with self._init_lock:
+            if self._manager is None:
+                if self.init_error is not None:
+                    raise self.init_error
+                start = time.perf_counter()
+                try:
+                    self._manager = import_class(self._manager_class)(
+                        **self._manager_kwargs
+                    )
+                except Exception as e:
+                    self.init_error = e
+                    raise
+                finally:
+                    self.init_seconds = time.perf_counter() - start
+            return self._manager
+
+    @property
+    def manager(self):
+        if self._manager is not None:
+            return self._manager
+        try:
+            return self.init_manager()
+        except Exception as e:
+            raise HTTPError(
+                503, f"Mount '{self.proxy_path}' is unavailable: {e!r}"
+            ) from e
+
+    @manager.setter
+    def manager(self, manager):
+        self._manager = manager
+
+    async def load(self):
+        """create the backend of a lazy mount off the event loop"""
+        if self._manager is None:
+            await asyncio.get_running_loop().run_in_executor(
+                self.executor, lambda: self.manager
+            )
+
     def to_actual_path(self, path):
         path = path.strip("/")
-        if re.match(f"^{re.escape(self.proxy_path)}$", path):
+        if path == self.proxy_path:
             return ""
-        return re.sub(f"^{re.escape(self.proxy_path)}/", r"/", path).strip("/")
+        return path.removeprefix(self._proxy_prefix).strip("/")
 
     def to_proxy_path(self, actual_path):
         actual_path = actual_path.strip("/")
-        return os.path.join(self.proxy_path, actual_path).strip("/")
+        if not actual_path:
+            return self.proxy_path
+        return self._proxy_prefix + actual_path
+
+    def to_proxy_models(self, models):
+        """rewrite the paths of a listing's models in place"""
+        prefix = self._proxy_prefix
+        for model in models:
+            model["path"] = prefix + model["path"].strip("/")
+        return models
+
+    async def _call(self, name, *args, **kwargs):
+        """call a backend method, off the event loop if it is synchronous"""
+        await self.load()
+        method = getattr(self.manager, name)
+        if self.breaker is None:
+            return await self._measured_run(name, method, args, kwargs)
+        return await self.breaker.call(
+            lambda: self._measured_run(name, method, args, kwargs)
+        )
 
-    async def get(self, path, *args, **kwargs):
-        result = await ensure_async(
-            self.manager.get(self.to_actual_path(path), *args, **kwargs)
+    async def _measured_run(self, name, method, args, kwargs):
+        if self.metrics is None:
+            return await self.run(method, *args, **kwargs)
+        with self.metrics.measure(name) as measurement:
+            result = await self.run(method, *args, **kwargs)
+            measurement.nbytes = content_bytes(args[0] if name == "save" else result)
+        return result
+
+    def measure(self, operation):
+        """time a block as a call of `operation` when collecting metrics"""
+        if self.metrics is None:
+            return contextlib.nullcontext()
+        return self.metrics.measure(operation)
+
+    async def run(self, method, *args, **kwargs):
+        if self.executor is None or inspect.iscoroutinefunction(method):
+            return await ensure_async(method(*args, **kwargs))
+        result = await asyncio.get_running_loop().run_in_executor(
+            self.executor, functools.partial(method, *args, **kwargs)
         )
+        return await ensure_async(result)
+
+    async def _cached(self, path, key, func, *args, **kwargs):
+        if self.cache is None:
+            return await self._shared(path, key, func, *args, **kwargs)
+        cache_key = (path.strip("/"),) + key
+        value = self.cache.get(cache_key)
+        if value is MISSING:
+            generation = self.cache.generation
+            value = await self._shared(path, key, func, *args, **kwargs)
+            self.cache.set(cache_key, value, generation=generation)
+        return copy_model(value)
+
+    async def _shared(self, path, key, func, *args, **kwargs):
+        """join an identical call in flight when single_flight is enabled"""
+        if self.flights is None:
+            return await func(*args, **kwargs)
+        result, shared = await self.flights.do(
+            (path.strip("/"),) + key, lambda: func(*args, **kwargs)
+        )
+        # every caller may change the model it gets
+        return clone_model(result) if shared else result
+
+    def invalidate(self, path):
+        if self.cache is not None:
+            self.cache.invalidate(path)
+        if self.flights is not None:
+            self.flights.forget(path)
+        if self.content_cache is not None:
+            self.content_cache.invalidate(path)
+
+    async def get(self, path, *args, **kwargs):
+        key = ("get",) + args + tuple(sorted(kwargs.items()))
+        # metadata lookups are cached in memory, file contents on disk
+        if not args and not kwargs.get("content", True):
+            return await self._cached(path, key, self._get, path, **kwargs)
+        if self.content_cache is not None and not args:
+            return await self._shared(path, key, self._disk_cached_get, path, **kwargs)
+        return await self._shared(path, key, self._get, path, *args, **kwargs)
+
+    async def _disk_cached_get(self, path, **kwargs):
+        """the content of a file from the disk cache if its last_modified and
+        size didn't change since it was stored"""
+        metadata = await self.get(path, content=False)
+        validator = content_validator(metadata)
+        if metadata.get("type") == "directory" or validator is None:
+            return await self._get(path, **kwargs)
+        key = (path.strip("/"),) + tuple(sorted(kwargs.items()))
+        generation = self.content_cache.generation
+        model = await self.run(self.content_cache.get, key, validator)
+        if model is None:
+            model = await self._get(path, **kwargs)
+            await self.run(self.content_cache.set, key, model, generation=generation)
+        elif model["type"] == "notebook" and model["content"] is not None:
+            # the notebook may have been trusted since it was cached
+            mark_trusted_cells = getattr(self.manager, "mark_trusted_cells", None)
+            if mark_trusted_cells is not None:
+                mark_trusted_cells(model["content"], self.to_actual_path(path))
+        return model
+
+    async def _get(self, path, *args, **kwargs):
+        result = await self._call("get", self.to_actual_path(path), *args, **kwargs)
         if result.get("path", None):
             result["path"] = self.to_proxy_path(result["path"])
-        if result.get("content", None) and await self.dir_exists(path):
-            result["content"] = [
-                dict(
-                    list(model.items()) + [("path", self.to_proxy_path(model["path"]))]
-                )
-                for model in result["content"]
-            ]
+        if result.get("content", None) and result.get("type") == "directory":
+            self.to_proxy_models(result["content"])
         return result
 
     async def save(self, model, path):
-        return await ensure_async(self.manager.save(model, self.to_actual_path(path)))
+        try:
+            return await self._call("save", model, self.to_actual_path(path))
+        finally:
+            self.invalidate(path)
 
     async def delete_file(self, path):
-        return await ensure_async(self.manager.delete_file(self.to_actual_path(path)))
+        try:
+            return await self._call("delete_file", self.to_actual_path(path))
+        finally:
+            self.invalidate(path)
+
+    async def copy(self, from_path, to_path=None):
+        result = await self._call(
+            "copy",
+            self.to_actual_path(from_path),
+            None if to_path is None else self.to_actual_path(to_path),
+        )
+        if result.get("path", None):
+            result["path"] = self.to_proxy_path(result["path"])
+            self.invalidate(result["path"])
+        return result
 
     async def file_exists(self, path=None):
-        return await ensure_async(self.manager.file_exists(self.to_actual_path(path)))
+        return await self._cached(
+            path,
+            ("file_exists",),
+            lambda: self._call("file_exists", self.to_actual_path(path)),
+        )
 
     async def dir_exists(self, path):
-        return await ensure_async(self.manager.dir_exists(self.to_actual_path(path)))
+        return await self._cached(
+            path,
+            ("dir_exists",),
+            lambda: self._call("dir_exists", self.to_actual_path(path)),
+        )
 
     async def is_hidden(self, path):
-        return await ensure_async(self.manager.is_hidden(self.to_actual_path(path)))
+        return await self._cached(
+            path,
+            ("is_hidden",),
+            lambda: self._call("is_hidden", self.to_actual_path(path)),
+        )
 
     async def rename_file(self, old_path, new_path):
-        await ensure_async(
-            self.manager.rename_file(
-                self.to_actual_path(old_path), self.to_actual_path(new_path)
+        try:
+            await self._call(
+                "rename_file",
+                self.to_actual_path(old_path),
+                self.to_actual_path(new_path),
             )
+        finally:
+            self.invalidate(old_path)
+            self.invalidate(new_path)
+
+
+def fill_template(value, values):
+    """replace "{name}" in the strings of a mount's settings"""
+    if isinstance(value, str):
+        for name, segment in values.items():
+            value = value.replace("{" + name + "}", segment)
+        return value
+    if isinstance(value, dict):
+        return {key: fill_template(item, values) for key, item in value.items()}
+    if isinstance(value, (list, tuple)):
+        return type(value)(fill_template(item, values) for item in value)
+    return value
+
+
+class MountTemplate(object):
+    """a mount such as "users/{username}", creating a WrapperManager per
+    matched path with "{username}" replaced in its settings"""
+
+    def __init__(self, proxy_path, config, metrics=False):
+        self.proxy_path = proxy_path
+        self.config = config
+        # shared by every instance, so that metrics don't grow with users
+        self.metrics = MountMetrics() if metrics else None
+
+    def mount_path(self, values):
+        return "/".join(
+            values[name] if name is not None else segment
+            for segment, name in (
+                (segment, parameter_name(segment))
+                for segment in split_path(self.proxy_path)
+            )
+        )
+
+    def create(self, values):
+        config = self.config
+        manager = WrapperManager(
+            self.mount_path(values),
+            config["manager_class"],
+            fill_template(config["kwargs"], values),
+            cache=config.get("cache"),
+            executor_workers=config.get("executor_workers"),
+            checkpoints=fill_template(config.get("checkpoints"), values),
+            lazy=True,
+            health=config.get("health"),
+            single_flight=config.get("single_flight", False),
+            content_cache=fill_template(config.get("content_cache"), values),
         )
+        manager.metrics = self.metrics
+        return manager
 
 
 class MultiContentsManager(AsyncContentsManager):
 
     managers = Dict(help="the path to manager_class settings").tag(config=True)
+    mount_metadata = Bool(
+        False,
+        help="list mount points with the metadata of their root instead of"
+        " placeholder dates, fetched concurrently from each mount",
+    ).tag(config=True)
+    mount_metadata_timeout = Float(
+        2.0,
+        help="seconds to wait for a mount's metadata before listing it as unavailable",
+    ).tag(config=True)
+    transfer_chunk_size = Int(
+        DEFAULT_CHUNK_SIZE,
+        help="bytes read and written per chunk when moving files across managers",
+    ).tag(config=True)
+    transfer_concurrency = Int(
+        8, help="files copied in parallel when moving directories across managers"
+    ).tag(config=True)
+    collect_metrics = Bool(
+        False,
+        help="record call counts, errors, latencies and bytes per mount and"
+        " operation, see mount_metrics() and /multicontents/metrics",
+    ).tag(config=True)
+    mount_loading = Enum(
+        ["eager", "concurrent", "lazy"],
+        "eager",
+        help="eager: create the backend of every mount at startup, one after the"
+        " other, failing on any error. concurrent: create them in parallel at"
+        " startup. lazy: create a mount's backend when it's first used. With"
+        " concurrent and lazy a mount whose backend fails answers 503.",
+    ).tag(config=True)
+    mount_pool_size = Int(
+        256,
+        help="instances of templated mounts, e.g. users/{username}, kept at most;"
+        " the least recently used ones are closed",
+    ).tag(config=True)
+    mount_pool_idle_timeout = Float(
+        600,
+        help="seconds after which an unused instance of a templated mount is"
+        " closed, 0 to keep them until the pool is full",
+    ).tag(config=True)
+    transfer_progress = Callable(
+        None,
+        allow_none=True,
+        help="called as (path, transferred_bytes, total_bytes) while moving files",
+    ).tag(config=True)
 
     def __init__(self, *args, **kwargs):
         super(MultiContentsManager, self).__init__(*args, **kwargs)
+        self._init_managers()
+
+    @observe("managers")
+    def _managers_changed(self, change):
+        # the initial value is handled by __init__ once the instance is ready
+        if hasattr(self, "_router"):
+            for manager in self._mounts():
+                manager.close()
+            self._init_managers()
+
+    def _init_managers(self):
+        self._templates = [
+            MountTemplate(path.strip("/"), config, metrics=self.collect_metrics)
+            for path, config in self.managers.items()
+            if any(parameter_name(segment) for segment in split_path(path))
+        ]
+        templates = {template.proxy_path for template in self._templates}
+        # proxy path -> (instance of a templated mount, time of its last use),
+        # least recently used first
+        self._pool = collections.OrderedDict()
         self._managers = [
-            WrapperManager(path.lstrip("/"), config["manager_class"], config["kwargs"])
+            WrapperManager(
+                path.lstrip("/"),
+                config["manager_class"],
+                config["kwargs"],
+                cache=config.get("cache"),
+                executor_workers=config.get("executor_workers"),
+                checkpoints=config.get("checkpoints"),
+                metrics=self.collect_metrics,
+                lazy=self.mount_loading != "eager",
+                health=config.get("health"),
+                single_flight=config.get("single_flight", False),
+                content_cache=config.get("content_cache"),
+            )
             for path, config in self.managers.items()
+            if path.strip("/") not in templates
         ]
+        if self.mount_loading == "concurrent" and self._managers:
+            with ThreadPoolExecutor(
+                max_workers=min(len(self._managers), 16),
+                thread_name_prefix="multicontents-init",
+            ) as executor:
+                list(executor.map(self._init_mount, self._managers))
+        # routing is done by MountRouter, this order only decides the order
+        # of mount points listed in the same directory
         self._managers.sort(
             key=lambda manager: (
                 manager.proxy_path == "",
@@ -127,18 +507,109 @@ class MultiContentsManager(AsyncContentsManager):
                 -len(manager.proxy_path.rsplit("/", 1)[-1]),
             )
         )
+        self._router = MountRouter(self._managers + self._templates)
+
+    def _mounts(self):
+        """static mounts and the instances of templated ones"""
+        return self._managers + [manager for manager, _ in self._pool.values()]
+
+    def _init_mount(self, manager):
+        try:
+            manager.init_manager()
+        except Exception:
+            self.log.exception(
+                "Failed to create the backend of mount '%s'", manager.proxy_path
+            )
+            return
+        self.log.debug(
+            "Created the backend of mount '%s' in %.3fs",
+            manager.proxy_path,
+            manager.init_seconds,
+        )
+
+    def mount_init_stats(self):
+        """{mount: {"seconds", "error"}} of the backends created so far"""
+        return {
+            manager.proxy_path: {
+                "seconds": manager.init_seconds,
+                "error": (
+                    repr(manager.init_error) if manager.init_error is not None else None
+                ),
+            }
+            for manager in self._mounts()
+            if manager.init_seconds is not None
+        }
 
     def get_manager(self, path):
-        for manager in self._managers:
-            if manager.is_parent_directory_of(path):
-                return manager
-        raise HTTPError(404, f"Manager not found for path: '{path}'")
+        manager, values = self._router.match(path)
+        if manager is None:
+            raise HTTPError(404, f"Manager not found for path: '{path}'")
+        if isinstance(manager, MountTemplate):
+            return self._pooled_mount(manager, values)
+        return manager
+
+    def _pooled_mount(self, template, values):
+        proxy_path = template.mount_path(values)
+        now = time.monotonic()
+        entry = self._pool.pop(proxy_path, None)
+        manager = entry[0] if entry is not None else template.create(values)
+        self._pool[proxy_path] = (manager, now)
+        while len(self._pool) > max(self.mount_pool_size, 1) or (
+            self.mount_pool_idle_timeout
+            and now - next(iter(self._pool.values()))[1] > self.mount_pool_idle_timeout
+        ):
+            evicted_path, (evicted, _) = self._pool.popitem(last=False)
+            self.log.debug("Closing the unused mount '%s'", evicted_path)
+            evicted.close()
+        return manager
+
+    def cache_stats(self):
+        return {
+            manager.proxy_path: manager.cache.stats()
+            for manager in self._mounts()
+            if manager.cache is not None
+        }
+
+    def single_flight_stats(self):
+        """{mount: {"calls", "shared", "in_flight"}} of the mounts with
+        single_flight"""
+        return {
+            manager.proxy_path: manager.flights.stats()
+            for manager in self._mounts()
+            if manager.flights is not None
+        }
+
+    def content_cache_stats(self):
+        """{mount: {"hits", "misses", "entries", "bytes"}} of the mounts with
+        a content_cache"""
+        return {
+            manager.proxy_path: manager.content_cache.stats()
+            for manager in self._mounts()
+            if manager.content_cache is not None
+        }
+
+    def mount_health(self):
+        """{mount: {"state", "failures", "last_error"}} of the mounts with a
+        health setting"""
+        return {
+            manager.proxy_path: manager.breaker.stats()
+            for manager in self._mounts()
+            if manager.breaker is not None
+        }
+
+    def mount_metrics(self):
+        """{mount: {operation: stats}} when collect_metrics is enabled,
+        templated mounts are reported once by their template"""
+        return {
+            manager.proxy_path: manager.metrics.stats()
+            for manager in self._managers + self._templates
+            if manager.metrics is not None
+        }
 
     async def get(self, path, *args, **kwargs):
         try:
             manager = self.get_manager(path)
             current = await manager.get(path, *args, **kwargs)
-            is_dir = await manager.dir_exists(path)
         except HTTPError as e:
             if path == "/" or path == "":
                 current = build_base_model(
@@ -147,21 +618,45 @@ class MultiContentsManager(AsyncContentsManager):
                     format="json",
                     content=[] if kwargs.get("content", None) else None,
                 )
-                is_dir = True
             else:
                 raise e
 
-        if kwargs.get("content", None) and is_dir:
-            extra = [
-                build_base_model(
-                    type_="directory", path=other_manager.to_proxy_path("")
+        if kwargs.get("content", None) and current.get("type") == "directory":
+            children = self._router.children_of(path)
+            if self.mount_metadata:
+                extra = await asyncio.gather(
+                    *(self._mount_model(other_manager) for other_manager in children)
                 )
-                for other_manager in self._managers
-                if other_manager.is_sub_directory_of(path)
-            ]
+            else:
+                extra = [
+                    build_base_model(
+                        type_="directory", path=other_manager.to_proxy_path("")
+                    )
+                    for other_manager in children
+                ]
             current["content"] += extra
         return current
 
+    async def _mount_model(self, manager):
+        """the listing entry of a mount, with the metadata of its root"""
+        path = manager.to_proxy_path("")
+        try:
+            model = await asyncio.wait_for(
+                manager.get(path, content=False), self.mount_metadata_timeout
+            )
+        except Exception as e:
+            self.log.warning("Failed to fetch metadata of mount '%s': %r", path, e)
+            model = build_base_model(type_="directory", path=path, writable=False)
+            model["unavailable"] = True
+            return model
+        return build_base_model(
+            type_="directory",
+            path=path,
+            writable=model.get("writable", True),
+            last_modified=model.get("last_modified"),
+            created=model.get("created"),
+        )
+
     async def rename_file(self, old_path, new_path):
         old_manager = self.get_manager(old_path)
         new_manager = self.get_manager(new_path)
@@ -175,15 +670,83 @@ class MultiContentsManager(AsyncContentsManager):
         if old_manager == new_manager:
             await old_manager.rename_file(old_path, new_path)
         else:
+            if await fast_transfer(
+                old_manager, old_path, new_manager, new_path, move=True
+            ):
+                return
+            model = await old_manager.get(old_path, content=False)
+            if model["type"] == "directory":
+                await self._move_directory(old_path, new_path)
+            else:
+                await self._transfer_file(old_manager, old_path, new_manager, new_path)
+                await old_manager.delete_file(old_path)
+
+    async def _move_directory(self, old_path, new_path):
+        transfer = TreeTransfer(
+            self.get_manager, self._transfer_file, self.transfer_concurrency
+        )
+        report = await transfer.copy(old_path, new_path)
+        if not report.ok:
+            await transfer.rollback(report)
+            self.log.error("Failed to move %s to %s: %s", old_path, new_path, report)
+            raise HTTPError(500, str(report))
+        await transfer.delete_source(report)
+
+    async def _transfer_file(self, old_manager, old_path, new_manager, new_path):
+        """copy a file to another manager, via a registered transfer strategy,
+        a chunked stream or, as a last resort, a plain get/save"""
+        if await fast_transfer(old_manager, old_path, new_manager, new_path):
+            return
+        streamed = await stream_file(
+            old_manager,
+            old_path,
+            new_manager,
+            new_path,
+            chunk_size=self.transfer_chunk_size,
+            progress=self.transfer_progress,
+        )
+        if not streamed:
             model = await old_manager.get(old_path)
             await new_manager.save(model, new_path)
-            if await self.dir_exists(old_path):
-                for model in (await self.get(old_path))["content"]:
-                    await self.rename_file(
-                        os.path.join(old_path, model["name"]),
-                        os.path.join(new_path, model["name"]),
-                    )
-            await old_manager.delete_file(old_path)
+
+    async def copy(self, from_path, to_path=None):
+        path = from_path.strip("/")
+        if to_path is not None:
+            to_path = to_path.strip("/")
+        from_manager = self.get_manager(path)
+        if to_path is None or self.get_manager(to_path) == from_manager:
+            # let the backend copy natively, including picking the new name
+            model = await from_manager.copy(path, to_path)
+            self.emit(
+                data={"action": "copy", "path": model["path"], "source_path": path}
+            )
+            return model
+
+        if from_manager.to_actual_path(path) == "":
+            raise HTTPError(400, reason="You cannot copy the virtual directory")
+        model = await from_manager.get(path, content=False)
+        if model["type"] == "directory":
+            raise HTTPError(400, "Can't copy directories")
+
+        from_name = path.rsplit("/", 1)[-1]
+        if await self.dir_exists(to_path):
+            name = copy_pat.sub(".", from_name)
+            to_name = await self.increment_filename(name, to_path, insert="-Copy")
+            to_path = f"{to_path}/{to_name}".strip("/")
+        elif "/" in to_path:
+            to_dir = to_path.rsplit("/", 1)[0]
+            if not await self.dir_exists(to_dir):
+                raise HTTPError(
+                    404, "No such parent directory: %s to copy file in" % to_dir
+                )
+
+        to_manager = self.get_manager(to_path)
+        if to_manager.to_actual_path(to_path) == "":
+            raise HTTPError(400, reason="You cannot copy to the virtual directory")
+        await self._transfer_file(from_manager, path, to_manager, to_path)
+        model = await to_manager.get(to_path, content=False)
+        self.emit(data={"action": "copy", "path": to_path, "source_path": path})
+        return model
 
     async def save(self, model, path):
         return await self.get_manager(path).save(model, path)
@@ -204,5 +767,17 @@ class MultiContentsManager(AsyncContentsManager):
             return False
         return await self.get_manager(path).is_hidden(path)
 
+    async def shutdown(self):
+        """write pending checkpoints and release the mounts' executors"""
+        mounts = self._mounts()
+        stores = [self.checkpoints] + [
+            manager.checkpoints for manager in mounts if manager.checkpoints is not None
+        ]
+        for store in stores:
+            if hasattr(store, "shutdown"):
+                await store.shutdown()
+        for manager in mounts:
+            manager.close()
+
     def _checkpoints_class_default(self):
         return AsyncMultiVersionsFileCheckpoints
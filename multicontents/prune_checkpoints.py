@@ -0,0 +1,98 @@
+"""apply a retention policy to an existing checkpoint tree
+
+    python -m multicontents.prune_checkpoints ROOT_DIR --max-count 20 \\
+        --tier 3600:86400 --tier 86400:2592000
+
+--gc also deletes the blobs no checkpoint references. A running server may
+store a blob before writing the checkpoint referencing it, so only use it
+while no server writes to the tree.
+"""
+
+import os
+import sys
+import argparse
+
+from multicontents.multi_versions_file_checkpoints import (
+    AsyncMultiVersionsFileCheckpoints,
+)
+
+
+def parse_tier(value):
+    try:
+        interval, keep_for = value.split(":")
+        return (float(interval), float(keep_for))
+    except ValueError:
+        raise argparse.ArgumentTypeError(
+            f"expected INTERVAL:KEEP_FOR in seconds, got {value!r}"
+        )
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(
+        prog="python -m multicontents.prune_checkpoints", description=__doc__
+    )
+    parser.add_argument("root_dir")
+    parser.add_argument("--checkpoint-dir", default=".ipynb_checkpoints")
+    parser.add_argument("--layout", choices=["flat", "sharded"], default="flat")
+    parser.add_argument("--max-count", type=int, default=0)
+    parser.add_argument("--max-age", type=float, default=0, help="in seconds")
+    parser.add_argument(
+        "--tier",
+        type=parse_tier,
+        action="append",
+        default=[],
+        help="INTERVAL:KEEP_FOR in seconds, can be repeated",
+    )
+    parser.add_argument("--dry-run", action="store_true")
+    parser.add_argument(
+        "--gc",
+        action="store_true",
+        help="also delete unreferenced blobs, only while no server is running",
+    )
+    return parser.parse_args(argv)
+
+
+def prune(checkpoints, dry_run=False, gc=False):
+    """prune every file's checkpoints, and with gc the blobs they no longer
+    reference, return {checkpoint_dir: deleted ids}"""
+    pruned = {}
+    for checkpoint_dir in checkpoints.checkpoint_dirs():
+        expired = checkpoints.prune_checkpoint_dir(checkpoint_dir, dry_run=dry_run)
+        if expired:
+            pruned[checkpoint_dir] = expired
+    if not gc:
+        return pruned
+    unreferenced = checkpoints.collect_garbage(dry_run=dry_run)
+    if unreferenced:
+        pruned[checkpoints.object_store.root] = unreferenced
+    return pruned
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    checkpoints = AsyncMultiVersionsFileCheckpoints(
+        root_dir=os.path.abspath(args.root_dir),
+        checkpoint_dir=args.checkpoint_dir,
+        layout=args.layout,
+        max_checkpoints=args.max_count,
+        max_checkpoint_age=args.max_age,
+        retention_tiers=args.tier,
+    )
+    if not checkpoints.has_retention_policy:
+        print("no retention policy given, nothing to do", file=sys.stderr)
+        return 1
+    pruned = prune(checkpoints, dry_run=args.dry_run, gc=args.gc)
+    for checkpoint_dir, expired in pruned.items():
+        if checkpoint_dir == checkpoints.object_store.root:
+            kind = "blobs"
+        else:
+            kind = "checkpoints"
+        print(
+            f"{checkpoint_dir}: {'would delete' if args.dry_run else 'deleted'} "
+            f"{len(expired)} {kind}"
+        )
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,111 @@
+def split_path(path):
+    path = path.strip("/")
+    return path.split("/") if path != "" else []
+
+
+def parameter_name(segment):
+    """ "name" for a "{name}" segment, None for a literal one"""
+    if len(segment) > 2 and segment[0] == "{" and segment[-1] == "}":
+        return segment[1:-1]
+    return None
+
+
+class _Node(object):
+    __slots__ = ("children", "wildcard", "parameter", "manager", "child_managers")
+
+    def __init__(self):
+        self.children = {}
+        # child matching any segment, captured as `parameter`
+        self.wildcard = None
+        self.parameter = None
+        self.manager = None
+        self.child_managers = []
+
+
+class MountRouter(object):
+    """path-segment trie mapping a path to the manager mounted on its longest prefix
+
+    a "{name}" segment in a mount path matches any segment but "." and "..",
+    literal segments are preferred when both match as deep.
+    """
+
+    def __init__(self, managers=()):
+        self._root = _Node()
+        self._templated = False
+        for manager in managers:
+            self.add(manager)
+
+    def add(self, manager):
+        segments = split_path(manager.proxy_path)
+        node = self._root
+        parent = None
+        templated = False
+        for segment in segments:
+            parent = node
+            name = parameter_name(segment)
+            if name is None:
+                node = node.children.setdefault(segment, _Node())
+                continue
+            if node.wildcard is None:
+                node.wildcard = _Node()
+                node.parameter = name
+            elif node.parameter != name:
+                raise ValueError(
+                    f"mount {manager.proxy_path!r} calls {name!r} a segment"
+                    f" another mount calls {node.parameter!r}"
+                )
+            node = node.wildcard
+            templated = self._templated = True
+        node.manager = manager
+        # templated mounts can't be listed
+        if parent is not None and not templated:
+            parent.child_managers.append(manager)
+
+    def _match(self, node, segments, index):
+        """(depth, manager, captured values) of the deepest mount below node"""
+        best = (index, node.manager, {}) if node.manager is not None else None
+        if index == len(segments):
+            return best
+        segment = segments[index]
+        found = []
+        child = node.children.get(segment)
+        if child is not None:
+            found.append(self._match(child, segments, index + 1))
+        if node.wildcard is not None and segment not in (".", ".."):
+            match = self._match(node.wildcard, segments, index + 1)
+            if match is not None:
+                match[2][node.parameter] = segment
+            found.append(match)
+        for match in found:
+            if match is not None and (best is None or match[0] > best[0]):
+                best = match
+        return best
+
+    def match(self, path):
+        """(manager, {name: segment}) of the mount of a path, (None, {}) if
+        there's none"""
+        if not self._templated:
+            node = self._root
+            found = node.manager
+            for segment in split_path(path):
+                node = node.children.get(segment)
+                if node is None:
+                    break
+                if node.manager is not None:
+                    found = node.manager
+            return found, {}
+        match = self._match(self._root, split_path(path), 0)
+        if match is None:
+            return None, {}
+        return match[1], match[2]
+
+    def resolve(self, path):
+        return self.match(path)[0]
+
+    def children_of(self, path):
+        node = self._root
+        for segment in split_path(path):
+            node = node.children.get(segment)
+            if node is None:
+                return []
+        return list(node.child_managers)
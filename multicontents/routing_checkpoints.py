@@ -0,0 +1,94 @@
+from jupyter_server.services.contents.checkpoints import AsyncCheckpoints
+
+
+class AsyncRoutingCheckpoints(AsyncCheckpoints):
+    """checkpoints of a MultiContentsManager, kept by the mount of each file
+
+    a mount configured with a "checkpoints" store uses it, with proxy paths
+    and the mount's WrapperManager as contents manager. Other mounts use the
+    checkpoints of their own manager (e.g. next to the files for a
+    FileContentsManager, in the bucket for s3contents), with backend paths.
+    """
+
+    def _route(self, path):
+        """return (wrapper, checkpoints, contents manager, path) for a path"""
+        wrapper = self.parent.get_manager(path)
+        if wrapper.checkpoints is not None:
+            return wrapper, wrapper.checkpoints, wrapper, path
+        return (
+            wrapper,
+            wrapper.manager.checkpoints,
+            wrapper.manager,
+            wrapper.to_actual_path(path),
+        )
+
+    async def create_checkpoint(self, contents_mgr, path):
+        wrapper, checkpoints, manager, path = self._route(path)
+        with wrapper.measure("create_checkpoint"):
+            return await wrapper.run(checkpoints.create_checkpoint, manager, path)
+
+    async def restore_checkpoint(self, contents_mgr, checkpoint_id, path):
+        wrapper, checkpoints, manager, actual_path = self._route(path)
+        try:
+            with wrapper.measure("restore_checkpoint"):
+                await wrapper.run(
+                    checkpoints.restore_checkpoint, manager, checkpoint_id, actual_path
+                )
+        finally:
+            wrapper.invalidate(path)
+
+    async def rename_checkpoint(self, checkpoint_id, old_path, new_path):
+        old_wrapper, old_checkpoints, _, old_actual_path = self._route(old_path)
+        _, new_checkpoints, _, new_actual_path = self._route(new_path)
+        if old_checkpoints is not new_checkpoints:
+            # checkpoints don't follow a file to another store
+            self.log.debug(
+                "dropping checkpoint %s of %s moved to %s",
+                checkpoint_id,
+                old_path,
+                new_path,
+            )
+            await old_wrapper.run(
+                old_checkpoints.delete_checkpoint, checkpoint_id, old_actual_path
+            )
+            return
+        with old_wrapper.measure("rename_checkpoint"):
+            await old_wrapper.run(
+                old_checkpoints.rename_checkpoint,
+                checkpoint_id,
+                old_actual_path,
+                new_actual_path,
+            )
+
+    async def rename_all_checkpoints(self, old_path, new_path):
+        old_wrapper, old_checkpoints, _, old_actual_path = self._route(old_path)
+        _, new_checkpoints, _, new_actual_path = self._route(new_path)
+        if old_checkpoints is not new_checkpoints:
+            self.log.debug(
+                "dropping the checkpoints of %s moved to %s", old_path, new_path
+            )
+            await old_wrapper.run(
+                old_checkpoints.delete_all_checkpoints, old_actual_path
+            )
+            return
+        with old_wrapper.measure("rename_checkpoint"):
+            await old_wrapper.run(
+                old_checkpoints.rename_all_checkpoints,
+                old_actual_path,
+                new_actual_path,
+            )
+
+    async def delete_checkpoint(self, checkpoint_id, path):
+        wrapper, checkpoints, _, path = self._route(path)
+        with wrapper.measure("delete_checkpoint"):
+            return await wrapper.run(checkpoints.delete_checkpoint, checkpoint_id, path)
+
+    async def delete_all_checkpoints(self, path):
+        wrapper, checkpoints, _, path = self._route(path)
+        with wrapper.measure("delete_checkpoint"):
+            return await wrapper.run(checkpoints.delete_all_checkpoints, path)
+
+    async def list_checkpoints(self, path):
+        wrapper, checkpoints, _, path = self._route(path)
+        with wrapper.measure("list_checkpoints"):
+            return await wrapper.run(checkpoints.list_checkpoints, path)
@@ -0,0 +1,443 @@
+import os
+import base64
+import asyncio
+import inspect
+import logging
+import shutil
+
+from jupyter_server.services.contents.filemanager import FileContentsManager
+
+DEFAULT_CHUNK_SIZE = 8 * 1024 * 1024
+
+log = logging.getLogger(__name__)
+
+
+def _fsspec(manager):
+    """the fs of s3contents / gcscontents managers, backed by fsspec"""
+    fs = getattr(manager, "fs", None)
+    if hasattr(getattr(fs, "fs", None), "open") and hasattr(fs, "path"):
+        return fs
+    return None
+
+
+def open_for_read(manager, path):
+    """open a backend file as a binary stream, or return None if unsupported"""
+    if hasattr(manager, "_get_os_path"):
+        # FileContentsManager and friends
+        return open(manager._get_os_path(path), "rb")
+    fs = _fsspec(manager)
+    if fs is not None:
+        return fs.fs.open(fs.path(path), "rb")
+    return None
+
+
+def supports_write_stream(manager):
+    return _fsspec(manager) is not None
+
+
+def open_for_write(manager, path):
+    """open a backend file for writing as a binary stream (a multipart upload
+    for object stores), or return None if unsupported"""
+    fs = _fsspec(manager)
+    if fs is not None:
+        return fs.fs.open(fs.path(path), "wb")
+    return None
+
+
+def discard(writer):
+    """abort a stream opened by `open_for_write`, return False if it had to be
+    committed instead"""
+    if hasattr(writer, "discard"):
+        writer.discard()
+        return True
+    writer.close()
+    return False
+
+
+def supports_chunked_save(manager):
+    """whether the manager implements the chunked `save` protocol"""
+    return hasattr(manager, "_save_large_file")
+
+
+async def _remove_partial_copy(dst, dst_path):
+    try:
+        await dst.delete_file(dst_path)
+    except Exception as e:
+        log.warning("failed to remove the partial copy %s: %s", dst_path, e)
+
+
+async def _run(executor, func, *args):
+    return await asyncio.get_running_loop().run_in_executor(executor, func, *args)
+
+
+_transfer_strategies = {}
+
+
+def register_transfer_strategy(src_class, dst_class, strategy):
+    """register a fast path for moving or copying between two manager classes
+
+    classes can also be given as "module.ClassName" strings, so that optional
+    backends don't need to be imported. The strategy is called as
+    `strategy(src_manager, src_path, dst_manager, dst_path, move)` with the
+    backend managers and their own paths, from a worker thread unless it is a
+    coroutine function. It returns True once the item was transferred (and
+    removed from the source when `move` is set), or False to fall back to the
+    generic get/save path.
+    """
+    _transfer_strategies[(src_class, dst_class)] = strategy
+
+
+def _class_keys(manager):
+    for cls in type(manager).__mro__:
+        yield cls
+        yield f"{cls.__module__}.{cls.__qualname__}"
+
+
+def find_transfer_strategy(src_manager, dst_manager):
+    for src_key in _class_keys(src_manager):
+        for dst_key in _class_keys(dst_manager):
+            strategy = _transfer_strategies.get((src_key, dst_key))
+            if strategy is not None:
+                return strategy
+    return None
+
+
+async def fast_transfer(src, src_path, dst, dst_path, move=False):
+    """try the registered strategy for two WrapperManagers, return whether it
+    handled the transfer"""
+    strategy = find_transfer_strategy(src.manager, dst.manager)
+    if strategy is None:
+        return False
+    args = (
+        src.manager,
+        src.to_actual_path(src_path),
+        dst.manager,
+        dst.to_actual_path(dst_path),
+        move,
+    )
+    try:
+        if inspect.iscoroutinefunction(strategy):
+            done = await strategy(*args)
+        else:
+            done = await _run(src.executor, strategy, *args)
+    finally:
+        if move:
+            src.invalidate(src_path)
+        dst.invalidate(dst_path)
+    if done:
+        log.debug("transferred %s to %s with %s", src_path, dst_path, strategy)
+    return bool(done)
+
+
+def local_file_strategy(src_manager, src_path, dst_manager, dst_path, move):
+    """rename within a filesystem, or let the kernel copy the file"""
+    src_os_path = src_manager._get_os_path(src_path)
+    dst_os_path = dst_manager._get_os_path(dst_path)
+    dst_dir = os.path.dirname(dst_os_path)
+    if (
+        not os.path.lexists(src_os_path)
+        or os.path.lexists(dst_os_path)
+        or not os.path.isdir(dst_dir)
+    ):
+        # let the generic path report missing files and conflicts
+        return False
+    if move:
+        if os.stat(src_os_path).st_dev != os.stat(dst_dir).st_dev:
+            return False
+        os.rename(src_os_path, dst_os_path)
+        return True
+    if not os.path.isfile(src_os_path):
+        return False
+    # copyfile uses sendfile/copy_file_range where the platform supports it
+    shutil.copyfile(src_os_path, dst_os_path)
+    return True
+
+
+def fsspec_file_strategy(src_manager, src_path, dst_manager, dst_path, move):
+    """server side copy (e.g. S3 CopyObject) between two managers sharing a
+    filesystem"""
+    src_fs, dst_fs = src_manager.fs, dst_manager.fs
+    if not (
+        src_fs.fs is dst_fs.fs
+        or (
+            type(src_fs.fs) is type(dst_fs.fs)
+            and src_fs.fs.storage_options == dst_fs.fs.storage_options
+        )
+    ):
+        return False
+    src_key = src_fs.path(src_path)
+    if not src_fs.fs.isfile(src_key):
+        return False
+    src_fs.fs.copy(src_key, dst_fs.path(dst_path))
+    if move:
+        src_fs.fs.rm(src_key)
+    return True
+
+
+register_transfer_strategy(
+    FileContentsManager, FileContentsManager, local_file_strategy
+)
+register_transfer_strategy(
+    "s3contents.genericmanager.GenericContentsManager",
+    "s3contents.genericmanager.GenericContentsManager",
+    fsspec_file_strategy,
+)
+
+
+async def stream_file(
+    src, src_path, dst, dst_path, chunk_size=DEFAULT_CHUNK_SIZE, progress=None
+):
+    """copy a file between two mounts, holding at most two chunks in memory
+
+    `src` and `dst` are WrapperManagers and the paths are proxy paths. Object
+    store destinations are written as a stream, other destinations through
+    the chunked `save` protocol. Returns False without copying anything when
+    either side can't stream, so that the caller can fall back to a plain
+    get/save. A failed copy doesn't leave a partial file behind.
+    """
+    if not supports_write_stream(dst.manager) and not supports_chunked_save(
+        dst.manager
+    ):
+        return False
+    reader = await _run(
+        src.executor, open_for_read, src.manager, src.to_actual_path(src_path)
+    )
+    if reader is None:
+        return False
+
+    total = None
+    if progress is not None:
+        total = (await src.get(src_path, content=False)).get("size")
+    try:
+        if supports_write_stream(dst.manager):
+            await _stream_to_writer(
+                reader, src, src_path, dst, dst_path, chunk_size, progress, total
+            )
+        else:
+            await _stream_to_save(
+                reader, src, src_path, dst, dst_path, chunk_size, progress, total
+            )
+    finally:
+        await _run(src.executor, reader.close)
+    return True
+
+
+async def _stream_to_writer(
+    reader, src, src_path, dst, dst_path, chunk_size, progress, total
+):
+    writer = await _run(
+        dst.executor, open_for_write, dst.manager, dst.to_actual_path(dst_path)
+    )
+    transferred = 0
+    try:
+        while True:
+            chunk = await _run(src.executor, reader.read, chunk_size)
+            if not chunk:
+                break
+            await _run(dst.executor, writer.write, chunk)
+            transferred += len(chunk)
+            if progress is not None:
+                progress(src_path, transferred, total)
+    except BaseException:
+        if not await _run(dst.executor, discard, writer):
+            await _remove_partial_copy(dst, dst_path)
+        raise
+    else:
+        # commits the upload
+        await _run(dst.executor, writer.close)
+    finally:
+        dst.invalidate(dst_path)
+    log.debug("streamed %s bytes of %s to %s", transferred, src_path, dst_path)
+
+
+async def _stream_to_save(
+    reader, src, src_path, dst, dst_path, chunk_size, progress, total
+):
+    transferred = 0
+    chunk = await _run(src.executor, reader.read, chunk_size)
+    following = await _run(src.executor, reader.read, chunk_size)
+    if not following:
+        model = {"type": "file", "format": "base64"}
+    else:
+        model = {"type": "file", "format": "base64", "chunk": 1}
+    try:
+        while True:
+            model["content"] = base64.b64encode(chunk).decode("ascii")
+            if "chunk" in model and not following:
+                model["chunk"] = -1
+            await dst.save(model, dst_path)
+            transferred += len(chunk)
+            log.debug(
+                "transferred %s bytes of %s to %s", transferred, src_path, dst_path
+            )
+            if progress is not None:
+                progress(src_path, transferred, total)
+            if not following:
+                break
+            chunk = following
+            following = await _run(src.executor, reader.read, chunk_size)
+            model = {"type": "file", "format": "base64", "chunk": model["chunk"] + 1}
+    except BaseException:
+        if model.get("chunk", 1) != 1:
+            # earlier chunks were written already
+            await _remove_partial_copy(dst, dst_path)
+        raise
+
+
+def _describe(error):
+    return getattr(error, "log_message", None) or str(error) or repr(error)
+
+
+class TransferReport(object):
+    def __init__(self, src_path, dst_path):
+        self.src_path = src_path
+        self.dst_path = dst_path
+        self.directories = []
+        # destination directories that didn't exist before the copy
+        self.created_directories = []
+        self.copied = []
+        self.failed = {}
+        self.rolled_back = False
+
+    @property
+    def ok(self):
+        return not self.failed
+
+    def __str__(self):
+        if self.ok:
+            return (
+                f"copied {len(self.copied)} files from '{self.src_path}'"
+                f" to '{self.dst_path}'"
+            )
+        failures = "; ".join(
+            f"{path}: {error}" for path, error in sorted(self.failed.items())
+        )
+        return (
+            f"{len(self.failed)} items failed to copy from '{self.src_path}'"
+            f" to '{self.dst_path}'"
+            f"{' and the partial copy was removed' if self.rolled_back else ''}"
+            f" ({failures})"
+        )
+
+
+class TreeTransfer(object):
+    """copy a directory tree between mounts, running at most `concurrency`
+    backend operations at a time
+
+    `get_manager` routes a proxy path to its WrapperManager and
+    `transfer_file(src_manager, src_path, dst_manager, dst_path)` copies one
+    file.
+    """
+
+    def __init__(self, get_manager, transfer_file, concurrency=8):
+        self.get_manager = get_manager
+        self.transfer_file = transfer_file
+        self.concurrency = concurrency
+        self._semaphore = None
+
+    async def _gather(self, func, items):
+        if self._semaphore is None:
+            self._semaphore = asyncio.Semaphore(self.concurrency)
+
+        async def run(item):
+            async with self._semaphore:
+                return await func(*item)
+
+        return await asyncio.gather(
+            *(run(item) for item in items), return_exceptions=True
+        )
+
+    async def _list(self, src_path, dst_path):
+        return (await self.get_manager(src_path).get(src_path))["content"]
+
+    async def _make_directory(self, src_path, dst_path):
+        """create a destination directory, return whether it didn't exist"""
+        manager = self.get_manager(dst_path)
+        if await manager.dir_exists(dst_path):
+            return False
+        await manager.save({"type": "directory"}, dst_path)
+        return True
+
+    async def _copy_file(self, src_path, dst_path):
+        await self.transfer_file(
+            self.get_manager(src_path), src_path, self.get_manager(dst_path), dst_path
+        )
+
+    async def _delete(self, path):
+        await self.get_manager(path).delete_file(path)
+
+    async def walk(self, src_path, dst_path):
+        """return the (src, dst) directory pairs grouped by depth, and the
+        (src, dst) file pairs"""
+        levels, files = [], []
+        level = [(src_path, dst_path)]
+        while level:
+            levels.append(level)
+            listings = await self._gather(self._list, level)
+            next_level = []
+            for (src, dst), listing in zip(level, listings):
+                if isinstance(listing, BaseException):
+                    raise listing
+                for model in listing:
+                    pair = (
+                        f"{src.rstrip('/')}/{model['name']}",
+                        f"{dst.rstrip('/')}/{model['name']}",
+                    )
+                    if model["type"] == "directory":
+                        next_level.append(pair)
+                    else:
+                        files.append(pair)
+            level = next_level
+        return levels, files
+
+    async def copy(self, src_path, dst_path):
+        """create every destination directory, then copy the files in parallel"""
+        report = TransferReport(src_path, dst_path)
+        levels, files = await self.walk(src_path, dst_path)
+        for level in levels:
+            results = await self._gather(self._make_directory, level)
+            for pair, result in zip(level, results):
+                if isinstance(result, BaseException):
+                    report.failed[pair[0]] = _describe(result)
+                else:
+                    report.directories.append(pair)
+                    if result:
+                        report.created_directories.append(pair[1])
+            if not report.ok:
+                return report
+
+        results = await self._gather(self._copy_file, files)
+        for pair, result in zip(files, results):
+            if isinstance(result, BaseException):
+                report.failed[pair[0]] = _describe(result)
+            else:
+                report.copied.append(pair)
+        return report
+
+    async def _delete_tree(self, files, directories):
+        results = await self._gather(self._delete, [(path,) for path in files])
+        errors = [result for result in results if isinstance(result, BaseException)]
+        # deepest first, so that directories are empty when deleted
+        for path in reversed(directories):
+            try:
+                await self._delete(path)
+            except Exception as e:
+                errors.append(e)
+        return errors
+
+    async def rollback(self, report):
+        """remove what `copy` created at the destination, keeping directories
+        that existed before"""
+        errors = await self._delete_tree(
+            [dst for _, dst in report.copied], report.created_directories
+        )
+        for error in errors:
+            log.warning("failed to roll back %s: %s", report.dst_path, error)
+        report.rolled_back = not errors
+
+    async def delete_source(self, report):
+        errors = await self._delete_tree(
+            [src for src, _ in report.copied], [src for src, _ in report.directories]
+        )
+        if errors:
+            raise errors[0]
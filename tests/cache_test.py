@@ -0,0 +1,88 @@
+import asyncio
+
+import pytest
+
+from multicontents.cache import MISSING
+from multicontents.cache import SingleFlight
+from multicontents.cache import TTLCache
+from multicontents.cache import parent_path
+
+
+class FakeTimer(object):
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+@pytest.mark.parametrize(
+    "path,expected", [("", ""), ("foo", ""), ("/foo/bar/", "foo"), ("a/b/c", "a/b")]
+)
+def test_parent_path(path, expected):
+    assert parent_path(path) == expected
+
+
+class TestTTLCache(object):
+    @pytest.fixture
+    def timer(self):
+        return FakeTimer()
+
+    @pytest.fixture
+    def cache(self, timer):
+        return TTLCache(max_size=3, ttl=10, timer=timer)
+
+    def test_get_and_set(self, cache):
+        assert cache.get(("foo", "dir_exists")) is MISSING
+        cache.set(("foo", "dir_exists"), True)
+        assert cache.get(("foo", "dir_exists")) is True
+        assert cache.stats() == {"hits": 1, "misses": 1, "size": 1}
+
+    def test_expired(self, cache, timer):
+        cache.set(("foo", "dir_exists"), True)
+        timer.now = 10
+        assert cache.get(("foo", "dir_exists")) is MISSING
+        assert len(cache) == 0
+
+    def test_lru_eviction(self, cache):
+        for name in ["a", "b", "c"]:
+            cache.set((name,), name)
+        cache.get(("a",))
+        cache.set(("d",), "d")
+        assert cache.get(("b",)) is MISSING
+        assert [cache.get((name,)) for name in ["a", "c", "d"]] == ["a", "c", "d"]
+
+    def test_invalidate(self):
+        cache = TTLCache()
+        for path in ["", "dir", "dir/file", "dir/sub/file", "dir2", "other/file"]:
+            cache.set((path, "get"), path)
+        cache.invalidate("/dir/")
+        assert sorted(key[0] for key in cache._data) == ["dir2", "other/file"]
+
+    def test_set_skipped_after_invalidate(self, cache):
+        generation = cache.generation
+        cache.invalidate("foo")
+        cache.set(("foo", "get"), "stale", generation=generation)
+        assert cache.get(("foo", "get")) is MISSING
+
+
+class TestSingleFlight(object):
+    async def test_forget(self):
+        flights = SingleFlight()
+        gate = asyncio.Event()
+
+        async def read():
+            await gate.wait()
+            return "value"
+
+        paths = ["", "dir", "dir/file", "dir/sub/file", "dir2", "other/file"]
+        tasks = [
+            asyncio.ensure_future(flights.do((path, "get"), read)) for path in paths
+        ]
+        await asyncio.sleep(0)
+        flights.forget("/dir/")
+        assert sorted(key[0] for key in flights._flights) == ["dir2", "other/file"]
+
+        gate.set()
+        assert await asyncio.gather(*tasks) == [("value", False)] * len(paths)
+        assert flights.stats() == {"calls": 6, "shared": 0, "in_flight": 0}
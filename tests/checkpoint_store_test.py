@@ -0,0 +1,65 @@
+import os
+
+import nbformat
+import pytest
+
+from multicontents.checkpoint_store import ObjectStore
+from multicontents.checkpoint_store import load_notebook
+from multicontents.checkpoint_store import notebook_objects
+from multicontents.checkpoint_store import store_notebook
+
+
+@pytest.mark.parametrize("compression", [None, "gzip"])
+def test_put_and_get(tmp_path, compression):
+    store = ObjectStore(str(tmp_path), compression)
+    digest = store.put(b"content")
+
+    assert digest == ObjectStore.hash(b"content")
+    assert store.get(digest) == b"content"
+    assert digest in store
+    assert list(store.digests()) == [digest]
+    assert os.listdir(tmp_path) == [digest[:2]]
+
+
+def test_put_existing_object_does_not_write(tmp_path):
+    store = ObjectStore(str(tmp_path))
+    digest = store.put(b"content")
+    os_path, _ = store.find(digest)
+    os.utime(os_path, (0, 0))
+
+    assert store.put(b"content") == digest
+    assert os.stat(os_path).st_mtime == 0
+
+
+def test_reads_objects_of_other_compressions(tmp_path):
+    digest = ObjectStore(str(tmp_path), "gzip").put(b"content")
+    store = ObjectStore(str(tmp_path))
+
+    assert store.get(digest) == b"content"
+    store.delete(digest)
+    assert digest not in store
+    with pytest.raises(KeyError):
+        store.get(digest)
+
+
+def test_unknown_compression(tmp_path):
+    with pytest.raises(ValueError):
+        ObjectStore(str(tmp_path), "lzma")
+
+
+def test_store_and_load_notebook(tmp_path):
+    store = ObjectStore(str(tmp_path))
+    nb = nbformat.v4.new_notebook(
+        cells=[
+            nbformat.v4.new_markdown_cell("# title"),
+            nbformat.v4.new_code_cell(
+                "1 + 1",
+                outputs=[nbformat.v4.new_output("execute_result", {"text/plain": "2"})],
+            ),
+        ]
+    )
+    manifest = store_notebook(store, nb)
+
+    assert load_notebook(store, manifest) == nb
+    assert len(set(notebook_objects(store, manifest))) == 3
+    assert store_notebook(store, nb) == manifest
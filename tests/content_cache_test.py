@@ -0,0 +1,123 @@
+import datetime
+import os
+
+import nbformat
+import pytest
+
+from multicontents.content_cache import DiskContentCache
+from multicontents.content_cache import content_validator
+
+LAST_MODIFIED = datetime.datetime(2024, 1, 2, 3, 4, 5, tzinfo=datetime.timezone.utc)
+
+
+def file_model(path, content="hello", last_modified=LAST_MODIFIED):
+    return {
+        "name": path.rsplit("/", 1)[-1],
+        "path": path,
+        "type": "file",
+        "format": "text",
+        "content": content,
+        "size": len(content),
+        "last_modified": last_modified,
+        "created": last_modified,
+    }
+
+
+def key(path):
+    return (path, ("content", True))
+
+
+@pytest.fixture
+def cache(tmp_path):
+    return DiskContentCache("s3", str(tmp_path), max_size=1024)
+
+
+@pytest.mark.parametrize(
+    "model,expected",
+    [
+        ({"last_modified": LAST_MODIFIED, "size": 3}, [LAST_MODIFIED.isoformat(), 3]),
+        ({"last_modified": "yesterday"}, ["yesterday", None]),
+        ({"size": 3}, None),
+    ],
+)
+def test_content_validator(model, expected):
+    assert content_validator(model) == expected
+
+
+class TestDiskContentCache(object):
+    def test_get(self, cache):
+        model = file_model("s3/a.txt")
+        cache.set(key("s3/a.txt"), model)
+        assert cache.get(key("s3/a.txt"), content_validator(model)) == model
+        assert cache.get(key("s3/b.txt"), content_validator(model)) is None
+        assert cache.stats() == {
+            "hits": 1,
+            "misses": 1,
+            "entries": 1,
+            "bytes": cache.total_size,
+        }
+
+    def test_notebook(self, cache):
+        nb = nbformat.v4.new_notebook(cells=[nbformat.v4.new_code_cell("1 + 1")])
+        model = dict(file_model("s3/a.ipynb"), type="notebook", content=nb)
+        cache.set(key("s3/a.ipynb"), model)
+        cached = cache.get(key("s3/a.ipynb"), content_validator(model))
+        assert cached["content"] == nb
+        assert cached["content"].cells[0].source == "1 + 1"
+
+    def test_stale_entry_dropped(self, cache):
+        cache.set(key("s3/a.txt"), file_model("s3/a.txt"))
+        changed = file_model("s3/a.txt", content="hello world")
+        assert cache.get(key("s3/a.txt"), content_validator(changed)) is None
+        assert len(cache) == 0
+        assert os.listdir(cache.directory) == []
+
+    def test_lru_eviction(self, cache):
+        cache.set(key("s3/a"), file_model("s3/a"))
+        # room for 3 entries of the same size
+        cache.max_size = 3 * cache.total_size
+        for name in ["b", "c", "d"]:
+            cache.set(key(f"s3/{name}"), file_model(f"s3/{name}"))
+        assert len(cache) == 3
+        assert cache.get(key("s3/b"), content_validator(file_model("s3/b")))
+        cache.set(key("s3/e"), file_model("s3/e"))
+        assert sorted(path for path, _ in cache._entries.values()) == [
+            "s3/b",
+            "s3/d",
+            "s3/e",
+        ]
+        assert cache.total_size <= cache.max_size
+        assert len(os.listdir(cache.directory)) == 3
+
+    def test_too_large(self, cache):
+        cache.set(key("s3/big"), file_model("s3/big", "x" * 2048))
+        assert len(cache) == 0
+
+    def test_invalidate(self, cache):
+        for path in ["s3/dir", "s3/dir/file", "s3/dir/sub/file", "s3/dir2"]:
+            cache.set(key(path), file_model(path))
+        cache.invalidate("/s3/dir/")
+        assert [path for path, _ in cache._entries.values()] == ["s3/dir2"]
+
+    def test_set_skipped_after_invalidate(self, cache):
+        generation = cache.generation
+        cache.invalidate("s3/a.txt")
+        cache.set(key("s3/a.txt"), file_model("s3/a.txt"), generation=generation)
+        assert len(cache) == 0
+        assert os.listdir(cache.directory) == []
+
+    def test_survives_restart(self, cache, tmp_path):
+        cache.set(key("s3/a.txt"), file_model("s3/a.txt"))
+        open(os.path.join(cache.directory, "partial.tmp"), "w").close()
+        restarted = DiskContentCache("s3", str(tmp_path), max_size=1024)
+        assert restarted.total_size == cache.total_size
+        assert restarted.get(
+            key("s3/a.txt"), content_validator(file_model("s3/a.txt"))
+        ) == file_model("s3/a.txt")
+        assert not os.path.exists(os.path.join(cache.directory, "partial.tmp"))
+
+    def test_directory_per_mount(self, cache, tmp_path):
+        other = DiskContentCache("gcs", str(tmp_path), max_size=1024)
+        cache.set(key("a.txt"), file_model("a.txt"))
+        assert other.get(key("a.txt"), content_validator(file_model("a.txt"))) is None
+        assert cache.directory != other.directory
@@ -0,0 +1,98 @@
+import asyncio
+
+import mock
+import pytest
+from tornado.web import HTTPError
+
+from multicontents.health import CircuitBreaker
+
+
+async def fail():
+    raise OSError("connection reset")
+
+
+async def succeed():
+    return "ok"
+
+
+@pytest.fixture
+def clock():
+    # the event loop's own clock must keep running
+    with mock.patch("multicontents.health.time") as time:
+        time.monotonic.return_value = 1000.0
+        yield time.monotonic
+
+
+@pytest.fixture
+def breaker(clock):
+    return CircuitBreaker("s3", failure_threshold=2, reset_timeout=30)
+
+
+async def open_circuit(breaker):
+    for _ in range(breaker.failure_threshold):
+        with pytest.raises(OSError):
+            await breaker.call(fail)
+
+
+async def test_opens_after_consecutive_failures(breaker):
+    with pytest.raises(OSError):
+        await breaker.call(fail)
+    assert await breaker.call(succeed) == "ok"
+    assert breaker.state == "closed"
+
+    await open_circuit(breaker)
+    assert breaker.state == "open"
+    func = mock.AsyncMock()
+    with pytest.raises(HTTPError) as e:
+        await breaker.call(func)
+    assert e.value.status_code == 503
+    assert not func.called
+    assert breaker.stats() == {
+        "state": "open",
+        "failures": 2,
+        "last_error": "OSError('connection reset')",
+    }
+
+
+async def test_client_errors_dont_count(breaker):
+    async def missing():
+        raise HTTPError(404)
+
+    for _ in range(3):
+        with pytest.raises(HTTPError):
+            await breaker.call(missing)
+    assert breaker.state == "closed"
+
+
+async def test_timeout(clock):
+    breaker = CircuitBreaker("s3", timeout=0.01, failure_threshold=1)
+
+    with pytest.raises(HTTPError) as e:
+        await breaker.call(lambda: asyncio.sleep(1))
+    assert e.value.status_code == 504
+    assert breaker.state == "open"
+
+
+@pytest.mark.parametrize("probe,expected_state", [(succeed, "closed"), (fail, "open")])
+async def test_half_open_probe(breaker, clock, probe, expected_state):
+    await open_circuit(breaker)
+    clock.return_value += 30
+    assert breaker.state == "half_open"
+
+    started = asyncio.Event()
+
+    async def slow_probe():
+        started.set()
+        await asyncio.sleep(0.01)
+        return await probe()
+
+    task = asyncio.ensure_future(breaker.call(slow_probe))
+    await started.wait()
+    # a single probe at a time
+    with pytest.raises(HTTPError):
+        await breaker.call(succeed)
+    try:
+        await task
+    except OSError:
+        pass
+    assert breaker.state == expected_state
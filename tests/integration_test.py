@@ -132,3 +132,29 @@ def test_move_file_across_managers(jupyter_server):
     assert _get_file(jupyter_server, "local/move-me.txt").status_code == 404
     moved = _get_file(jupyter_server, "s3/move-me.txt").json()
     assert moved["content"] == "before"
+
+
+def test_copy_file_across_managers(jupyter_server):
+    _put_file(jupyter_server, "local/copy-me.txt", "copied")
+
+    r = requests.post(
+        f"{jupyter_server}/api/contents/s3",
+        json={"copy_from": "local/copy-me.txt"},
+    )
+    r.raise_for_status()
+
+    assert r.json()["path"] == "s3/copy-me.txt"
+    assert _get_file(jupyter_server, "local/copy-me.txt").json()["content"] == "copied"
+    assert _get_file(jupyter_server, "s3/copy-me.txt").json()["content"] == "copied"
+
+
+def test_mount_metrics(jupyter_server):
+    _put_file(jupyter_server, "s3/measured.txt", "12345")
+    _get_file(jupyter_server, "s3/measured.txt")
+
+    r = requests.get(f"{jupyter_server}/multicontents/metrics")
+    r.raise_for_status()
+    assert 'multicontents_operations_total{mount="s3",operation="save"} 1.0' in r.text
+    assert (
+        'multicontents_operation_bytes_total{mount="s3",operation="save"} 5.0' in r.text
+    )
@@ -24,6 +24,9 @@ c.MultiContentsManager.managers = {
     },
 }
 
+c.MultiContentsManager.collect_metrics = True
+c.ServerApp.jpserver_extensions = {"multicontents": True}
+
 c.AsyncMultiVersionsFileCheckpoints.root_dir = os.environ["LOCAL_ROOT"]
 
 c.ServerApp.token = ""
@@ -0,0 +1,54 @@
+import pytest
+
+from multicontents.metrics import MountMetrics
+from multicontents.metrics import content_bytes
+from multicontents.metrics import prometheus_text
+
+
+@pytest.mark.parametrize(
+    "model,expected",
+    [
+        ({"type": "file", "format": "text", "content": "abcd"}, 4),
+        ({"type": "file", "format": "base64", "content": "YWJj"}, 3),
+        ({"type": "notebook", "content": {"cells": []}, "size": 42}, 42),
+        ({"type": "directory", "content": [{"name": "a"}]}, 0),
+        (True, 0),
+    ],
+)
+def test_content_bytes(model, expected):
+    assert content_bytes(model) == expected
+
+
+def test_measure():
+    metrics = MountMetrics()
+    with metrics.measure("save") as measurement:
+        measurement.nbytes = 10
+    with pytest.raises(ValueError):
+        with metrics.measure("save"):
+            raise ValueError()
+
+    stats = metrics.stats()["save"]
+    assert (stats["calls"], stats["errors"], stats["bytes"]) == (2, 1, 10)
+    assert stats["buckets"][0] == (0.001, 2)
+    assert stats["buckets"][-1] == (float("inf"), 2)
+
+
+def test_prometheus_text():
+    metrics = MountMetrics()
+    metrics.observe("get", 0.2, nbytes=5)
+    metrics.observe("get", 3, error=True)
+
+    text = prometheus_text({"s3": metrics.stats()}).decode()
+
+    assert 'multicontents_operations_total{mount="s3",operation="get"} 2.0' in text
+    assert (
+        'multicontents_operation_errors_total{mount="s3",operation="get"} 1.0' in text
+    )
+    assert 'multicontents_operation_bytes_total{mount="s3",operation="get"} 5.0' in text
+    assert (
+        'multicontents_operation_seconds_bucket{le="0.25",mount="s3",operation="get"}'
+        " 1.0" in text
+    )
+    assert (
+        'multicontents_operation_seconds_count{mount="s3",operation="get"} 2.0' in text
+    )
@@ -0,0 +1,62 @@
+import os
+
+import pytest
+
+from multicontents import migrate_checkpoints
+from multicontents.multi_versions_file_checkpoints import (
+    AsyncMultiVersionsFileCheckpoints,
+)
+
+
+@pytest.fixture
+def flat(tmp_path):
+    return AsyncMultiVersionsFileCheckpoints(
+        root_dir=str(tmp_path), checkpoint_dir=".ipynb_checkpoints"
+    )
+
+
+@pytest.fixture
+def sharded(tmp_path):
+    return AsyncMultiVersionsFileCheckpoints(
+        root_dir=str(tmp_path), checkpoint_dir=".ipynb_checkpoints", layout="sharded"
+    )
+
+
+async def test_migrate(flat, sharded, tmp_path, capsys):
+    (tmp_path / "my_dir").mkdir()
+    (tmp_path / "my_dir" / "a_b.txt").write_text("v1")
+    existing = await flat.create_file_checkpoint("v1", "text", "my_dir/a_b.txt")
+    deleted = await flat.create_file_checkpoint("v1", "text", "dir/gone.txt")
+
+    old_dirs = flat.checkpoint_dirs()
+    assert migrate_checkpoints.main([str(tmp_path)]) == 0
+    assert "moved 2 checkpoint directories" in capsys.readouterr().out
+
+    assert not any(os.path.exists(old_dir) for old_dir in old_dirs)
+    assert await sharded.list_checkpoints("my_dir/a_b.txt") == [existing]
+    assert await sharded.list_checkpoints("dir/gone.txt") == [deleted]
+    checkpoint_dir = sharded.get_checkpoints_path_for_file("my_dir/a_b.txt")
+    with open(os.path.join(checkpoint_dir, ".path")) as fp:
+        assert fp.read() == "my_dir/a_b.txt"
+
+    # migrated directories are left alone
+    assert migrate_checkpoints.migrate(str(tmp_path), ".ipynb_checkpoints") == []
+
+
+async def test_merge_into_existing(flat, sharded, tmp_path):
+    old = await flat.create_file_checkpoint("v1", "text", "a.txt")
+    new = await sharded.create_file_checkpoint("v2", "text", "a.txt")
+
+    migrate_checkpoints.migrate(str(tmp_path), ".ipynb_checkpoints")
+
+    assert await sharded.list_checkpoints("a.txt") == [new, old]
+
+
+async def test_dry_run(flat, tmp_path):
+    await flat.create_file_checkpoint("v1", "text", "a.txt")
+
+    moved = migrate_checkpoints.migrate(
+        str(tmp_path), ".ipynb_checkpoints", dry_run=True
+    )
+    assert len(moved) == 1
+    assert flat.checkpoint_dirs() == [moved[0][0]]
@@ -1,12 +1,77 @@
 import os
 import time
+import asyncio
 import json
+import base64
 
+import mock
+import nbformat
 import pytest
 
+from multicontents import prune_checkpoints
+from multicontents.app import MultiContentsApp
+from multicontents.checkpoint_store import ObjectStore
 from multicontents.multi_versions_file_checkpoints import (
     AsyncMultiVersionsFileCheckpoints,
 )
+from multicontents.multi_versions_file_checkpoints import expired_checkpoints
+from multicontents.multi_versions_file_checkpoints import OBJECTS_DIR
+from multicontents.multi_versions_file_checkpoints import checkpoint_id_time
+
+HOUR = 3600
+DAY = 24 * HOUR
+
+
+def list_entries(checkpoint_dir):
+    return sorted(name for name in os.listdir(checkpoint_dir) if name[0] != ".")
+
+
+def age_checkpoints(checkpoint_dir, ages, now):
+    """backdate the checkpoints in a directory, newest first"""
+    names = list_entries(checkpoint_dir)[::-1]
+    for name, age in zip(names, ages):
+        os.utime(os.path.join(checkpoint_dir, name), (now - age, now - age))
+    return names
+
+
+@pytest.mark.parametrize(
+    "kwargs,expected",
+    [
+        ({}, []),
+        ({"max_count": 2}, ["c", "d"]),
+        ({"max_age": 2 * HOUR}, ["c", "d"]),
+        # the newest is kept even when it's too old
+        ({"max_age": 1}, ["b", "c", "d"]),
+        ({"tiers": [(DAY, 30 * DAY)]}, ["b", "d"]),
+        ({"tiers": [(0, 2 * HOUR)]}, ["c", "d"]),
+        ({"tiers": [(0, 2 * HOUR), (DAY, 30 * DAY)]}, ["d"]),
+    ],
+)
+def test_expired_checkpoints(kwargs, expected):
+    now = 100 * DAY
+    checkpoints = [
+        ("b", now - HOUR),
+        ("a", now - 60),
+        ("d", now - 3 * DAY + HOUR),
+        ("c", now - 3 * DAY + 2 * HOUR),
+    ]
+    assert expired_checkpoints(checkpoints, now, **kwargs) == expected
+
+
+def test_expired_checkpoints_hourly_then_daily():
+    now = 100 * DAY
+    # one checkpoint every 10 minutes for 3 days
+    checkpoints = [(str(i), now - i * 600) for i in range(3 * 24 * 6)]
+    expired = set(
+        expired_checkpoints(checkpoints, now, tiers=[(HOUR, DAY), (DAY, 30 * DAY)])
+    )
+    kept = [timestamp for name, timestamp in checkpoints if name not in expired]
+
+    recent = [t for t in kept if now - t <= DAY]
+    assert len({int(t // HOUR) for t in recent}) == len(recent)
+    older = [t for t in kept if now - t > DAY]
+    assert len({int(t // DAY) for t in older}) == len(older)
+    assert len(kept) < 30
 
 
 class TestAsyncMultiVersionsFileCheckpoints(object):
@@ -52,6 +117,131 @@ class TestAsyncMultiVersionsFileCheckpoints(object):
             generated_content = fp.read()
         assert content == json.loads(generated_content)
 
+    def test_checkpoint_ids_are_fixed_width_and_increasing(self, checkpoints):
+        with mock.patch("time.time_ns", return_value=1700000000_000000_000):
+            ids = [checkpoints.new_checkpoint_id() for _ in range(3)]
+        assert ids == ["1700000000000000", "1700000000000001", "1700000000000002"]
+
+    @pytest.mark.parametrize(
+        "checkpoint_id,expected",
+        [
+            ("1700000000123456", 1700000000.123456),
+            ("17000000001", 1700000000.1),
+            ("1234", None),
+            ("not-an-id", None),
+        ],
+    )
+    def test_checkpoint_id_time(self, checkpoint_id, expected):
+        assert checkpoint_id_time(checkpoint_id) == expected
+
+    async def test_list_orders_by_id(self, checkpoints):
+        # a legacy id, and a newer one with an older mtime
+        checkpoint_dir = checkpoints.get_checkpoints_path_for_file(
+            "file.txt", create_missing=True
+        )
+        for checkpoint_id in ["17000000001", "1700000000500000"]:
+            with open(os.path.join(checkpoint_dir, checkpoint_id), "w") as fp:
+                fp.write(checkpoint_id)
+        os.utime(os.path.join(checkpoint_dir, "1700000000500000"), (1, 1))
+
+        assert [c["id"] for c in await checkpoints.list_checkpoints("file.txt")] == [
+            "1700000000500000",
+            "17000000001",
+        ]
+
+    async def test_checkpoint_dir_created_once(self, checkpoints):
+        with mock.patch(
+            "multicontents.multi_versions_file_checkpoints.ensure_dir_exists",
+            wraps=os.makedirs,
+        ) as ensure_dir_exists:
+            for i in range(3):
+                await checkpoints.create_file_checkpoint(f"v{i}", "text", "a.txt")
+                checkpoints.checkpoint_path("id", "a.txt")
+        assert ensure_dir_exists.call_count == 1
+
+    async def test_create_checkpoint_prunes(self, checkpoints):
+        checkpoints.max_checkpoints = 2
+        for i in range(4):
+            await checkpoints.create_file_checkpoint(f"v{i}", "text", "file.txt")
+            time.sleep(0.01)
+
+        saved_checkpoints = await checkpoints.list_checkpoints("file.txt")
+        assert len(saved_checkpoints) == 2
+        content = await checkpoints.get_file_checkpoint(
+            saved_checkpoints[0]["id"], "file.txt"
+        )
+        assert content["content"] == "v3"
+
+    async def test_create_checkpoint_without_policy_keeps_all(self, checkpoints):
+        for i in range(3):
+            await checkpoints.create_file_checkpoint(f"v{i}", "text", "file.txt")
+            time.sleep(0.01)
+        assert len(await checkpoints.list_checkpoints("file.txt")) == 3
+
+    async def test_list_checkpoints_reads_manifest(self, checkpoints):
+        models = []
+        for i in range(5):
+            models.append(
+                await checkpoints.create_file_checkpoint(f"v{i}", "text", "file.txt")
+            )
+            time.sleep(0.01)
+        models.reverse()
+
+        with mock.patch.object(
+            checkpoints, "_index_entry", side_effect=AssertionError("stat called")
+        ):
+            assert await checkpoints.list_checkpoints("file.txt") == models
+            assert await checkpoints.list_checkpoints("file.txt", limit=2) == (
+                models[:2]
+            )
+            assert await checkpoints.list_checkpoints(
+                "file.txt", limit=2, offset=2
+            ) == (models[2:4])
+        checkpoints.list_checkpoints_limit = 3
+        assert await checkpoints.list_checkpoints("file.txt") == models[:3]
+
+    async def test_list_checkpoints_rebuilds_stale_manifest(self, checkpoints):
+        v1 = await checkpoints.create_file_checkpoint("v1", "text", "file.txt")
+        checkpoint_dir = checkpoints.get_checkpoints_path_for_file("file.txt")
+        os.unlink(os.path.join(checkpoint_dir, v1["id"]))
+        with open(os.path.join(checkpoint_dir, "1234"), "w") as fp:
+            fp.write("v0")
+
+        assert [c["id"] for c in await checkpoints.list_checkpoints("file.txt")] == [
+            "1234"
+        ]
+        os.unlink(os.path.join(checkpoint_dir, ".manifest.json"))
+        assert [c["id"] for c in await checkpoints.list_checkpoints("file.txt")] == [
+            "1234"
+        ]
+
+    async def test_delete_and_rename_update_manifest(self, checkpoints):
+        v1 = await checkpoints.create_file_checkpoint("v1", "text", "a.txt")
+        v2 = await checkpoints.create_file_checkpoint("v2", "text", "a.txt")
+        await checkpoints.delete_checkpoint(v1["id"], "a.txt")
+        await checkpoints.rename_all_checkpoints("a.txt", "b.txt")
+
+        with mock.patch.object(checkpoints, "_rebuild_index") as rebuild:
+            assert await checkpoints.list_checkpoints("a.txt") == []
+            assert await checkpoints.list_checkpoints("b.txt") == [v2]
+        assert not rebuild.called
+
+    async def test_all_checkpoints_ignore_list_limit(self, checkpoints):
+        checkpoints.list_checkpoints_limit = 2
+        for i in range(5):
+            await checkpoints.create_file_checkpoint(f"v{i}", "text", "a.txt")
+
+        with mock.patch.object(
+            checkpoints, "_update_index", wraps=checkpoints._update_index
+        ) as update_index:
+            await checkpoints.rename_all_checkpoints("a.txt", "b.txt")
+        assert update_index.call_count == 2
+        assert await checkpoints.list_checkpoints("a.txt") == []
+        assert len(await checkpoints.list_checkpoints("b.txt", limit=10)) == 5
+
+        await checkpoints.delete_all_checkpoints("b.txt")
+        assert await checkpoints.list_checkpoints("b.txt", limit=10) == []
+
     async def test_list_checkpoints__no_checkpoint(self, checkpoints):
         assert await checkpoints.list_checkpoints("not exists") == []
 
@@ -76,3 +266,373 @@ class TestAsyncMultiVersionsFileCheckpoints(object):
             {"id": v2["id"], "last_modified": v2["last_modified"]},
             {"id": v1["id"], "last_modified": v1["last_modified"]},
         ]
+
+
+class TestContentAddressedCheckpoints(object):
+    @pytest.fixture
+    def checkpoints(self, tmp_path):
+        return AsyncMultiVersionsFileCheckpoints(
+            root_dir=str(tmp_path),
+            checkpoint_dir=".checkpoints",
+            storage_mode="content_addressed",
+            compression="gzip",
+        )
+
+    def blobs(self, checkpoints):
+        return list(checkpoints.object_store.digests())
+
+    async def test_unchanged_content_is_stored_once(self, checkpoints):
+        v1 = await checkpoints.create_file_checkpoint("v1", "text", "file.txt")
+        for _ in range(3):
+            assert (
+                await checkpoints.create_file_checkpoint("v1", "text", "file.txt")
+            ) == v1
+        v2 = await checkpoints.create_file_checkpoint("v2", "text", "file.txt")
+
+        assert [c["id"] for c in await checkpoints.list_checkpoints("file.txt")] == [
+            v2["id"],
+            v1["id"],
+        ]
+        assert len(self.blobs(checkpoints)) == 2
+        content = await checkpoints.get_file_checkpoint(v1["id"], "file.txt")
+        assert content == {"type": "file", "content": "v1", "format": "text"}
+
+    async def test_identical_files_share_blobs(self, checkpoints):
+        await checkpoints.create_file_checkpoint("same", "text", "a.txt")
+        await checkpoints.create_file_checkpoint("same", "text", "b.txt")
+        assert len(self.blobs(checkpoints)) == 1
+
+    async def test_binary_file(self, checkpoints):
+        content = base64.encodebytes(b"\x00\xff").decode("ascii")
+        model = await checkpoints.create_file_checkpoint(content, "base64", "a.bin")
+        restored = await checkpoints.get_file_checkpoint(model["id"], "a.bin")
+        assert base64.b64decode(restored["content"]) == b"\x00\xff"
+        assert restored["format"] == "base64"
+
+    async def test_notebook(self, checkpoints):
+        nb = nbformat.v4.new_notebook(cells=[nbformat.v4.new_code_cell("1 + 1")])
+        model = await checkpoints.create_notebook_checkpoint(nb, "nb.ipynb")
+        assert (await checkpoints.create_notebook_checkpoint(nb, "nb.ipynb")) == model
+
+        restored = await checkpoints.get_notebook_checkpoint(model["id"], "nb.ipynb")
+        assert restored["content"] == nb
+
+    async def test_legacy_checkpoints_stay_readable(self, checkpoints):
+        checkpoints.storage_mode = "copy"
+        legacy = await checkpoints.create_file_checkpoint("old", "text", "file.txt")
+        checkpoints.storage_mode = "content_addressed"
+        time.sleep(0.01)
+        new = await checkpoints.create_file_checkpoint("old", "text", "file.txt")
+
+        assert new["id"] != legacy["id"]
+        assert len(await checkpoints.list_checkpoints("file.txt")) == 2
+        content = await checkpoints.get_file_checkpoint(legacy["id"], "file.txt")
+        assert content["content"] == "old"
+
+    async def test_rename_and_delete(self, checkpoints):
+        model = await checkpoints.create_file_checkpoint("v1", "text", "a.txt")
+        await checkpoints.rename_all_checkpoints("a.txt", "b.txt")
+
+        assert await checkpoints.list_checkpoints("a.txt") == []
+        content = await checkpoints.get_file_checkpoint(model["id"], "b.txt")
+        assert content["content"] == "v1"
+
+        await checkpoints.delete_checkpoint(model["id"], "b.txt")
+        assert await checkpoints.list_checkpoints("b.txt") == []
+        assert await checkpoints.create_file_checkpoint("v1", "text", "b.txt")
+        assert len(await checkpoints.list_checkpoints("b.txt")) == 1
+
+    async def test_collect_garbage(self, checkpoints):
+        model = await checkpoints.create_file_checkpoint("v1", "text", "a.txt")
+        await checkpoints.create_file_checkpoint("v2", "text", "a.txt")
+        await checkpoints.delete_checkpoint(model["id"], "a.txt")
+
+        assert checkpoints.collect_garbage(dry_run=True) == [ObjectStore.hash(b"v1")]
+        assert len(self.blobs(checkpoints)) == 2
+        assert checkpoints.collect_garbage() == [ObjectStore.hash(b"v1")]
+        assert self.blobs(checkpoints) == [ObjectStore.hash(b"v2")]
+
+
+class TestShardedCheckpoints(object):
+    @pytest.fixture
+    def checkpoints(self, tmp_path):
+        return AsyncMultiVersionsFileCheckpoints(
+            root_dir=str(tmp_path),
+            checkpoint_dir=".checkpoints",
+            layout="sharded",
+            storage_mode="content_addressed",
+        )
+
+    async def test_layout(self, checkpoints, tmp_path):
+        model = await checkpoints.create_file_checkpoint("v1", "text", "dir/a.txt")
+
+        checkpoint_dir = checkpoints.get_checkpoints_path_for_file("dir/a.txt")
+        digest = ObjectStore.hash(b"dir/a.txt")
+        assert checkpoint_dir == str(
+            tmp_path / ".checkpoints" / digest[:2] / digest[2:4] / digest
+        )
+        with open(os.path.join(checkpoint_dir, ".path")) as fp:
+            assert fp.read() == "dir/a.txt"
+        assert await checkpoints.list_checkpoints("dir/a.txt") == [model]
+
+    async def test_paths_flattening_alike_dont_collide(self, checkpoints):
+        await checkpoints.create_file_checkpoint("v1", "text", "a/b")
+        await checkpoints.create_file_checkpoint("v2", "text", "a__b")
+
+        assert len(await checkpoints.list_checkpoints("a/b")) == 1
+        assert len(await checkpoints.list_checkpoints("a__b")) == 1
+
+    async def test_rename_and_collect_garbage(self, checkpoints):
+        model = await checkpoints.create_file_checkpoint("v1", "text", "a.txt")
+        await checkpoints.create_file_checkpoint("v2", "text", "b.txt")
+        await checkpoints.rename_all_checkpoints("a.txt", "c.txt")
+
+        new_dir = checkpoints.get_checkpoints_path_for_file("c.txt")
+        with open(os.path.join(new_dir, ".path")) as fp:
+            assert fp.read() == "c.txt"
+        assert await checkpoints.list_checkpoints("c.txt") == [model]
+        assert len(checkpoints.checkpoint_dirs()) == 3
+        assert checkpoints.collect_garbage() == []
+
+    async def test_prune(self, checkpoints):
+        for i in range(3):
+            await checkpoints.create_file_checkpoint(f"v{i}", "text", "a.txt")
+        checkpoints.max_checkpoints = 1
+
+        pruned = prune_checkpoints.prune(checkpoints)
+        assert list(pruned) == [checkpoints.get_checkpoints_path_for_file("a.txt")]
+        assert len(await checkpoints.list_checkpoints("a.txt")) == 1
+
+
+class TestCellsCheckpoints(object):
+    @pytest.fixture
+    def checkpoints(self, tmp_path):
+        return AsyncMultiVersionsFileCheckpoints(
+            root_dir=str(tmp_path),
+            checkpoint_dir=".checkpoints",
+            storage_mode="cells",
+        )
+
+    def notebook(self, version):
+        image = base64.b64encode(b"\x89PNG" + bytes(range(256)) * 400).decode()
+        return nbformat.v4.new_notebook(
+            cells=[
+                nbformat.v4.new_code_cell(
+                    "plot()",
+                    id="plot",
+                    outputs=[
+                        nbformat.v4.new_output("display_data", {"image/png": image})
+                    ],
+                ),
+                nbformat.v4.new_code_cell(f"version = {version}", id="version"),
+            ]
+        )
+
+    def disk_usage(self, root):
+        return sum(
+            os.path.getsize(os.path.join(path, name))
+            for path, _, names in os.walk(root)
+            for name in names
+        )
+
+    async def test_versions_share_unchanged_cells(self, checkpoints, tmp_path):
+        models = []
+        for version in range(10):
+            nb = self.notebook(version)
+            models.append(await checkpoints.create_notebook_checkpoint(nb, "nb.ipynb"))
+            time.sleep(0.01)
+        notebook_size = len(nbformat.writes(self.notebook(0)))
+
+        assert len(await checkpoints.list_checkpoints("nb.ipynb")) == 10
+        assert self.disk_usage(tmp_path / ".checkpoints") < 2 * notebook_size
+        for version, model in enumerate(models):
+            restored = await checkpoints.get_notebook_checkpoint(
+                model["id"], "nb.ipynb"
+            )
+            assert restored["content"] == self.notebook(version)
+
+    async def test_collect_garbage_keeps_cells(self, checkpoints):
+        first = await checkpoints.create_notebook_checkpoint(
+            self.notebook(0), "nb.ipynb"
+        )
+        model = await checkpoints.create_notebook_checkpoint(
+            self.notebook(1), "nb.ipynb"
+        )
+        await checkpoints.delete_checkpoint(first["id"], "nb.ipynb")
+
+        # the manifest and the changed cell of the first version
+        assert len(checkpoints.collect_garbage()) == 2
+        restored = await checkpoints.get_notebook_checkpoint(model["id"], "nb.ipynb")
+        assert restored["content"] == self.notebook(1)
+
+
+class TestWriteBehindCheckpoints(object):
+    @pytest.fixture
+    async def checkpoints(self, tmp_path):
+        checkpoints = AsyncMultiVersionsFileCheckpoints(
+            root_dir=str(tmp_path), checkpoint_dir=".checkpoints", write_behind=True
+        )
+        yield checkpoints
+        await checkpoints.shutdown()
+
+    async def test_coalesces_pending_checkpoints(self, checkpoints):
+        models = [
+            await checkpoints.create_file_checkpoint(f"v{i}", "text", "a.txt")
+            for i in range(3)
+        ]
+        assert checkpoints.queue_depth == 1
+        assert len({model["id"] for model in models}) == 1
+
+        await checkpoints.flush()
+
+        assert checkpoints.queue_depth == 0
+        saved_checkpoints = await checkpoints.list_checkpoints("a.txt")
+        assert [c["id"] for c in saved_checkpoints] == [models[0]["id"]]
+        content = await checkpoints.get_file_checkpoint(models[0]["id"], "a.txt")
+        assert content["content"] == "v2"
+
+    async def test_reads_wait_for_pending_checkpoints(self, checkpoints):
+        model = await checkpoints.create_notebook_checkpoint({}, "nb.ipynb")
+        assert [c["id"] for c in await checkpoints.list_checkpoints("nb.ipynb")] == [
+            model["id"]
+        ]
+
+    async def test_returned_ids_exist_for_unchanged_content(self, checkpoints):
+        checkpoints.storage_mode = "content_addressed"
+        first = await checkpoints.create_file_checkpoint("same", "text", "a.txt")
+        await checkpoints.flush()
+        time.sleep(0.01)
+        second = await checkpoints.create_file_checkpoint("same", "text", "a.txt")
+
+        for model in [first, second]:
+            content = await checkpoints.get_file_checkpoint(model["id"], "a.txt")
+            assert content["content"] == "same"
+        assert len(list(checkpoints.object_store.digests())) == 1
+
+    async def test_queue_is_bounded(self, checkpoints):
+        checkpoints.write_behind_queue_size = 1
+        release = asyncio.Event()
+        original = checkpoints._write_file_checkpoint
+
+        async def slow_write(*args):
+            await release.wait()
+            return await original(*args)
+
+        with mock.patch.object(checkpoints, "_write_file_checkpoint", slow_write):
+            await checkpoints.create_file_checkpoint("a", "text", "a.txt")
+            await asyncio.sleep(0)  # the worker takes a.txt and blocks
+            await checkpoints.create_file_checkpoint("b", "text", "b.txt")
+            blocked = asyncio.ensure_future(
+                checkpoints.create_file_checkpoint("c", "text", "c.txt")
+            )
+            await asyncio.sleep(0.01)
+            assert not blocked.done()
+            assert checkpoints.queue_depth == 2
+
+            release.set()
+            await blocked
+            await checkpoints.flush()
+        for name in ["a.txt", "b.txt", "c.txt"]:
+            assert len(await checkpoints.list_checkpoints(name)) == 1
+
+    async def test_shutdown_writes_interrupted_checkpoints(self, checkpoints):
+        started = asyncio.Event()
+        original = checkpoints._write_file_checkpoint
+
+        async def hanging_write(*args):
+            started.set()
+            await asyncio.Event().wait()
+
+        with mock.patch.object(checkpoints, "_write_file_checkpoint", hanging_write):
+            model = await checkpoints.create_file_checkpoint("v1", "text", "a.txt")
+            await started.wait()
+            checkpoints._worker.cancel()
+            with pytest.raises(asyncio.CancelledError):
+                await checkpoints._worker
+        assert checkpoints.queue_depth == 1
+
+        with mock.patch.object(checkpoints, "_write_file_checkpoint", original):
+            await checkpoints.shutdown()
+
+        assert checkpoints.queue_depth == 0
+        checkpoint_dir = checkpoints.get_checkpoints_path_for_file("a.txt")
+        assert list_entries(checkpoint_dir) == [model["id"]]
+
+    async def test_server_extension_flushes_on_stop(self, checkpoints):
+        app = MultiContentsApp()
+        app.serverapp = mock.Mock(contents_manager=mock.Mock(spec=["checkpoints"]))
+        app.serverapp.contents_manager.checkpoints = checkpoints
+        model = await checkpoints.create_file_checkpoint("v1", "text", "a.txt")
+
+        await app.stop_extension()
+
+        assert checkpoints.queue_depth == 0
+        checkpoint_dir = checkpoints.get_checkpoints_path_for_file("a.txt")
+        assert list_entries(checkpoint_dir) == [model["id"]]
+
+
+class TestPruneCheckpoints(object):
+    @pytest.fixture
+    def checkpoint_tree(self, tmp_path):
+        checkpoints = AsyncMultiVersionsFileCheckpoints(
+            root_dir=str(tmp_path), checkpoint_dir=".ipynb_checkpoints"
+        )
+        now = time.time()
+        for name in ["a.txt", "dir/b.txt"]:
+            checkpoint_dir = checkpoints.get_checkpoints_path_for_file(
+                name, create_missing=True
+            )
+            for i in range(5):
+                with open(os.path.join(checkpoint_dir, f"{i:02d}"), "w") as fp:
+                    fp.write(str(i))
+            age_checkpoints(checkpoint_dir, [0, HOUR, 2 * DAY, 3 * DAY, 40 * DAY], now)
+        return tmp_path / ".ipynb_checkpoints"
+
+    def test_prune(self, checkpoint_tree, capsys):
+        args = [str(checkpoint_tree.parent), "--max-age", str(DAY)]
+        assert prune_checkpoints.main(args) == 0
+
+        for name in ["a___txt", "dir__b___txt"]:
+            assert list_entries(checkpoint_tree / name) == ["03", "04"]
+        assert "deleted 3 checkpoints" in capsys.readouterr().out
+
+    def test_prune_tiers(self, checkpoint_tree):
+        prune_checkpoints.main(
+            [
+                str(checkpoint_tree.parent),
+                "--tier",
+                f"{HOUR}:{DAY}",
+                "--tier",
+                f"{DAY}:{30 * DAY}",
+            ]
+        )
+        assert list_entries(checkpoint_tree / "a___txt") == [
+            "01",
+            "02",
+            "03",
+            "04",
+        ]
+
+    def test_dry_run(self, checkpoint_tree, capsys):
+        prune_checkpoints.main(
+            [str(checkpoint_tree.parent), "--max-count", "1", "--dry-run"]
+        )
+        assert len(list_entries(checkpoint_tree / "a___txt")) == 5
+        assert "would delete 4 checkpoints" in capsys.readouterr().out
+
+    def test_gc_is_opt_in(self, checkpoint_tree, capsys):
+        store = ObjectStore(str(checkpoint_tree / OBJECTS_DIR))
+        digest = store.put(b"unreferenced")
+        args = [str(checkpoint_tree.parent), "--max-age", str(DAY)]
+
+        prune_checkpoints.main(args)
+        assert digest in store
+        assert "blobs" not in capsys.readouterr().out
+
+        prune_checkpoints.main(args + ["--gc"])
+        assert digest not in store
+        assert "deleted 1 blobs" in capsys.readouterr().out
+
+    def test_requires_policy(self, checkpoint_tree):
+        assert prune_checkpoints.main([str(checkpoint_tree.parent)]) == 1
+        assert len(list_entries(checkpoint_tree / "a___txt")) == 5
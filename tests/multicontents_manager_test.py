@@ -1,9 +1,18 @@
+import asyncio
+import collections
+import datetime
 import os
+import threading
+import time
 
 import mock
+import nbformat
 import pytest
+from jupyter_server.services.contents.filemanager import FileContentsManager
+from jupyter_server.services.contents.largefilemanager import LargeFileManager
 from tornado.web import HTTPError
 
+from multicontents.multicontents_manager import DUMMY_CREATED_DATE
 from multicontents.multicontents_manager import MultiContentsManager
 from multicontents.multicontents_manager import WrapperManager
 
@@ -17,6 +26,81 @@ class DummyManager(object):
         return self.__dict__[name]
 
 
+class CountingManager(object):
+    """a fake backend that records every call made to it"""
+
+    def __init__(self, listing=()):
+        self.listing = list(listing)
+        self.calls = collections.Counter()
+
+    def get(self, path, content=True, type=None, format=None):
+        self.calls["get"] += 1
+        return {
+            "name": path.rsplit("/", 1)[-1],
+            "path": path,
+            "type": "directory",
+            "content": (
+                [
+                    {"name": name, "path": os.path.join(path, name)}
+                    for name in self.listing
+                ]
+                if content
+                else None
+            ),
+        }
+
+    def dir_exists(self, path):
+        self.calls["dir_exists"] += 1
+        return True
+
+    def file_exists(self, path):
+        self.calls["file_exists"] += 1
+        return False
+
+    def is_hidden(self, path):
+        self.calls["is_hidden"] += 1
+        return False
+
+
+class SlowManager(CountingManager):
+    """a backend taking a while to create, e.g. probing a bucket"""
+
+    created = []
+
+    def __init__(self, delay=0.2, fail=False):
+        time.sleep(delay)
+        if fail:
+            raise ValueError("bad config")
+        super().__init__()
+        self.created.append(self)
+
+
+class GatedManager(CountingManager):
+    """an async backend whose calls wait for `gate`, failing if `error` is set"""
+
+    def __init__(self, listing=()):
+        super().__init__(listing)
+        self.gate = asyncio.Event()
+        self.error = None
+
+    async def _wait(self):
+        await self.gate.wait()
+        if self.error is not None:
+            raise self.error
+
+    async def get(self, path, content=True, type=None, format=None):
+        await self._wait()
+        return super().get(path, content=content, type=type, format=format)
+
+    async def dir_exists(self, path):
+        await self._wait()
+        return super().dir_exists(path)
+
+    async def save(self, model, path):
+        self.calls["save"] += 1
+        return model
+
+
 class TestWrapperManager(object):
     @pytest.fixture
     def mock_import_module(self):
@@ -31,43 +115,6 @@ class TestWrapperManager(object):
         assert isinstance(wrapper.manager, DummyManager)
         assert wrapper.manager.kwarg == "foo"
 
-    @pytest.mark.parametrize(
-        "proxy_path,path,expected_result",
-        [
-            ("", "foo", True),
-            ("", "/foo", True),
-            ("", "/foo/bar", True),
-            ("", "foo/bar", True),
-            ("foo", "/foo", True),
-            ("foo", "/foo/bar", True),
-            ("foo", "foo/bar", True),
-            ("foo", "/foo/bar/baz", True),
-            ("foo", "foo/bar/baz", True),
-            ("foo", "bar", False),
-        ],
-    )
-    def test_is_parent_directory_of(self, proxy_path, path, expected_result):
-        manager = WrapperManager(proxy_path, DummyManager, {})
-        assert manager.is_parent_directory_of(path) == expected_result
-
-    @pytest.mark.parametrize(
-        "proxy_path,path,expected_result",
-        [
-            ("", "foo", False),
-            ("", "", False),
-            ("foo", "/", True),
-            ("foo", "foo", False),
-            ("foo", "/foo", False),
-            ("foo/bar", "foo/bar", False),
-            ("foo/bar", "/foo/bar", False),
-            ("foo/bar", "/foo", True),
-            ("foo/bar", "foo", True),
-        ],
-    )
-    def test_is_sub_directory_of(self, proxy_path, path, expected_result):
-        manager = WrapperManager(proxy_path, DummyManager, {})
-        assert manager.is_sub_directory_of(path) == expected_result
-
     @pytest.mark.parametrize(
         "proxy_path,path,expected_result",
         [
@@ -78,6 +125,9 @@ class TestWrapperManager(object):
             ("foo", "/foo/bar/baz", "bar/baz"),
             ("foo/bar", "/foo/bar/", ""),
             ("foo/bar", "/foo/bar/baz", "baz"),
+            ("", "", ""),
+            ("foo", "foobar", "foobar"),
+            ("foo", "foo//bar", "bar"),
         ],
     )
     def test_to_actual_path(self, proxy_path, path, expected_result):
@@ -98,26 +148,40 @@ class TestWrapperManager(object):
         manager = WrapperManager(proxy_path, DummyManager, {})
         assert manager.to_proxy_path(path) == expected_result
 
+    @pytest.mark.parametrize(
+        "proxy_path,paths,expected_paths",
+        [
+            ("", ["foo", "/bar/baz"], ["foo", "bar/baz"]),
+            ("proxy", ["foo", "bar/baz/"], ["proxy/foo", "proxy/bar/baz"]),
+            ("pro/xy", ["foo"], ["pro/xy/foo"]),
+        ],
+    )
+    def test_to_proxy_models(self, proxy_path, paths, expected_paths):
+        manager = WrapperManager(proxy_path, DummyManager, {})
+        models = [{"name": "n", "path": path} for path in paths]
+        assert manager.to_proxy_models(models) is models
+        assert [model["path"] for model in models] == expected_paths
+        assert all(model["name"] == "n" for model in models)
+
     async def test_get(self):
-        mock_get = mock.Mock(return_value={"content": [{"path": "foo/bar"}]})
-        mock_dir_exists = mock.Mock(return_value=True)
-        manager = WrapperManager(
-            "proxy", DummyManager, {"get": mock_get, "dir_exists": mock_dir_exists}
+        mock_get = mock.Mock(
+            return_value={"type": "directory", "content": [{"path": "foo/bar"}]}
         )
-        with mock.patch.object(manager, "to_proxy_path") as mock_to_proxy:
-            result = await manager.get("path")
-        assert result["content"] == [{"path": mock_to_proxy()}]
+        manager = WrapperManager("proxy", DummyManager, {"get": mock_get})
+        result = await manager.get("path")
+        assert result["content"] == [{"path": "proxy/foo/bar"}]
+
+    async def test_get_file_content_is_untouched(self):
+        mock_get = mock.Mock(return_value={"type": "file", "content": "foo/bar"})
+        manager = WrapperManager("proxy", DummyManager, {"get": mock_get})
+        result = await manager.get("proxy/file")
+        assert result["content"] == "foo/bar"
 
     async def test_get_with_async_underlying_manager(self):
         async def async_get(path, *args, **kwargs):
-            return {"content": [{"path": "foo/bar"}]}
-
-        async def async_dir_exists(path):
-            return True
+            return {"type": "directory", "content": [{"path": "foo/bar"}]}
 
-        manager = WrapperManager(
-            "proxy", DummyManager, {"get": async_get, "dir_exists": async_dir_exists}
-        )
+        manager = WrapperManager("proxy", DummyManager, {"get": async_get})
         result = await manager.get("proxy/somefile")
         assert result["content"] == [{"path": "proxy/foo/bar"}]
 
@@ -173,6 +237,263 @@ class TestWrapperManager(object):
             [mock.call("old_path"), mock.call("new_path")]
         )
 
+    async def test_sync_manager_runs_on_executor(self):
+        thread_names = []
+
+        def dir_exists(path):
+            thread_names.append(threading.current_thread().name)
+            return True
+
+        manager = WrapperManager(
+            "proxy", DummyManager, {"dir_exists": dir_exists}, executor_workers=2
+        )
+        assert await manager.dir_exists("proxy/foo") is True
+        assert thread_names == [mock.ANY]
+        assert thread_names[0].startswith("multicontents-proxy")
+        assert manager.executor._max_workers == 2
+        manager.close()
+
+    async def test_async_manager_skips_executor(self):
+        thread_names = []
+
+        async def dir_exists(path):
+            thread_names.append(threading.current_thread().name)
+            return True
+
+        manager = WrapperManager(
+            "proxy", DummyManager, {"dir_exists": dir_exists}, executor_workers=2
+        )
+        assert await manager.dir_exists("proxy/foo") is True
+        assert thread_names == [threading.current_thread().name]
+        manager.close()
+
+    async def test_executor_keeps_event_loop_responsive(self):
+        def slow_get(path, **kwargs):
+            time.sleep(0.2)
+            return {"type": "file", "path": path, "content": "slow"}
+
+        manager = WrapperManager(
+            "proxy", DummyManager, {"get": slow_get}, executor_workers=1
+        )
+        ticks = 0
+
+        async def ticker():
+            nonlocal ticks
+            while True:
+                ticks += 1
+                await asyncio.sleep(0.01)
+
+        task = asyncio.ensure_future(ticker())
+        result = await manager.get("proxy/file")
+        task.cancel()
+        assert result["path"] == "proxy/file"
+        assert ticks > 5
+        manager.close()
+
+    @pytest.fixture
+    def cached_manager(self):
+        return WrapperManager(
+            "proxy", CountingManager, {"listing": ["a"]}, cache={"ttl": 60}
+        )
+
+    async def test_cache_metadata_calls(self, cached_manager):
+        for _ in range(3):
+            assert await cached_manager.dir_exists("proxy/dir") is True
+            assert await cached_manager.file_exists("proxy/dir") is False
+            assert await cached_manager.is_hidden("proxy/dir") is False
+            assert (await cached_manager.get("proxy/dir", content=False))[
+                "path"
+            ] == "proxy/dir"
+        assert cached_manager.manager.calls == {
+            "dir_exists": 1,
+            "file_exists": 1,
+            "is_hidden": 1,
+            "get": 1,
+        }
+        assert cached_manager.cache.stats() == {"hits": 8, "misses": 4, "size": 4}
+
+    async def test_cache_skips_content(self, cached_manager):
+        await cached_manager.get("proxy/dir", content=True)
+        await cached_manager.get("proxy/dir")
+        assert cached_manager.manager.calls == {"get": 2}
+
+    async def test_cache_returns_copies(self, cached_manager):
+        model = await cached_manager.get("proxy/dir", content=False)
+        model["content"] = "mutated"
+        assert (await cached_manager.get("proxy/dir", content=False))["content"] is None
+
+    @pytest.mark.parametrize(
+        "write",
+        [
+            lambda m: m.save({}, "proxy/dir/file"),
+            lambda m: m.delete_file("proxy/dir/file"),
+            lambda m: m.rename_file("proxy/dir/file", "proxy/other"),
+        ],
+    )
+    async def test_cache_invalidated_by_writes(self, cached_manager, write):
+        cached_manager.manager.save = mock.Mock()
+        cached_manager.manager.delete_file = mock.Mock()
+        cached_manager.manager.rename_file = mock.Mock()
+        await cached_manager.dir_exists("proxy/dir")
+        await cached_manager.dir_exists("proxy/dir/file")
+        await cached_manager.dir_exists("proxy/unrelated")
+
+        await write(cached_manager)
+
+        await cached_manager.dir_exists("proxy/dir")
+        await cached_manager.dir_exists("proxy/dir/file")
+        await cached_manager.dir_exists("proxy/unrelated")
+        assert cached_manager.manager.calls == {"dir_exists": 5}
+
+    @pytest.fixture
+    def single_flight_manager(self):
+        return WrapperManager(
+            "proxy", GatedManager, {"listing": ["a"]}, single_flight=True
+        )
+
+    async def test_single_flight_merges_identical_calls(self, single_flight_manager):
+        manager = single_flight_manager
+        calls = [
+            manager.get("proxy/dir"),
+            manager.get("proxy/dir"),
+            manager.get("proxy/dir", content=False),
+            manager.dir_exists("proxy/dir"),
+            manager.dir_exists("proxy/dir"),
+        ]
+        tasks = [asyncio.ensure_future(call) for call in calls]
+        await asyncio.sleep(0)
+        assert manager.flights.stats() == {"calls": 3, "shared": 2, "in_flight": 3}
+        manager.manager.gate.set()
+        first, second, metadata, exists, _ = await asyncio.gather(*tasks)
+
+        assert manager.manager.calls == {"get": 2, "dir_exists": 1}
+        assert first == second
+        assert first["content"] == [{"name": "a", "path": "proxy/dir/a"}]
+        assert metadata["content"] is None
+        assert exists is True
+        # every caller gets its own copy
+        first["content"].append("mutated")
+        first["content"][0]["name"] = "mutated"
+        assert second["content"] == [{"name": "a", "path": "proxy/dir/a"}]
+        assert len(manager.flights) == 0
+
+        # calls after the flight landed make a new one
+        await manager.get("proxy/dir")
+        assert manager.manager.calls["get"] == 3
+
+    async def test_single_flight_shares_errors(self, single_flight_manager):
+        manager = single_flight_manager
+        manager.manager.error = HTTPError(500, "backend down")
+        tasks = [asyncio.ensure_future(manager.get("proxy/dir")) for _ in range(3)]
+        await asyncio.sleep(0)
+        manager.manager.gate.set()
+        results = await asyncio.gather(*tasks, return_exceptions=True)
+        assert all(isinstance(result, HTTPError) for result in results)
+        assert manager.manager.calls == {}
+        assert len(manager.flights) == 0
+
+    async def test_single_flight_survives_cancelled_caller(self, single_flight_manager):
+        manager = single_flight_manager
+        first = asyncio.ensure_future(manager.dir_exists("proxy/dir"))
+        second = asyncio.ensure_future(manager.dir_exists("proxy/dir"))
+        await asyncio.sleep(0)
+        first.cancel()
+        manager.manager.gate.set()
+        assert await second is True
+        assert manager.manager.calls == {"dir_exists": 1}
+
+    @pytest.mark.parametrize(
+        "written", ["proxy/dir", "proxy", "proxy/dir/file", "proxy/other"]
+    )
+    async def test_single_flight_detached_by_writes(
+        self, single_flight_manager, written
+    ):
+        manager = single_flight_manager
+        before = asyncio.ensure_future(manager.get("proxy/dir"))
+        await asyncio.sleep(0)
+        await manager.save({}, written)
+        after = asyncio.ensure_future(manager.get("proxy/dir"))
+        await asyncio.sleep(0)
+        manager.manager.gate.set()
+        await asyncio.gather(before, after)
+        expected = 1 if written == "proxy/other" else 2
+        assert manager.manager.calls["get"] == expected
+
+    @pytest.fixture
+    def disk_cached_manager(self, tmp_path):
+        root = tmp_path / "root"
+        root.mkdir()
+        (root / "a.txt").write_text("hello")
+        nbformat.write(
+            nbformat.v4.new_notebook(cells=[nbformat.v4.new_code_cell("1 + 1")]),
+            str(root / "a.ipynb"),
+        )
+        manager = WrapperManager(
+            "proxy",
+            FileContentsManager,
+            {"root_dir": str(root)},
+            content_cache={"directory": str(tmp_path / "cache")},
+        )
+        manager.manager.get = mock.Mock(wraps=manager.manager.get)
+        return manager
+
+    def content_gets(self, manager):
+        return [
+            c
+            for c in manager.manager.get.call_args_list
+            if c.kwargs.get("content", True)
+        ]
+
+    @pytest.mark.parametrize("path", ["proxy/a.txt", "proxy/a.ipynb"])
+    async def test_disk_cache_serves_repeated_reads(self, disk_cached_manager, path):
+        manager = disk_cached_manager
+        first = await manager.get(path)
+        second = await manager.get(path)
+        assert second == first
+        assert second["path"] == path
+        assert len(self.content_gets(manager)) == 1
+        assert manager.content_cache.stats()["hits"] == 1
+
+        # a different format is a different entry
+        await manager.get(path, format="base64", type="file")
+        assert len(self.content_gets(manager)) == 2
+
+    async def test_disk_cache_validates_with_backend(
+        self, disk_cached_manager, tmp_path
+    ):
+        manager = disk_cached_manager
+        await manager.get("proxy/a.txt")
+        # changed behind the server's back
+        (tmp_path / "root" / "a.txt").write_text("hello world")
+        assert (await manager.get("proxy/a.txt"))["content"] == "hello world"
+        assert len(self.content_gets(manager)) == 2
+
+    @pytest.mark.parametrize(
+        "write",
+        [
+            lambda m: m.save(
+                {"type": "file", "format": "text", "content": "bye"}, "proxy/a.txt"
+            ),
+            lambda m: m.delete_file("proxy/a.txt"),
+            lambda m: m.rename_file("proxy/a.txt", "proxy/b.txt"),
+        ],
+    )
+    async def test_disk_cache_invalidated_by_writes(self, disk_cached_manager, write):
+        manager = disk_cached_manager
+        await manager.get("proxy/a.txt")
+        await manager.get("proxy/a.ipynb")
+        await write(manager)
+        assert [path for path, _ in manager.content_cache._entries.values()] == [
+            "proxy/a.ipynb"
+        ]
+
+    async def test_disk_cache_skips_directories(self, disk_cached_manager):
+        manager = disk_cached_manager
+        await manager.get("proxy")
+        await manager.get("proxy")
+        assert len(self.content_gets(manager)) == 2
+        assert len(manager.content_cache) == 0
+
 
 class TestMultiContentsManager(object):
     @pytest.fixture
@@ -214,6 +535,27 @@ class TestMultiContentsManager(object):
             "foo",
         ]
 
+    @pytest.mark.parametrize(
+        "path,expected_proxy_path",
+        [("", ""), ("child", "child"), ("child/file", "child"), ("other", "")],
+    )
+    def test_get_manager(self, manager_with_root, path, expected_proxy_path):
+        assert manager_with_root.get_manager(path).proxy_path == expected_proxy_path
+
+    def test_get_manager__not_found(self, manager_without_root):
+        with pytest.raises(HTTPError) as e:
+            manager_without_root.get_manager("not_exists")
+        assert e.value.status_code == 404
+
+    def test_managers_changed(self, manager_without_root):
+        manager_without_root.managers = {
+            "new": {"manager_class": DummyManager, "kwargs": {}}
+        }
+        assert [m.proxy_path for m in manager_without_root._managers] == ["new"]
+        assert manager_without_root.get_manager("new/file").proxy_path == "new"
+        with pytest.raises(HTTPError):
+            manager_without_root.get_manager("foo")
+
     @pytest.mark.parametrize(
         "path,expected_result",
         [("", ["abc", "def", "child"]), ("child", ["child/foo"])],
@@ -221,13 +563,14 @@ class TestMultiContentsManager(object):
     async def test_get_with_manager_with_root(
         self, manager_with_root, path, expected_result
     ):
-        manager_with_root._managers[1].manager.dir_exists = mock.Mock(return_value=True)
         manager_with_root._managers[1].manager.get = mock.Mock(
-            return_value={"content": [{"path": "abc"}, {"path": "def"}]}
+            return_value={
+                "type": "directory",
+                "content": [{"path": "abc"}, {"path": "def"}],
+            }
         )
-        manager_with_root._managers[0].manager.dir_exists = mock.Mock(return_value=True)
         manager_with_root._managers[0].manager.get = mock.Mock(
-            return_value={"content": [{"path": "foo"}]}
+            return_value={"type": "directory", "content": [{"path": "foo"}]}
         )
         result = await manager_with_root.get(path, content=True)
         assert [item["path"] for item in result["content"]] == expected_result
@@ -243,21 +586,258 @@ class TestMultiContentsManager(object):
     async def test_get_without_manager_with_root(
         self, manager_without_root, path, expected_result
     ):
-        manager_without_root._managers[1].manager.dir_exists = mock.Mock(
-            return_value=True
-        )
         manager_without_root._managers[1].manager.get = mock.Mock(
-            return_value={"content": [{"path": "abc"}, {"path": "def"}]}
-        )
-        manager_without_root._managers[0].manager.dir_exists = mock.Mock(
-            return_value=True
+            return_value={
+                "type": "directory",
+                "content": [{"path": "abc"}, {"path": "def"}],
+            }
         )
         manager_without_root._managers[0].manager.get = mock.Mock(
-            return_value={"content": [{"path": "ghi"}]}
+            return_value={"type": "directory", "content": [{"path": "ghi"}]}
         )
         result = await manager_without_root.get(path, content=True)
         assert [item["path"] for item in result["content"]] == expected_result
 
+    async def test_get_directory_costs_one_backend_call(self):
+        manager = MultiContentsManager(
+            managers={
+                "data": {
+                    "manager_class": CountingManager,
+                    "kwargs": {"listing": ["a.txt", "b.txt"]},
+                },
+            }
+        )
+        result = await manager.get("data/folder", content=True)
+
+        assert [item["path"] for item in result["content"]] == [
+            "data/folder/a.txt",
+            "data/folder/b.txt",
+        ]
+        assert manager._managers[0].manager.calls == {"get": 1}
+
+    async def test_cache_stats(self):
+        manager = MultiContentsManager(
+            managers={
+                "cached": {
+                    "manager_class": CountingManager,
+                    "kwargs": {},
+                    "cache": {"ttl": 60, "max_size": 10},
+                },
+                "uncached": {"manager_class": CountingManager, "kwargs": {}},
+            }
+        )
+        await manager.dir_exists("cached/foo")
+        await manager.dir_exists("cached/foo")
+        assert manager.cache_stats() == {"cached": {"hits": 1, "misses": 1, "size": 1}}
+
+    async def test_single_flight_stats(self):
+        manager = MultiContentsManager(
+            managers={
+                "shared": {
+                    "manager_class": CountingManager,
+                    "kwargs": {},
+                    "single_flight": True,
+                },
+                "users/{username}": {
+                    "manager_class": CountingManager,
+                    "kwargs": {},
+                    "single_flight": True,
+                },
+                "": {"manager_class": CountingManager, "kwargs": {}},
+            }
+        )
+        await asyncio.gather(
+            manager.dir_exists("shared/foo"), manager.dir_exists("users/alice/foo")
+        )
+        assert manager.single_flight_stats() == {
+            "shared": {"calls": 1, "shared": 0, "in_flight": 0},
+            "users/alice": {"calls": 1, "shared": 0, "in_flight": 0},
+        }
+
+    async def test_content_cache_stats(self, tmp_path):
+        (tmp_path / "a.txt").write_text("hello")
+        manager = MultiContentsManager(
+            managers={
+                "": {
+                    "manager_class": FileContentsManager,
+                    "kwargs": {"root_dir": str(tmp_path)},
+                    "content_cache": {"directory": str(tmp_path / ".cache")},
+                },
+                "other": {"manager_class": CountingManager, "kwargs": {}},
+            }
+        )
+        await manager.get("a.txt")
+        await manager.get("a.txt")
+        stats = manager.content_cache_stats()
+        assert list(stats) == [""]
+        assert stats[""]["hits"] == 1
+        assert stats[""]["entries"] == 1
+
+    async def test_mount_metrics(self, tmp_path):
+        manager = MultiContentsManager(
+            collect_metrics=True,
+            managers={
+                "local": {
+                    "manager_class": FileContentsManager,
+                    "kwargs": {"root_dir": str(tmp_path)},
+                },
+                "dummy": {"manager_class": CountingManager, "kwargs": {}},
+            },
+        )
+        await manager.save(
+            {"type": "file", "format": "text", "content": "1234"}, "local/a.txt"
+        )
+        await manager.get("local/a.txt")
+        with pytest.raises(HTTPError):
+            await manager.get("local/missing.txt")
+
+        stats = manager.mount_metrics()
+        assert sorted(stats) == ["dummy", "local"]
+        assert stats["local"]["save"]["calls"] == 1
+        assert stats["local"]["save"]["bytes"] == 4
+        assert stats["local"]["get"]["calls"] == 2
+        assert stats["local"]["get"]["errors"] == 1
+        assert stats["local"]["get"]["bytes"] == 4
+        assert stats["dummy"] == {}
+
+    async def test_no_metrics_by_default(self, manager_with_root):
+        assert manager_with_root.mount_metrics() == {}
+        assert all(manager.metrics is None for manager in manager_with_root._managers)
+
+    @pytest.fixture
+    def slow_mounts(self):
+        SlowManager.created.clear()
+        managers = {
+            f"mount{i}": {"manager_class": SlowManager, "kwargs": {}} for i in range(5)
+        }
+        managers["broken"] = {
+            "manager_class": SlowManager,
+            "kwargs": {"fail": True},
+        }
+        return managers
+
+    async def test_lazy_mounts(self, slow_mounts):
+        start = time.perf_counter()
+        manager = MultiContentsManager(mount_loading="lazy", managers=slow_mounts)
+        assert time.perf_counter() - start < 0.2
+        assert manager.get_manager("mount1/a").proxy_path == "mount1"
+        assert SlowManager.created == []
+        assert manager.mount_init_stats() == {}
+
+        assert await manager.dir_exists("mount1/a")
+        assert len(SlowManager.created) == 1
+        assert list(manager.mount_init_stats()) == ["mount1"]
+
+    async def test_lazy_mount_failure(self, slow_mounts):
+        manager = MultiContentsManager(mount_loading="lazy", managers=slow_mounts)
+        wrapper = manager.get_manager("broken")
+        for _ in range(2):
+            start = time.perf_counter()
+            with pytest.raises(HTTPError) as e:
+                await manager.dir_exists("broken/a")
+            assert e.value.status_code == 503
+        # the error is remembered instead of creating the backend again
+        assert time.perf_counter() - start < 0.2
+        assert isinstance(wrapper.init_error, ValueError)
+        assert await manager.dir_exists("mount1/a")
+
+    def test_concurrent_mounts(self, slow_mounts):
+        start = time.perf_counter()
+        manager = MultiContentsManager(mount_loading="concurrent", managers=slow_mounts)
+        assert time.perf_counter() - start < 0.2 * 3
+        assert len(SlowManager.created) == 5
+
+        stats = manager.mount_init_stats()
+        assert sorted(stats) == ["broken"] + [f"mount{i}" for i in range(5)]
+        assert stats["broken"]["error"] == "ValueError('bad config')"
+        assert stats["mount0"]["error"] is None
+        assert stats["mount0"]["seconds"] >= 0.2
+
+    def test_eager_mount_failure(self, slow_mounts):
+        with pytest.raises(ValueError):
+            MultiContentsManager(managers=slow_mounts)
+
+    @pytest.fixture
+    def templated_manager(self, tmp_path):
+        for name in ["alice", "bob", "carol"]:
+            (tmp_path / name).mkdir()
+        return MultiContentsManager(
+            mount_pool_size=2,
+            collect_metrics=True,
+            managers={
+                "users/{username}": {
+                    "manager_class": FileContentsManager,
+                    "kwargs": {"root_dir": str(tmp_path / "{username}")},
+                },
+            },
+        )
+
+    async def test_templated_mount(self, templated_manager, tmp_path):
+        await templated_manager.save(
+            {"type": "file", "format": "text", "content": "hi"}, "users/alice/a.txt"
+        )
+        assert (tmp_path / "alice" / "a.txt").read_text() == "hi"
+        model = await templated_manager.get("users/alice/a.txt")
+        assert model["path"] == "users/alice/a.txt"
+
+        mount = templated_manager.get_manager("users/alice/a.txt")
+        assert mount.proxy_path == "users/alice"
+        assert templated_manager.get_manager("users/alice") is mount
+        assert templated_manager.get_manager("users/bob") is not mount
+        assert list(templated_manager.mount_metrics()) == ["users/{username}"]
+
+    async def test_templated_mount_rejects_dots(self, templated_manager):
+        with pytest.raises(HTTPError) as e:
+            templated_manager.get_manager("users/../a.txt")
+        assert e.value.status_code == 404
+
+    def test_pool_evicts_least_recently_used(self, templated_manager):
+        alice = templated_manager.get_manager("users/alice")
+        bob = templated_manager.get_manager("users/bob")
+        templated_manager.get_manager("users/alice")
+        with mock.patch.object(bob, "close") as close:
+            templated_manager.get_manager("users/carol")
+        assert close.called
+        assert templated_manager.get_manager("users/alice") is alice
+        assert templated_manager.get_manager("users/bob") is not bob
+
+    def test_pool_closes_idle_mounts(self, templated_manager):
+        with mock.patch("time.monotonic", return_value=1000):
+            alice = templated_manager.get_manager("users/alice")
+        with mock.patch("time.monotonic", return_value=1000 + 601):
+            assert templated_manager.get_manager("users/bob") is not alice
+            assert [m.proxy_path for m in templated_manager._mounts()] == ["users/bob"]
+
+    async def test_unhealthy_mount_fails_fast(self):
+        class HangingManager(CountingManager):
+            def dir_exists(self, path):
+                time.sleep(0.5)
+
+        manager = MultiContentsManager(
+            mount_metadata=True,
+            managers={
+                "": {"manager_class": CountingManager, "kwargs": {}},
+                "hanging": {
+                    "manager_class": HangingManager,
+                    "kwargs": {},
+                    "executor_workers": 1,
+                    "health": {"timeout": 0.05, "failure_threshold": 1},
+                },
+            },
+        )
+        with pytest.raises(HTTPError) as e:
+            await manager.dir_exists("hanging/a")
+        assert e.value.status_code == 504
+
+        start = time.perf_counter()
+        with pytest.raises(HTTPError) as e:
+            await manager.dir_exists("hanging/a")
+        assert e.value.status_code == 503
+        listing = await manager.get("", content=True)
+        assert time.perf_counter() - start < 0.05
+        assert listing["content"][-1]["unavailable"]
+        assert manager.mount_health()["hanging"]["state"] == "open"
+
     async def test_rename_file_same_manager(self, manager_with_root):
         manager_with_root._managers[0].manager.rename_file = mock.Mock()
         await manager_with_root.rename_file("child/test1", "child/test2")
@@ -274,99 +854,222 @@ class TestMultiContentsManager(object):
         with pytest.raises(HTTPError):
             await manager_without_root.rename_file(old_path, new_path)
 
-    async def test_rename_file_different_manager_file(self, manager_with_root):
-        fake_model = {"path": "test1", "content": None, "type": "file"}
-        manager_with_root._managers[0].manager.get = mock.Mock(return_value=fake_model)
-        manager_with_root._managers[0].manager.dir_exists = mock.Mock(
-            return_value=False
+    @pytest.fixture
+    def no_transfer_strategies(self):
+        with mock.patch.dict("multicontents.transfer._transfer_strategies", clear=True):
+            yield
+
+    @pytest.fixture
+    def local_manager(self, tmp_path):
+        for name in ["src", "dst", "plain"]:
+            (tmp_path / name).mkdir()
+        kwargs = {"delete_to_trash": False}
+        return MultiContentsManager(
+            managers={
+                "src": {
+                    "manager_class": FileContentsManager,
+                    "kwargs": dict(kwargs, root_dir=str(tmp_path / "src")),
+                },
+                "dst": {
+                    "manager_class": LargeFileManager,
+                    "kwargs": dict(kwargs, root_dir=str(tmp_path / "dst")),
+                },
+                "plain": {
+                    "manager_class": FileContentsManager,
+                    "kwargs": dict(kwargs, root_dir=str(tmp_path / "plain")),
+                },
+            }
         )
-        manager_with_root._managers[0].manager.delete_file = mock.Mock()
-        manager_with_root._managers[1].manager.save = mock.Mock()
 
-        async def fake_dir_exists(path):
-            return False
+    @pytest.mark.usefixtures("no_transfer_strategies")
+    async def test_rename_file_different_manager_streams_chunks(
+        self, local_manager, tmp_path
+    ):
+        content = bytes(range(95))
+        (tmp_path / "src" / "data.bin").write_bytes(content)
+        local_manager.transfer_chunk_size = 10
+        local_manager.transfer_progress = mock.Mock()
+        dst = local_manager.get_manager("dst")
+        src = local_manager.get_manager("src")
 
-        with mock.patch.object(
-            manager_with_root, "dir_exists", side_effect=fake_dir_exists
+        with (
+            mock.patch.object(dst.manager, "save", wraps=dst.manager.save) as mock_save,
+            mock.patch.object(src.manager, "get", wraps=src.manager.get) as mock_get,
         ):
-            await manager_with_root.rename_file("child/test1", "test2")
-        manager_with_root._managers[0].manager.get.assert_called_once_with("test1")
-        manager_with_root._managers[1].manager.save.assert_called_once_with(
-            fake_model, "test2"
+            await local_manager.rename_file("src/data.bin", "dst/moved.bin")
+
+        assert (tmp_path / "dst" / "moved.bin").read_bytes() == content
+        assert not (tmp_path / "src" / "data.bin").exists()
+        assert [c.args[0]["chunk"] for c in mock_save.call_args_list] == list(
+            range(1, 10)
+        ) + [-1]
+        assert all(c.kwargs.get("content", True) is False for c in mock_get.mock_calls)
+        local_manager.transfer_progress.assert_has_calls(
+            [mock.call("src/data.bin", n, 95) for n in range(10, 95, 10)]
+            + [mock.call("src/data.bin", 95, 95)]
         )
-        manager_with_root._managers[0].manager.delete_file.assert_called_once_with(
-            "test1"
+
+    @pytest.mark.usefixtures("no_transfer_strategies")
+    async def test_rename_file_different_manager_small_file(
+        self, local_manager, tmp_path
+    ):
+        (tmp_path / "src" / "small.txt").write_text("small")
+        dst = local_manager.get_manager("dst")
+        with mock.patch.object(
+            dst.manager, "save", wraps=dst.manager.save
+        ) as mock_save:
+            await local_manager.rename_file("src/small.txt", "dst/small.txt")
+
+        assert (tmp_path / "dst" / "small.txt").read_text() == "small"
+        assert "chunk" not in mock_save.call_args.args[0]
+
+    @pytest.mark.usefixtures("no_transfer_strategies")
+    async def test_rename_file_different_manager_without_chunk_support(
+        self, local_manager, tmp_path
+    ):
+        (tmp_path / "src" / "data.txt").write_text("x" * 100)
+        local_manager.transfer_chunk_size = 10
+        await local_manager.rename_file("src/data.txt", "plain/data.txt")
+        assert (tmp_path / "plain" / "data.txt").read_text() == "x" * 100
+        assert not (tmp_path / "src" / "data.txt").exists()
+
+    @pytest.mark.usefixtures("no_transfer_strategies")
+    async def test_rename_file_different_manager_notebook(
+        self, local_manager, tmp_path
+    ):
+        notebook = nbformat.v4.new_notebook(
+            cells=[nbformat.v4.new_code_cell("print(1)")]
         )
+        nbformat.write(notebook, str(tmp_path / "src" / "nb.ipynb"))
+        raw = (tmp_path / "src" / "nb.ipynb").read_bytes()
+        local_manager.transfer_chunk_size = 16
+        await local_manager.rename_file("src/nb.ipynb", "dst/nb.ipynb")
 
-    def get_fake_item(self, path):
-        items = {"folder_1": {"file_2": None, "folder_3": {"file_4": None}}}
-        obj = items
-        for key in path.strip("/").split("/"):
-            obj = obj[key]
-        return obj
+        assert (tmp_path / "dst" / "nb.ipynb").read_bytes() == raw
+        model = await local_manager.get("dst/nb.ipynb")
+        assert model["type"] == "notebook"
 
-    @pytest.fixture
-    def mock_dir_exists(self, manager_with_root):
-        async def dir_exists(path):
-            return self.get_fake_item(path) is not None
+    @pytest.mark.usefixtures("no_transfer_strategies")
+    async def test_rename_file_different_manager_dir(self, local_manager, tmp_path):
+        (tmp_path / "src" / "folder_1" / "folder_3").mkdir(parents=True)
+        (tmp_path / "src" / "folder_1" / "file_2").write_text("2")
+        (tmp_path / "src" / "folder_1" / "folder_3" / "file_4").write_text("4")
 
-        with mock.patch.object(manager_with_root, "dir_exists", side_effect=dir_exists):
-            yield
+        await local_manager.rename_file("src/folder_1", "dst/test_2")
+
+        assert (tmp_path / "dst" / "test_2" / "file_2").read_text() == "2"
+        assert (tmp_path / "dst" / "test_2" / "folder_3" / "file_4").read_text() == "4"
+        assert not (tmp_path / "src" / "folder_1").exists()
+
+    async def test_copy_same_manager(self, manager_with_root):
+        backend = manager_with_root._managers[0].manager
+        backend.copy = mock.Mock(return_value={"path": "copied.txt", "type": "file"})
+
+        model = await manager_with_root.copy("child/file.txt", "child/copied.txt")
+
+        backend.copy.assert_called_once_with("file.txt", "copied.txt")
+        assert model["path"] == "child/copied.txt"
+
+    async def test_copy_same_manager_without_destination(self, manager_with_root):
+        backend = manager_with_root._managers[0].manager
+        backend.copy = mock.Mock(return_value={"path": "file-Copy1.txt"})
+
+        model = await manager_with_root.copy("child/file.txt")
+
+        backend.copy.assert_called_once_with("file.txt", None)
+        assert model["path"] == "child/file-Copy1.txt"
+
+    async def test_copy_different_manager_into_directory(self, local_manager, tmp_path):
+        (tmp_path / "src" / "file.txt").write_text("content")
+        (tmp_path / "plain" / "file.txt").write_text("existing")
+
+        model = await local_manager.copy("src/file.txt", "plain")
+
+        assert model["path"] == "plain/file-Copy1.txt"
+        assert (tmp_path / "plain" / "file-Copy1.txt").read_text() == "content"
+        assert (tmp_path / "plain" / "file.txt").read_text() == "existing"
+        assert (tmp_path / "src" / "file.txt").read_text() == "content"
+
+    @pytest.mark.usefixtures("no_transfer_strategies")
+    async def test_copy_different_manager_streams(self, local_manager, tmp_path):
+        (tmp_path / "src" / "data.bin").write_bytes(bytes(range(50)))
+        local_manager.transfer_chunk_size = 10
+        dst = local_manager.get_manager("dst")
+
+        with mock.patch.object(
+            dst.manager, "save", wraps=dst.manager.save
+        ) as mock_save:
+            model = await local_manager.copy("src/data.bin", "dst/copy.bin")
+
+        assert model["path"] == "dst/copy.bin"
+        assert (tmp_path / "dst" / "copy.bin").read_bytes() == bytes(range(50))
+        assert (tmp_path / "src" / "data.bin").exists()
+        assert mock_save.call_count == 5
+
+    async def test_copy_different_manager_directory(self, local_manager, tmp_path):
+        (tmp_path / "src" / "folder").mkdir()
+        with pytest.raises(HTTPError) as e:
+            await local_manager.copy("src/folder", "dst/folder")
+        assert e.value.status_code == 400
+
+    async def test_copy_different_manager_missing_parent(self, local_manager, tmp_path):
+        (tmp_path / "src" / "file.txt").write_text("content")
+        with pytest.raises(HTTPError) as e:
+            await local_manager.copy("src/file.txt", "dst/missing/file.txt")
+        assert e.value.status_code == 404
 
     @pytest.fixture
-    def mock_get(self, manager_with_root):
-        async def get(path, **kwargs):
-            obj = self.get_fake_item(path)
-            content = (
-                [{"name": key, "path": os.path.join(path, key)} for key in obj]
-                if obj is not None
-                else ""
-            )
-            return {"name": path.rsplit("/", 1)[-1], "path": path, "content": content}
-
-        with mock.patch.object(manager_with_root, "get", side_effect=get):
-            manager_with_root._managers[1].manager.dir_exists = mock.Mock(
-                side_effect=lambda path: self.get_fake_item(path) is not None
-            )
-            manager_with_root._managers[1].manager.get = mock.Mock(
-                side_effect=lambda path, **kwargs: {
-                    "name": path.rsplit("/", 1)[-1],
+    def metadata_manager(self):
+        modified = datetime.datetime(2020, 1, 1, tzinfo=datetime.timezone.utc)
+
+        def fake_get(delay=0, error=None):
+            async def get(path, content=True, **kwargs):
+                await asyncio.sleep(delay)
+                if error is not None:
+                    raise error
+                return {
+                    "name": "",
                     "path": path,
-                    "content": (
-                        [{"name": key, "path": os.path.join(path, key)} for key in obj]
-                        if (obj := self.get_fake_item(path)) is not None
-                        else ""
-                    ),
+                    "type": "directory",
+                    "writable": False,
+                    "last_modified": modified,
+                    "created": modified,
+                    "content": [] if content else None,
                 }
-            )
-            yield
-
-    async def test_rename_file_different_manager_dir(
-        self, manager_with_root, mock_dir_exists, mock_get
-    ):
-        manager_with_root._managers[1].manager.delete_file = mock.Mock()
-        manager_with_root._managers[0].manager.save = mock.Mock()
 
-        await manager_with_root.rename_file("folder_1", "child/test_2")
+            return get
 
-        old_files = [
-            "folder_1",
-            "folder_1/file_2",
-            "folder_1/folder_3",
-            "folder_1/folder_3/file_4",
-        ]
-        manager_with_root._managers[1].manager.get.assert_has_calls(
-            [mock.call(f) for f in old_files]
-        )
-        new_files = [
-            "test_2",
-            "test_2/file_2",
-            "test_2/folder_3",
-            "test_2/folder_3/file_4",
-        ]
-        manager_with_root._managers[0].manager.save.assert_has_calls(
-            [mock.call(mock.ANY, f) for f in new_files]
-        )
-        manager_with_root._managers[1].manager.delete_file.assert_has_calls(
-            [mock.call(f) for f in old_files], any_order=True
+        mounts = {
+            "": {},
+            "fast": {},
+            "slow": {"delay": 0.1},
+            "dead": {"delay": 10},
+            "broken": {"error": HTTPError(500)},
+        }
+        manager = MultiContentsManager(
+            mount_metadata=True,
+            mount_metadata_timeout=0.5,
+            managers={
+                path: {"manager_class": DummyManager, "kwargs": {"get": fake_get(**kw)}}
+                for path, kw in mounts.items()
+            },
         )
+        return manager, modified
+
+    async def test_get_mount_metadata(self, metadata_manager):
+        manager, modified = metadata_manager
+        started = time.monotonic()
+        result = await manager.get("", content=True)
+        elapsed = time.monotonic() - started
+
+        models = {model["path"]: model for model in result["content"]}
+        assert set(models) == {"fast", "slow", "dead", "broken"}
+        for path in ["fast", "slow"]:
+            assert models[path]["last_modified"] == modified
+            assert models[path]["writable"] is False
+            assert "unavailable" not in models[path]
+        for path in ["dead", "broken"]:
+            assert models[path]["unavailable"] is True
+            assert models[path]["last_modified"] == DUMMY_CREATED_DATE
+        # mounts are queried concurrently and the dead one is given up on
+        assert elapsed < 1
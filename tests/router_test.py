@@ -0,0 +1,123 @@
+import pytest
+
+from multicontents.router import MountRouter
+from multicontents.router import split_path
+
+
+class FakeMount(object):
+    def __init__(self, proxy_path):
+        self.proxy_path = proxy_path
+
+    def __repr__(self):
+        return f"FakeMount({self.proxy_path!r})"
+
+
+class TestMountRouter(object):
+    @pytest.fixture
+    def mounts(self):
+        return {
+            path: FakeMount(path)
+            for path in ["", "foo", "foo/bar", "foo/barbaz", "other/deep/mount"]
+        }
+
+    @pytest.fixture
+    def router(self, mounts):
+        return MountRouter(mounts.values())
+
+    @pytest.mark.parametrize(
+        "path,expected",
+        [("", []), ("/", []), ("foo", ["foo"]), ("/foo/bar/", ["foo", "bar"])],
+    )
+    def test_split_path(self, path, expected):
+        assert split_path(path) == expected
+
+    @pytest.mark.parametrize(
+        "path,expected_mount",
+        [
+            ("", ""),
+            ("/", ""),
+            ("abc", ""),
+            ("foo", "foo"),
+            ("/foo/", "foo"),
+            ("foo/ba", "foo"),
+            ("foo/bar", "foo/bar"),
+            ("foo/bar/baz.txt", "foo/bar"),
+            ("foo/barbaz/x", "foo/barbaz"),
+            ("other/deep", ""),
+            ("other/deep/mount/file", "other/deep/mount"),
+        ],
+    )
+    def test_resolve(self, router, mounts, path, expected_mount):
+        assert router.resolve(path) is mounts[expected_mount]
+
+    def test_resolve_without_root(self):
+        router = MountRouter([FakeMount("foo")])
+        assert router.resolve("bar") is None
+        assert router.resolve("") is None
+
+    @pytest.mark.parametrize(
+        "path,expected_children",
+        [
+            ("", ["foo"]),
+            ("/foo", ["foo/bar", "foo/barbaz"]),
+            ("foo/bar", []),
+            ("other", []),
+            ("other/deep", ["other/deep/mount"]),
+            ("not/exists", []),
+        ],
+    )
+    def test_children_of(self, router, path, expected_children):
+        assert [m.proxy_path for m in router.children_of(path)] == expected_children
+
+
+class TestTemplatedMounts(object):
+    @pytest.fixture
+    def mounts(self):
+        return {
+            path: FakeMount(path)
+            for path in [
+                "",
+                "users/{username}",
+                "users/admin",
+                "users/{username}/shared",
+                "projects/{project}/{branch}",
+            ]
+        }
+
+    @pytest.fixture
+    def router(self, mounts):
+        return MountRouter(mounts.values())
+
+    @pytest.mark.parametrize(
+        "path,expected_mount,expected_values",
+        [
+            ("users", "", {}),
+            ("users/alice", "users/{username}", {"username": "alice"}),
+            ("users/alice/a.txt", "users/{username}", {"username": "alice"}),
+            ("users/admin/a.txt", "users/admin", {}),
+            # a deeper templated mount wins over a literal one
+            (
+                "users/admin/shared/a.txt",
+                "users/{username}/shared",
+                {"username": "admin"},
+            ),
+            (
+                "projects/p1/main/a.txt",
+                "projects/{project}/{branch}",
+                {"project": "p1", "branch": "main"},
+            ),
+            ("projects/p1", "", {}),
+            ("users/../etc", "", {}),
+        ],
+    )
+    def test_match(self, router, mounts, path, expected_mount, expected_values):
+        mount, values = router.match(path)
+        assert mount is mounts[expected_mount]
+        assert values == expected_values
+
+    def test_templated_mounts_are_not_listed(self, router):
+        assert [m.proxy_path for m in router.children_of("users")] == ["users/admin"]
+
+    def test_conflicting_names(self, router):
+        with pytest.raises(ValueError):
+            router.add(FakeMount("users/{user}/other"))
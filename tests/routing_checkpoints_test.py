@@ -0,0 +1,135 @@
+import os
+
+import pytest
+from jupyter_server.services.contents.filemanager import FileContentsManager
+
+from multicontents.multi_versions_file_checkpoints import (
+    AsyncMultiVersionsFileCheckpoints,
+)
+from multicontents.multicontents_manager import MultiContentsManager
+from multicontents.routing_checkpoints import AsyncRoutingCheckpoints
+
+
+@pytest.fixture
+def contents_manager(tmp_path):
+    for name in ["local", "versioned", "checkpoints"]:
+        (tmp_path / name).mkdir()
+    return MultiContentsManager(
+        checkpoints_class=AsyncRoutingCheckpoints,
+        managers={
+            "local": {
+                "manager_class": FileContentsManager,
+                "kwargs": {"root_dir": str(tmp_path / "local")},
+                "executor_workers": 2,
+            },
+            "versioned": {
+                "manager_class": FileContentsManager,
+                "kwargs": {"root_dir": str(tmp_path / "versioned")},
+                "checkpoints": {
+                    "class": (
+                        "multicontents.multi_versions_file_checkpoints"
+                        ".AsyncMultiVersionsFileCheckpoints"
+                    ),
+                    "kwargs": {
+                        "root_dir": str(tmp_path / "checkpoints"),
+                        "checkpoint_dir": "",
+                    },
+                },
+            },
+        },
+    )
+
+
+async def save_text(contents_manager, path, text):
+    await contents_manager.save(
+        {"type": "file", "format": "text", "content": text}, path
+    )
+
+
+async def test_uses_the_mount_manager_checkpoints(contents_manager, tmp_path):
+    await save_text(contents_manager, "local/file.txt", "v1")
+    checkpoint = await contents_manager.create_checkpoint("local/file.txt")
+    await save_text(contents_manager, "local/file.txt", "v2")
+
+    assert checkpoint["id"] == "checkpoint"
+    assert (
+        tmp_path / "local" / ".ipynb_checkpoints" / "file-checkpoint.txt"
+    ).read_text() == "v1"
+    assert await contents_manager.list_checkpoints("local/file.txt") == [checkpoint]
+
+    await contents_manager.restore_checkpoint("checkpoint", "local/file.txt")
+    assert (tmp_path / "local" / "file.txt").read_text() == "v1"
+
+    await contents_manager.delete_checkpoint("checkpoint", "local/file.txt")
+    assert await contents_manager.list_checkpoints("local/file.txt") == []
+
+
+async def test_uses_the_configured_store(contents_manager, tmp_path):
+    store = contents_manager.get_manager("versioned").checkpoints
+    assert isinstance(store, AsyncMultiVersionsFileCheckpoints)
+
+    await save_text(contents_manager, "versioned/file.txt", "v1")
+    checkpoint = await contents_manager.create_checkpoint("versioned/file.txt")
+    await save_text(contents_manager, "versioned/file.txt", "v2")
+
+    assert os.listdir(tmp_path / "checkpoints") == ["versioned__file___txt"]
+    assert await contents_manager.list_checkpoints("versioned/file.txt") == [checkpoint]
+    await contents_manager.restore_checkpoint(checkpoint["id"], "versioned/file.txt")
+    model = await contents_manager.get("versioned/file.txt")
+    assert model["content"] == "v1"
+
+
+async def test_rename_within_a_mount(contents_manager):
+    await save_text(contents_manager, "local/file.txt", "v1")
+    checkpoint = await contents_manager.create_checkpoint("local/file.txt")
+
+    await contents_manager.rename("local/file.txt", "local/renamed.txt")
+
+    assert await contents_manager.list_checkpoints("local/file.txt") == []
+    assert await contents_manager.list_checkpoints("local/renamed.txt") == [checkpoint]
+
+
+async def test_rename_across_mounts_drops_checkpoints(contents_manager):
+    await save_text(contents_manager, "local/file.txt", "v1")
+    await contents_manager.create_checkpoint("local/file.txt")
+
+    await contents_manager.rename("local/file.txt", "versioned/file.txt")
+
+    assert await contents_manager.list_checkpoints("local/file.txt") == []
+    assert await contents_manager.list_checkpoints("versioned/file.txt") == []
+
+
+async def test_delete_removes_checkpoints(contents_manager):
+    await save_text(contents_manager, "versioned/file.txt", "v1")
+    await contents_manager.create_checkpoint("versioned/file.txt")
+
+    await contents_manager.delete("versioned/file.txt")
+
+    assert await contents_manager.list_checkpoints("versioned/file.txt") == []
+
+
+async def test_rename_moves_checkpoints_beyond_the_list_limit(contents_manager):
+    checkpoints = contents_manager.get_manager("versioned").checkpoints
+    checkpoints.list_checkpoints_limit = 1
+    await save_text(contents_manager, "versioned/file.txt", "v1")
+    for _ in range(3):
+        await contents_manager.create_checkpoint("versioned/file.txt")
+
+    await contents_manager.rename("versioned/file.txt", "versioned/renamed.txt")
+
+    assert await checkpoints.list_checkpoints("versioned/file.txt", limit=10) == []
+    assert (
+        len(await checkpoints.list_checkpoints("versioned/renamed.txt", limit=10)) == 3
+    )
+
+
+async def test_checkpoint_metrics(contents_manager):
+    contents_manager.collect_metrics = True
+    contents_manager._init_managers()
+    await save_text(contents_manager, "versioned/file.txt", "v1")
+    await contents_manager.create_checkpoint("versioned/file.txt")
+    await contents_manager.list_checkpoints("versioned/file.txt")
+
+    stats = contents_manager.mount_metrics()["versioned"]
+    assert stats["create_checkpoint"]["calls"] == 1
+    assert stats["list_checkpoints"]["calls"] == 1
@@ -0,0 +1,374 @@
+import asyncio
+import os
+import types
+
+import fsspec
+import mock
+import pytest
+from jupyter_server.services.contents.filemanager import FileContentsManager
+from jupyter_server.services.contents.largefilemanager import LargeFileManager
+from tornado.web import HTTPError
+
+from multicontents import transfer
+from multicontents.multicontents_manager import MultiContentsManager
+from multicontents.multicontents_manager import WrapperManager
+from multicontents.transfer import TransferReport
+from multicontents.transfer import TreeTransfer
+from multicontents.transfer import fast_transfer
+from multicontents.transfer import find_transfer_strategy
+from multicontents.transfer import register_transfer_strategy
+from multicontents.transfer import open_for_read
+from multicontents.transfer import stream_file
+from multicontents.transfer import supports_chunked_save
+
+
+@pytest.fixture
+def contents_manager(tmp_path):
+    for name in ["src", "dst"]:
+        (tmp_path / name).mkdir()
+    return MultiContentsManager(
+        managers={
+            name: {
+                "manager_class": LargeFileManager,
+                "kwargs": {"root_dir": str(tmp_path / name), "delete_to_trash": False},
+            }
+            for name in ["src", "dst"]
+        }
+    )
+
+
+@pytest.fixture
+def no_transfer_strategies():
+    with mock.patch.dict(transfer._transfer_strategies, clear=True):
+        yield
+
+
+@pytest.fixture
+def tree(tmp_path):
+    root = tmp_path / "src" / "tree"
+    for i in range(3):
+        (root / f"dir_{i}" / "nested").mkdir(parents=True)
+        for j in range(4):
+            (root / f"dir_{i}" / f"file_{j}.txt").write_text(f"{i}-{j}")
+        (root / f"dir_{i}" / "nested" / "deep.txt").write_text(f"deep-{i}")
+    (root / "empty").mkdir()
+    return root
+
+
+def read_tree(root):
+    return {
+        str(path.relative_to(root)): path.read_text() if path.is_file() else None
+        for path in sorted(root.rglob("*"))
+    }
+
+
+def test_supports_chunked_save(tmp_path):
+    assert supports_chunked_save(LargeFileManager(root_dir=str(tmp_path)))
+    assert not supports_chunked_save(FileContentsManager(root_dir=str(tmp_path)))
+
+
+def test_open_for_read(tmp_path):
+    (tmp_path / "file").write_bytes(b"content")
+    with open_for_read(FileContentsManager(root_dir=str(tmp_path)), "file") as fp:
+        assert fp.read() == b"content"
+    assert open_for_read(object(), "file") is None
+
+
+async def test_stream_file_unsupported_destination(contents_manager, tmp_path):
+    (tmp_path / "src" / "file").write_text("content")
+    dst = contents_manager.get_manager("dst")
+    dst.manager = FileContentsManager(root_dir=str(tmp_path / "dst"))
+    assert not await stream_file(
+        contents_manager.get_manager("src"), "src/file", dst, "dst/file"
+    )
+    assert not (tmp_path / "dst" / "file").exists()
+
+
+class FsspecManager(FileContentsManager):
+    """stands in for s3contents, backed by an in-memory fsspec filesystem"""
+
+    def __init__(self, **kwargs):
+        super().__init__(**kwargs)
+        self.fs = types.SimpleNamespace(
+            fs=fsspec.filesystem("memory", skip_instance_cache=True),
+            path=lambda path: f"/bucket/{path}",
+        )
+
+    def _get_os_path(self, path):
+        raise AssertionError("not a local manager")
+
+
+@pytest.fixture
+def fsspec_wrapper(tmp_path):
+    (tmp_path / "remote").mkdir()
+    return WrapperManager(
+        "remote", FsspecManager, {"root_dir": str(tmp_path / "remote")}
+    )
+
+
+async def test_stream_file_to_object_store(contents_manager, fsspec_wrapper, tmp_path):
+    (tmp_path / "src" / "file").write_bytes(b"0123456789" * 10)
+    progress = mock.Mock()
+    with mock.patch.object(fsspec_wrapper, "save") as save:
+        assert await stream_file(
+            contents_manager.get_manager("src"),
+            "src/file",
+            fsspec_wrapper,
+            "remote/file",
+            chunk_size=30,
+            progress=progress,
+        )
+    assert not save.called
+    fs = fsspec_wrapper.manager.fs.fs
+    assert fs.cat("/bucket/file") == b"0123456789" * 10
+    assert [c.args[1] for c in progress.call_args_list] == [30, 60, 90, 100]
+
+
+@pytest.mark.parametrize("can_discard", [True, False])
+async def test_stream_file_to_object_store_failure(
+    contents_manager, fsspec_wrapper, tmp_path, can_discard
+):
+    (tmp_path / "src" / "file").write_bytes(b"0123456789" * 10)
+    writer = mock.Mock(spec=["write", "close", "discard"][: 3 if can_discard else 2])
+    writer.write.side_effect = [30, OSError("connection reset")]
+
+    with (
+        mock.patch.object(transfer, "open_for_write", return_value=writer),
+        mock.patch.object(fsspec_wrapper, "delete_file") as delete_file,
+    ):
+        with pytest.raises(OSError):
+            await stream_file(
+                contents_manager.get_manager("src"),
+                "src/file",
+                fsspec_wrapper,
+                "remote/file",
+                chunk_size=30,
+            )
+    if can_discard:
+        writer.discard.assert_called_once_with()
+        assert not delete_file.called
+    else:
+        delete_file.assert_called_once_with("remote/file")
+
+
+@pytest.mark.usefixtures("no_transfer_strategies")
+async def test_stream_file_failure_removes_partial_copy(contents_manager, tmp_path):
+    (tmp_path / "src" / "file").write_bytes(b"0123456789" * 10)
+    dst = contents_manager.get_manager("dst")
+    original = dst.save
+
+    async def flaky_save(model, path):
+        if model.get("chunk") == 3:
+            raise HTTPError(500, "backend unavailable")
+        return await original(model, path)
+
+    with mock.patch.object(dst, "save", side_effect=flaky_save):
+        with pytest.raises(HTTPError):
+            await stream_file(
+                contents_manager.get_manager("src"),
+                "src/file",
+                dst,
+                "dst/file",
+                chunk_size=30,
+            )
+    assert not (tmp_path / "dst" / "file").exists()
+
+
+def test_transfer_report_str():
+    report = TransferReport("a", "b")
+    report.copied.append(("a/1", "b/1"))
+    assert str(report) == "copied 1 files from 'a' to 'b'"
+    report.failed["a/2"] = "boom"
+    report.rolled_back = True
+    assert str(report) == (
+        "1 items failed to copy from 'a' to 'b' and the partial copy was removed"
+        " (a/2: boom)"
+    )
+
+
+class TestTransferStrategies(object):
+    @pytest.mark.usefixtures("no_transfer_strategies")
+    def test_find_transfer_strategy(self, tmp_path):
+        class SubManager(LargeFileManager):
+            pass
+
+        strategy = mock.Mock()
+        register_transfer_strategy(FileContentsManager, SubManager, strategy)
+        register_transfer_strategy(
+            "jupyter_server.services.contents.manager.ContentsManager",
+            "jupyter_server.services.contents.manager.ContentsManager",
+            mock.sentinel.fallback,
+        )
+        local = SubManager(root_dir=str(tmp_path))
+        plain = FileContentsManager(root_dir=str(tmp_path))
+
+        assert find_transfer_strategy(local, local) is strategy
+        assert find_transfer_strategy(local, plain) is mock.sentinel.fallback
+        assert find_transfer_strategy(object(), local) is None
+
+    async def test_move_renames_on_same_filesystem(self, contents_manager, tmp_path):
+        (tmp_path / "src" / "file.txt").write_text("content")
+        inode = (tmp_path / "src" / "file.txt").stat().st_ino
+
+        await contents_manager.rename_file("src/file.txt", "dst/file.txt")
+
+        assert not (tmp_path / "src" / "file.txt").exists()
+        assert (tmp_path / "dst" / "file.txt").stat().st_ino == inode
+
+    async def test_move_directory_renames_on_same_filesystem(
+        self, contents_manager, tree, tmp_path
+    ):
+        expected = read_tree(tree)
+        with mock.patch.object(TreeTransfer, "copy") as mock_copy:
+            await contents_manager.rename_file("src/tree", "dst/tree")
+        assert not mock_copy.called
+        assert read_tree(tmp_path / "dst" / "tree") == expected
+        assert not tree.exists()
+
+    async def test_copy_file(self, contents_manager, tmp_path):
+        (tmp_path / "src" / "file.txt").write_text("content")
+        assert await fast_transfer(
+            contents_manager.get_manager("src"),
+            "src/file.txt",
+            contents_manager.get_manager("dst"),
+            "dst/copy.txt",
+        )
+        assert (tmp_path / "src" / "file.txt").read_text() == "content"
+        assert (tmp_path / "dst" / "copy.txt").read_text() == "content"
+
+    async def test_falls_back_when_destination_exists(self, contents_manager, tmp_path):
+        (tmp_path / "src" / "file.txt").write_text("content")
+        (tmp_path / "dst" / "file.txt").write_text("existing")
+        assert not await fast_transfer(
+            contents_manager.get_manager("src"),
+            "src/file.txt",
+            contents_manager.get_manager("dst"),
+            "dst/file.txt",
+            move=True,
+        )
+        assert (tmp_path / "src" / "file.txt").exists()
+
+    async def test_missing_source(self, contents_manager):
+        with pytest.raises(HTTPError) as e:
+            await contents_manager.rename_file("src/missing.txt", "dst/missing.txt")
+        assert e.value.status_code == 404
+
+    async def test_falls_back_across_devices(self, contents_manager, tmp_path):
+        (tmp_path / "src" / "file.txt").write_text("content")
+        real_stat = os.stat
+
+        def stat(path, *args, **kwargs):
+            result = real_stat(path, *args, **kwargs)
+            if str(path).startswith(str(tmp_path / "dst")):
+                values = list(result)
+                values[2] += 1  # st_dev
+                return os.stat_result(values)
+            return result
+
+        with mock.patch("os.stat", side_effect=stat):
+            await contents_manager.rename_file("src/file.txt", "dst/file.txt")
+        assert not (tmp_path / "src" / "file.txt").exists()
+        assert (tmp_path / "dst" / "file.txt").read_text() == "content"
+
+    async def test_invalidates_caches(self, tmp_path):
+        (tmp_path / "file.txt").write_text("content")
+        src = WrapperManager(
+            "src", FileContentsManager, {"root_dir": str(tmp_path)}, cache={}
+        )
+        dst = WrapperManager(
+            "dst", FileContentsManager, {"root_dir": str(tmp_path)}, cache={}
+        )
+        assert await src.file_exists("src/file.txt")
+        assert not await dst.file_exists("dst/moved.txt")
+
+        assert await fast_transfer(src, "src/file.txt", dst, "dst/moved.txt", True)
+
+        assert not await src.file_exists("src/file.txt")
+        assert await dst.file_exists("dst/moved.txt")
+
+
+@pytest.mark.usefixtures("no_transfer_strategies")
+class TestTreeTransfer(object):
+    async def test_move_tree(self, contents_manager, tree, tmp_path):
+        expected = read_tree(tree)
+        await contents_manager.rename_file("src/tree", "dst/moved")
+
+        assert read_tree(tmp_path / "dst" / "moved") == expected
+        assert not tree.exists()
+
+    async def test_concurrency_is_bounded(self, contents_manager, tree):
+        running = 0
+        max_running = 0
+
+        async def transfer_file(src_manager, src_path, dst_manager, dst_path):
+            nonlocal running, max_running
+            running += 1
+            max_running = max(max_running, running)
+            await asyncio.sleep(0.01)
+            running -= 1
+
+        tree_transfer = TreeTransfer(contents_manager.get_manager, transfer_file, 3)
+        report = await tree_transfer.copy("src/tree", "dst/tree")
+
+        assert report.ok
+        assert len(report.copied) == 15
+        assert max_running == 3
+
+    async def test_directories_created_before_files(self, contents_manager, tree):
+        tree_transfer = TreeTransfer(contents_manager.get_manager, mock.AsyncMock(), 4)
+        levels, files = await tree_transfer.walk("src/tree", "dst/tree")
+
+        assert [len(level) for level in levels] == [1, 4, 3]
+        assert levels[0] == [("src/tree", "dst/tree")]
+        assert ("src/tree/dir_0/nested/deep.txt", "dst/tree/dir_0/nested/deep.txt") in (
+            files
+        )
+
+    async def test_failure_rolls_back(self, contents_manager, tree, tmp_path):
+        expected = read_tree(tree)
+        original = contents_manager._transfer_file
+
+        async def flaky_transfer(src_manager, src_path, dst_manager, dst_path):
+            if src_path.endswith("dir_1/file_2.txt"):
+                raise HTTPError(500, "backend unavailable")
+            await original(src_manager, src_path, dst_manager, dst_path)
+
+        with mock.patch.object(
+            contents_manager, "_transfer_file", side_effect=flaky_transfer
+        ):
+            with pytest.raises(HTTPError) as e:
+                await contents_manager.rename_file("src/tree", "dst/moved")
+
+        assert e.value.status_code == 500
+        assert "src/tree/dir_1/file_2.txt: backend unavailable" in e.value.log_message
+        assert "partial copy was removed" in e.value.log_message
+        assert read_tree(tree) == expected
+        assert not (tmp_path / "dst" / "moved").exists()
+
+    async def test_rollback_keeps_existing_destination(
+        self, contents_manager, tree, tmp_path
+    ):
+        (tmp_path / "dst" / "tree" / "dir_0").mkdir(parents=True)
+        (tmp_path / "dst" / "tree" / "keep.txt").write_text("keep")
+        (tmp_path / "dst" / "tree" / "dir_0" / "keep.txt").write_text("keep")
+        # like deleting to the trash, removes non-empty directories
+        contents_manager.get_manager("dst").manager.always_delete_dir = True
+        original = contents_manager._transfer_file
+
+        async def flaky_transfer(src_manager, src_path, dst_manager, dst_path):
+            if src_path.endswith("dir_1/file_2.txt"):
+                raise HTTPError(500, "backend unavailable")
+            await original(src_manager, src_path, dst_manager, dst_path)
+
+        with mock.patch.object(
+            contents_manager, "_transfer_file", side_effect=flaky_transfer
+        ):
+            with pytest.raises(HTTPError):
+                await contents_manager.rename_file("src/tree", "dst/tree")
+
+        assert read_tree(tmp_path / "dst" / "tree") == {
+            "dir_0": None,
+            "dir_0/keep.txt": "keep",
+            "keep.txt": "keep",
+        }
+        assert tree.exists()